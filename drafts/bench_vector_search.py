@@ -0,0 +1,73 @@
+# bench_vector_search.py
+#
+# Per-query cost of vector_search at 10k / 100k / 1M vectors (dim 384):
+#   row loop   — the old endpoint: cosine_similarity once per document, then
+#                a full sort (timed on at most 10k rows, scaled linearly)
+#   matmul     — VectorIndex.search: one matmul + argpartition top-k
+#   filtered   — VectorIndex.search with a types + max_price pre-filter
+# Vectors are random; Mongo I/O is not part of it (the old endpoint also
+# paid a full collection scan per request on top of this).
+# Run:  python bench_vector_search.py [sizes, e.g. 10000,100000]
+
+import sys
+import time
+
+import numpy as np
+
+from vector_index import VectorIndex
+
+DIM     = 384
+SIZES   = (10_000, 100_000, 1_000_000)
+TOP_N   = 10
+REPEATS = 20
+TYPES   = ["bar", "restaurant", "cafe", "night_club", "bakery"]
+
+
+def _build(n: int, rng: np.random.Generator) -> VectorIndex:
+    index = VectorIndex(DIM, capacity=n)
+    for start in range(0, n, 100_000):
+        stop  = min(n, start + 100_000)
+        vecs  = rng.standard_normal((stop - start, DIM), dtype=np.float32)
+        metas = [{"name": f"place {i}", "types": [TYPES[i % len(TYPES)]], "price_level": i % 5}
+                 for i in range(start, stop)]
+        index.upsert(list(range(start, stop)), vecs, metas)
+    return index
+
+
+def _row_loop(vecs: np.ndarray, q: np.ndarray) -> list[float]:
+    from sklearn.metrics.pairwise import cosine_similarity
+    scores = [cosine_similarity(q.reshape(1, -1), v.reshape(1, -1))[0][0] for v in vecs]
+    return sorted(scores, reverse=True)[:TOP_N]
+
+
+def _ms(fn, repeats: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - t0) / repeats * 1000
+
+
+def main() -> None:
+    sizes = tuple(int(s) for s in sys.argv[1].split(",")) if len(sys.argv) > 1 else SIZES
+    rng   = np.random.default_rng(0)
+    q     = rng.standard_normal(DIM, dtype=np.float32)
+
+    try:
+        sample   = rng.standard_normal((min(sizes[0], 10_000), DIM), dtype=np.float32)
+        loop_per = _ms(lambda: _row_loop(sample, q), 1) / len(sample)
+    except ImportError:
+        loop_per = None         # sklearn not installed — skip the baseline
+
+    print(f"dim={DIM} top_n={TOP_N} repeats={REPEATS}")
+    print(f"{'vectors':>9} {'row loop ms':>12} {'matmul ms':>10} {'filtered ms':>12} {'speed-up':>9}")
+    for n in sizes:
+        index    = _build(n, rng)
+        matmul   = _ms(lambda: index.search(q, TOP_N), REPEATS)
+        filtered = _ms(lambda: index.search(q, TOP_N, types=["bar", "cafe"], max_price=2), REPEATS)
+        loop     = loop_per * n if loop_per is not None else float("nan")
+        print(f"{n:>9} {loop:>12.1f} {matmul:>10.2f} {filtered:>12.2f} {loop / matmul:>8.0f}×")
+        del index
+
+
+if __name__ == "__main__":
+    main()
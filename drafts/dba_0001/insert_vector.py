@@ -1,96 +1,324 @@
 #Criação de uma collection no Qdrant com base nos dados do MongoDB
+#
+# Streaming, resumable ingestion job:
+#   - reads Mongo in batches of --batch-size docs, in _id order
+#   - skips docs whose summary/reviews text hash matches the last run
+#   - encodes the rest with encoder.encode(batch_size=--encode-batch),
+#     split across --workers processes (one model per process), on the
+#     --backend of ivy_v0.01/tools/encoder.py (torch, onnx, onnx-int8)
+#   - upserts each batch into Qdrant (point id derived from the Mongo _id,
+#     so re-runs overwrite instead of duplicating) and only then records
+#     the hashes and the last _id in the checkpoint file
+# Interrupted runs resume after the last committed batch. --restart rescans
+# everything (unchanged docs are still skipped by hash).
+#
+# Reviews are multi-vector: every review is split into chunks of at most
+# REVIEW_CHUNK_WORDS words (tools.embeddings, shared with query time) and each
+# chunk is its own point in reviews_db, tagged with the place's mongo_id.
+# search_places() ranks places by grouping chunk hits per place and blending
+# max-sim with the mean of the best chunks.
+#
+# Run:  python insert_vector.py [--batch-size 512] [--workers 4]
 
-from pymongo import MongoClient
-import pandas as pd
-import json
+import argparse
+import hashlib
 import os
+import sqlite3
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
+import numpy as np
+from bson import ObjectId
+from pymongo import MongoClient
 from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
 from qdrant_client.http import models
-from qdrant_client.models import Distance,VectorParams
+
+# Same encoder backends and review chunking as the app (torch / onnx / onnx-int8).
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "ivy_v0.01"))
+from tools.embeddings import REVIEW_MAX_WEIGHT, chunk_text  # noqa: E402
+from tools.encoder import BACKENDS, ENCODER_BACKEND, load as load_encoder  # noqa: E402
 
 
 mongo_url = os.environ.get("MONGO_URL")
 qdrant_url = os.environ.get("QDRANT_CLUSTER_URL")
 qdrant_key = os.environ.get("QDRANT_API_KEY")
-openai_key = os.environ.get("OPENAI_API_KEY")
 
-m_client = MongoClient(mongo_url)
+COLLECTIONS = {'summary': 'summary_db', 'reviews': 'reviews_db'}
 
-qdrant_client = QdrantClient(
-    url=qdrant_url, 
-    api_key=qdrant_key,
-)
 
+# ── Texts & hashes ────────────────────────────────────────────────────────────
 
-encoder = SentenceTransformer('all-MiniLM-L6-v2')
+def doc_texts(doc: dict) -> dict:
+    """{'summary': text, 'reviews': [chunk, ...]} — what gets embedded for one doc."""
+    reviews = doc.get('reviews', [])
+    if not isinstance(reviews, list):
+        reviews = []
+    return {
+        'summary': doc.get('summary') or '',
+        'reviews': [chunk for review in reviews if isinstance(review, dict)
+                    for chunk in chunk_text(review.get('text') or '')],
+    }
 
-db = m_client['api']
-collection_m = db['google_v0']
 
-mon_summ = {}
-mon_rev = {}
+def content_hash(texts: dict) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(texts['summary'].encode('utf-8'))
+    for chunk in texts['reviews']:
+        h.update(b'\0')
+        h.update(chunk.encode('utf-8'))
+    return h.hexdigest()
 
-for doc in collection_m.find():
-    #vector dictionary for summary
-    summary = doc.get('summary','')
-    
-    #encoder
-    try:
-        vector_s = encoder.encode(summary).tolist()
-        mon_summ[doc.get('name','')] = vector_s
-    except:
-        vector_s = [0] * 384
-        mon_summ[doc.get('name','')] = vector_s
-
-    #dictionary for reviews
-    reviews_text = (
-    " ".join(review.get('text', '') for review in doc.get('reviews', []) if isinstance(doc.get('reviews', []), list))
-    )
+
+def point_id(doc_id) -> str:
+    """Qdrant wants an int or a UUID — derive a stable UUID from the Mongo _id."""
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, str(doc_id)))
+
+
+# ── Checkpoint ────────────────────────────────────────────────────────────────
+
+class Checkpoint:
+    """SQLite file with the content hash of every ingested doc and the resume point."""
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS hashes (doc_id TEXT PRIMARY KEY, hash TEXT NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.commit()
+
+    def last_id(self) -> str | None:
+        row = self.db.execute("SELECT value FROM state WHERE key = 'last_id'").fetchone()
+        return row[0] if row else None
+
+    def set_last_id(self, doc_id: str | None) -> None:
+        self.db.execute("INSERT OR REPLACE INTO state VALUES ('last_id', ?)", (doc_id,))
+        self.db.commit()
+
+    def changed(self, hashes: dict[str, str]) -> set[str]:
+        """The doc ids whose hash differs from the stored one (or is new)."""
+        ids = list(hashes)
+        stored = dict(self.db.execute(
+            f"SELECT doc_id, hash FROM hashes WHERE doc_id IN ({','.join('?' * len(ids))})", ids,
+        ).fetchall()) if ids else {}
+        return {doc_id for doc_id, h in hashes.items() if stored.get(doc_id) != h}
+
+    def commit(self, hashes: dict[str, str], last_id: str) -> None:
+        """Record a batch as done — after its upsert succeeded."""
+        self.db.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?)", hashes.items())
+        self.db.execute("INSERT OR REPLACE INTO state VALUES ('last_id', ?)", (last_id,))
+        self.db.commit()
+
+
+# ── Encoding ──────────────────────────────────────────────────────────────────
+
+_worker_encoder = None
+
+
+def _init_worker(backend: str, threads: int):
+    global _worker_encoder
+    _worker_encoder = load_encoder(backend, threads)
+
+
+def _encode_chunk(args) -> np.ndarray:
+    texts, batch_size = args
+    return _worker_encoder.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+
+
+class Encoder:
+    """encode(texts) in-process, or split across a process pool when workers > 1."""
+
+    def __init__(self, workers: int, batch_size: int, backend: str = ENCODER_BACKEND):
+        self.batch_size = batch_size
+        self.workers = workers
+        threads = max(1, (os.cpu_count() or 1) // workers)   # processes × threads ≤ cores
+        if workers > 1:
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                            initargs=(backend, threads))
+        else:
+            self.pool = None
+            _init_worker(backend, threads)
+
+    @property
+    def dim(self) -> int:
+        if self.pool is None:
+            return _worker_encoder.get_sentence_embedding_dimension()
+        return len(self.encode(['dim probe'])[0])
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        if self.pool is None:
+            return _encode_chunk((texts, self.batch_size))
+        step = -(-len(texts) // self.workers)
+        chunks = [(texts[i:i + step], self.batch_size) for i in range(0, len(texts), step)]
+        return np.concatenate(list(self.pool.map(_encode_chunk, chunks)))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+# ── Job ───────────────────────────────────────────────────────────────────────
+
+QUANTIZATION = {
+    'none': None,
+    'int8': models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+        type=models.ScalarType.INT8, always_ram=True)),
+    'binary': models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True)),
+}
+
+
+def ensure_collections(qdrant_client: QdrantClient, dim: int, quantization: str = 'none'):
+    """
+    Create missing collections — never drop existing ones. With quantization,
+    Qdrant keeps int8/binary codes in RAM, searches on them and rescores on
+    the float vectors, which can then stay on disk.
+    """
+    existing = {c.name for c in qdrant_client.get_collections().collections}
+    for name in COLLECTIONS.values():
+        if name not in existing:
+            qdrant_client.create_collection(
+                collection_name=name,
+                vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE,
+                                                   on_disk=quantization != 'none'),
+                quantization_config=QUANTIZATION[quantization],
+            )
+    # Chunks are deleted and grouped by mongo_id — index it.
+    qdrant_client.create_payload_index(COLLECTIONS['reviews'], 'mongo_id',
+                                       field_schema=models.PayloadSchemaType.KEYWORD)
+
+
+def process_batch(docs, checkpoint, encoder, qdrant_client) -> int:
+    """Embed and upsert the changed docs of one batch. Returns how many were embedded."""
+    texts = {str(doc['_id']): (doc, doc_texts(doc)) for doc in docs}
+    hashes = {doc_id: content_hash(t) for doc_id, (_, t) in texts.items()}
+    changed = checkpoint.changed(hashes)
+
+    # Summaries: one point per doc, id derived from the _id.
+    todo = [doc_id for doc_id in changed if texts[doc_id][1]['summary'].strip()]
+    emptied = [point_id(doc_id) for doc_id in changed if not texts[doc_id][1]['summary'].strip()]
+    if emptied:
+        qdrant_client.delete(collection_name=COLLECTIONS['summary'],
+                             points_selector=models.PointIdsList(points=emptied))
+    if todo:
+        vectors = encoder.encode([texts[doc_id][1]['summary'] for doc_id in todo])
+        qdrant_client.upsert(
+            collection_name=COLLECTIONS['summary'],
+            points=[
+                models.PointStruct(id=point_id(doc_id), vector=vec.tolist(),
+                                   payload={'name': texts[doc_id][0].get('name', ''), 'mongo_id': doc_id})
+                for doc_id, vec in zip(todo, vectors)
+            ],
+            wait=True,
+        )
+
+    # Reviews: one point per chunk. A changed doc may have fewer chunks than
+    # before, so its old chunks are dropped first.
+    if changed:
+        qdrant_client.delete(
+            collection_name=COLLECTIONS['reviews'],
+            points_selector=models.FilterSelector(filter=models.Filter(must=[
+                models.FieldCondition(key='mongo_id', match=models.MatchAny(any=sorted(changed))),
+            ])),
+        )
+    chunks = [(doc_id, i, chunk) for doc_id in changed
+              for i, chunk in enumerate(texts[doc_id][1]['reviews'])]
+    if chunks:
+        vectors = encoder.encode([chunk for _, _, chunk in chunks])
+        qdrant_client.upsert(
+            collection_name=COLLECTIONS['reviews'],
+            points=[
+                models.PointStruct(id=point_id(f"{doc_id}:{i}"), vector=vec.tolist(),
+                                   payload={'name': texts[doc_id][0].get('name', ''),
+                                            'mongo_id': doc_id, 'chunk': i})
+                for (doc_id, i, _), vec in zip(chunks, vectors)
+            ],
+            wait=True,
+        )
+
+    checkpoint.commit(hashes, str(docs[-1]['_id']))
+    return len(changed)
+
+
+def search_places(qdrant_client: QdrantClient, query_vector, limit: int = 10,
+                  group_size: int = 3) -> list[tuple[str, str, float]]:
+    """
+    Places ranked by their review chunks: Qdrant groups the nearest chunks by
+    mongo_id, each place scores REVIEW_MAX_WEIGHT · best chunk + the rest · mean
+    of its top group_size chunks. Returns (mongo_id, name, score), best first.
+    """
+    groups = qdrant_client.query_points_groups(
+        collection_name=COLLECTIONS['reviews'],
+        query=list(map(float, query_vector)),
+        group_by='mongo_id',
+        limit=limit,
+        group_size=group_size,
+        # No-op without quantization; with it, oversample codes and rescore on floats.
+        search_params=models.SearchParams(
+            quantization=models.QuantizationSearchParams(rescore=True, oversampling=2.0)),
+    ).groups
+    ranked = []
+    for group in groups:
+        scores = np.array([hit.score for hit in group.hits])
+        score = REVIEW_MAX_WEIGHT * scores.max() + (1 - REVIEW_MAX_WEIGHT) * scores.mean()
+        ranked.append((group.id, group.hits[0].payload.get('name', ''), float(score)))
+    return sorted(ranked, key=lambda r: r[2], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed google_v0 docs into Qdrant")
+    parser.add_argument('--batch-size', type=int, default=512, help="Mongo docs per batch / upsert")
+    parser.add_argument('--encode-batch', type=int, default=64, help="encoder.encode batch_size")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="encoder processes")
+    parser.add_argument('--backend', choices=BACKENDS, default=ENCODER_BACKEND,
+                        help="encoder runtime (onnx* need: python -m tools.encoder export)")
+    parser.add_argument('--checkpoint', default='insert_vector.ckpt.db')
+    parser.add_argument('--restart', action='store_true', help="rescan from the first doc")
+    parser.add_argument('--quantization', choices=QUANTIZATION, default='none',
+                        help="codes for new collections (see ivy_v0.01/tools/quantize.py)")
+    args = parser.parse_args()
+
+    m_client = MongoClient(mongo_url)
+    collection_m = m_client['api']['google_v0']
+    qdrant_client = QdrantClient(url=qdrant_url, api_key=qdrant_key)
+    checkpoint = Checkpoint(args.checkpoint)
+    encoder = Encoder(args.workers, args.encode_batch, args.backend)
+    ensure_collections(qdrant_client, encoder.dim, args.quantization)
+
+    if args.restart:
+        checkpoint.set_last_id(None)
+    last_id = checkpoint.last_id()
+    query = {}
+    if last_id is not None:
+        query = {'_id': {'$gt': ObjectId(last_id) if ObjectId.is_valid(last_id) else last_id}}
+        print(f"Resuming after _id {last_id}")
+
+    t0 = time.perf_counter()
+    seen = embedded = 0
+    cursor = collection_m.find(query, {'name': 1, 'summary': 1, 'reviews': 1}).sort('_id', 1)
+    batch = []
     try:
-        vector_r = encoder.encode(reviews_text).tolist()
-        mon_rev[doc.get('name','')] = vector_r
-    except:
-        vector_r = [0] * 384
-        mon_rev[doc.get('name','')] = vector_r
-
-
-summ_df = pd.DataFrame(list(mon_summ.items()), columns=['name', 'vector_summary'])
-rev_df = pd.DataFrame(list(mon_rev.items()), columns=['name', 'vector_reviews'])
-
-vect_df = summ_df.merge(rev_df, on='name', how='left')
-vect_df.head()
-
-qdrant_client.create_collection(
-    collection_name = 'summary_db'
-    ,vectors_config=models.VectorParams(
-        size=encoder.get_sentence_embedding_dimension(),
-        distance=models.Distance.COSINE
-    )
-)
-
-points_summ = [
-    models.PointStruct(
-        id=idx,
-        vector=row['vector_summary'],
-        payload={'name': row['name']}
-    )
-    for idx, row in vect_df.iterrows()
-]
-
-qdrant_client.upload_points(
-    collection_name="summary_db",
-    points=points_summ
-)
-
-user_query = "Busco por um bar de música ao vivo"
-query_vector = encoder.encode(user_query).tolist()
-
-hits = qdrant_client.search(
-    collection_name="summary_db",
-    query_vector=query_vector,
-    limit=10,
-)
-
-print(hits)
\ No newline at end of file
+        for doc in cursor.batch_size(args.batch_size):
+            batch.append(doc)
+            if len(batch) == args.batch_size:
+                embedded += process_batch(batch, checkpoint, encoder, qdrant_client)
+                seen += len(batch)
+                batch = []
+                elapsed = time.perf_counter() - t0
+                print(f"{seen} docs scanned, {embedded} embedded — {seen / elapsed:.1f} docs/s")
+        if batch:
+            embedded += process_batch(batch, checkpoint, encoder, qdrant_client)
+            seen += len(batch)
+    finally:
+        encoder.close()
+
+    checkpoint.set_last_id(None)   # complete — the next run rescans, skipping by hash
+    elapsed = time.perf_counter() - t0
+    print(f"Done: {seen} docs scanned, {embedded} embedded in {elapsed:.1f}s "
+          f"({seen / elapsed if elapsed else 0:.1f} docs/s, {embedded / elapsed if elapsed else 0:.1f} embedded/s)")
+
+
+if __name__ == '__main__':
+    main()
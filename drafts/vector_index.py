@@ -0,0 +1,129 @@
+# vector_index.py
+#
+# In-memory vector matrix for the vector_search API (test_api.py).
+#
+# Every vector lives in one preallocated float32 matrix, L2-normalised on the
+# way in, so cosine similarity is a single matmul and top-k an argpartition.
+# Rows are upserted by document id: an update overwrites its row in place,
+# a new document takes the next free row (capacity doubles when full).
+#
+# Optional pre-filters are a boolean row mask. A selective filter gathers
+# just the matching rows before the matmul; a broad one scores everything
+# and masks the rest out:
+#   types     — place has at least one of these Google types
+#   max_price — price_level <= max_price (places without a price are kept)
+
+import numpy as np
+
+# Filters matching less than this fraction of rows gather them before the
+# matmul; above it, scoring everything and masking is cheaper.
+GATHER_BELOW = 0.25
+
+
+class VectorIndex:
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim    = dim
+        self._mat   = np.zeros((capacity, dim), dtype=np.float32)
+        self._price = np.full(capacity, np.nan, dtype=np.float32)
+        self._types: dict[str, np.ndarray] = {}
+        self._row_of: dict = {}
+        self._meta: list[dict] = []
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    def _grow(self, need: int) -> None:
+        cap = len(self._mat)
+        if need <= cap:
+            return
+        while cap < need:
+            cap *= 2
+        mat = np.zeros((cap, self.dim), dtype=np.float32)
+        mat[:len(self)] = self._mat[:len(self)]
+        price = np.full(cap, np.nan, dtype=np.float32)
+        price[:len(self)] = self._price[:len(self)]
+        self._mat, self._price = mat, price
+        for t, mask in self._types.items():
+            grown = np.zeros(cap, dtype=bool)
+            grown[:len(mask)] = mask
+            self._types[t] = grown
+
+    def upsert(self, ids: list, vectors: np.ndarray, metas: list[dict]) -> int:
+        """
+        Insert or overwrite rows. Zero vectors (failed encodes) are skipped.
+        Returns the number of rows written.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        norms   = np.linalg.norm(vectors, axis=1)
+        self._grow(len(self) + len(ids))
+
+        written = 0
+        for doc_id, vec, norm, meta in zip(ids, vectors, norms, metas):
+            if norm == 0:
+                continue
+            row = self._row_of.get(doc_id)
+            if row is None:
+                row = self._row_of[doc_id] = len(self._meta)
+                self._meta.append(meta)
+            else:
+                self._meta[row] = meta
+                for mask in self._types.values():
+                    mask[row] = False
+
+            self._mat[row]   = vec / norm
+            price            = meta.get("price_level")
+            self._price[row] = np.nan if price is None else price
+            for t in meta.get("types") or []:
+                mask = self._types.get(t)
+                if mask is None:
+                    mask = self._types[t] = np.zeros(len(self._mat), dtype=bool)
+                mask[row] = True
+            written += 1
+        return written
+
+    def _candidates(self, types: list[str] | None, max_price: float | None) -> np.ndarray | None:
+        """Row mask for the filters, or None when there are none."""
+        if not types and max_price is None:
+            return None
+        n    = len(self)
+        mask = np.ones(n, dtype=bool)
+        if types:
+            any_type = np.zeros(n, dtype=bool)
+            for t in types:
+                if t in self._types:
+                    any_type |= self._types[t][:n]
+            mask &= any_type
+        if max_price is not None:
+            price = self._price[:n]
+            mask &= np.isnan(price) | (price <= max_price)
+        return mask
+
+    def search(self, query: np.ndarray, top_n: int, types: list[str] | None = None,
+               max_price: float | None = None) -> list[tuple[dict, float]]:
+        """Top-n (meta, cosine) pairs, best first."""
+        q = np.asarray(query, dtype=np.float32).ravel()
+        q = q / (np.linalg.norm(q) or 1.0)
+
+        if not len(self):
+            return []
+        mask = self._candidates(types, max_price)
+        rows = None
+        if mask is None:
+            scores  = self._mat[:len(self)] @ q
+            n_valid = len(scores)
+        elif mask.mean() < GATHER_BELOW:
+            rows    = np.flatnonzero(mask)         # few matches: gather just those rows
+            scores  = self._mat[rows] @ q
+            n_valid = len(rows)
+        else:
+            scores  = self._mat[:len(self)] @ q    # many: a gather costs more than it saves
+            scores[~mask] = -np.inf
+            n_valid = int(mask.sum())
+
+        k = min(top_n, n_valid)
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._meta[i if rows is None else rows[i]], float(scores[i])) for i in top]
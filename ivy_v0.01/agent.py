@@ -1,13 +1,26 @@
 # agent.py
 
+import asyncio
+import json
+import os
 import time
+from typing import AsyncIterator
 
-import tiktoken
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
 
+from history import (
+    get_summary,
+    set_summary,
+    summary_prompt,
+    take_overflow,
+    trim_history,
+)
 from logger import log
+from response_cache import responses
+from router import Route, route
+from tools import session
 from tools.tools import (
     get_user_location,
     set_user_location_by_text,
@@ -30,9 +43,13 @@ SYSTEM_PROMPT = """You are Ivy, a friendly urban leisure assistant.
 - Avoid using emojis, be as close to a human as you can.
 
 ## Tool sequencing
-- Always call get_user_location first and wait for its result before calling
-  search_and_rank_places. Never call both at the same time.
-- Only use coordinates returned by get_user_location — never invent or assume them.
+- If a "Known user location" note is present, the location is already stored:
+  call search_and_rank_places directly with those coordinates and do not call
+  get_user_location.
+- Otherwise always call get_user_location first and wait for its result before
+  calling search_and_rank_places. Never call both at the same time.
+- Only use coordinates from the note or from get_user_location — never invent
+  or assume them.
 
 ## Location handling
 - When get_user_location returns a "no_location" error, ask naturally where
@@ -69,31 +86,65 @@ tools = [
 ]
 agent = create_react_agent(model=llm, tools=tools, prompt=SYSTEM_PROMPT)
 
-
-# ── History trimming ──────────────────────────────────────────────────────────
-
-_enc = tiktoken.encoding_for_model("gpt-4o")
-MAX_HISTORY_TOKENS = 6_000
-
-
-def _count_tokens(history: list[dict]) -> int:
-    total = 0
-    for m in history:
-        content = m.get("content", "")
-        if isinstance(content, str):
-            total += len(_enc.encode(content)) + 4
-    return total
-
-
-def _trim_history(history: list[dict]) -> list[dict]:
-    """Drop oldest turns until the history fits within MAX_HISTORY_TOKENS."""
-    while len(history) > 2 and _count_tokens(history) > MAX_HISTORY_TOKENS:
-        history.pop(0)
-        if history and history[0]["role"] == "assistant":
-            history.pop(0)
-        log.debug("history: trimmed to %d messages (%d tokens)",
-                  len(history), _count_tokens(history))
-    return history
+# Cheap model that folds evicted turns into the rolling summary (history.py).
+summarizer = ChatOpenAI(model=os.getenv("SUMMARY_MODEL", "gpt-4o-mini"), temperature=0)
+
+# Cheap model that phrases fast-path answers (router.py) — one call, no tools.
+router_llm = ChatOpenAI(model=os.getenv("ROUTER_MODEL", "gpt-4o-mini"), temperature=0)
+
+
+# ── History compaction ────────────────────────────────────────────────────────
+# Runs before every turn. Usually a no-op; when the verbatim window overflows,
+# one summarizer call folds the evicted turns into the summary message.
+# If that call fails the turns are simply dropped, as plain trimming would.
+
+def _compact(history: list[dict]) -> list[dict]:
+    evicted = take_overflow(history)
+    if evicted:
+        t0 = time.perf_counter()
+        try:
+            prompt = summary_prompt(get_summary(history), evicted)
+            set_summary(history, summarizer.invoke(prompt).content)
+            log.info("history: folded %d messages into summary in %.2fs",
+                     len(evicted), time.perf_counter() - t0)
+        except Exception as e:
+            log.warning("history: summarize failed, %d messages dropped: %s", len(evicted), e)
+    return trim_history(history)
+
+
+async def _acompact(history: list[dict]) -> list[dict]:
+    evicted = take_overflow(history)
+    if evicted:
+        t0 = time.perf_counter()
+        try:
+            prompt = summary_prompt(get_summary(history), evicted)
+            set_summary(history, (await summarizer.ainvoke(prompt)).content)
+            log.info("history: folded %d messages into summary in %.2fs",
+                     len(evicted), time.perf_counter() - t0)
+        except Exception as e:
+            log.warning("history: summarize failed, %d messages dropped: %s", len(evicted), e)
+    return trim_history(history)
+
+
+# ── Fast path ─────────────────────────────────────────────────────────────────
+# Follow-ups the session already answers skip the ReAct loop: router.py picks
+# the places, one router_llm call phrases them. If that call fails the
+# template answer goes out instead — never worse than a short reply.
+
+def _fast_reply(r: Route) -> str:
+    try:
+        return router_llm.invoke(r.prompt).content
+    except Exception as e:
+        log.warning("router: LLM failed, template answer: %s", e)
+        return r.fallback
+
+
+async def _afast_reply(r: Route) -> str:
+    try:
+        return (await router_llm.ainvoke(r.prompt)).content
+    except Exception as e:
+        log.warning("router: LLM failed, template answer: %s", e)
+        return r.fallback
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
@@ -101,36 +152,198 @@ def _trim_history(history: list[dict]) -> list[dict]:
 def _to_lc_messages(history: list[dict]) -> list:
     msgs = []
     for m in history:
-        if m["role"] == "user":
+        if m["role"] == "summary":
+            msgs.append(SystemMessage(content=f"Resumo da conversa até aqui:\n{m['content']}"))
+        elif m["role"] == "user":
             msgs.append(HumanMessage(content=m["content"]))
         elif m["role"] == "assistant":
             msgs.append(AIMessage(content=m["content"]))
     return msgs
 
 
+def _build_messages(history: list[dict], user_input: str) -> list:
+    """
+    History + the new message. When the session already holds a location it
+    goes in as a note, so a recommendation is one LLM hop shorter: the model
+    calls search_and_rank_places straight away instead of get_user_location
+    → wait → search.
+    """
+    msgs     = _to_lc_messages(history)
+    location = session.get_location()
+    if location:
+        msgs.append(SystemMessage(
+            content=f"Known user location: {json.dumps(location, ensure_ascii=False)}"
+        ))
+        log.debug("agent: session location injected — get_user_location hop skipped")
+    return msgs + [HumanMessage(content=user_input)]
+
+
+def _log_step(fn: str, n: int, node: str, update: dict | None, elapsed: float) -> None:
+    """One line per graph step: which node ran, what it did, how long it took."""
+    msgs  = (update or {}).get("messages", [])
+    calls = [tc["name"] for m in msgs for tc in (getattr(m, "tool_calls", None) or [])]
+    if calls:
+        what = "calls " + ", ".join(calls)
+    elif node == "tools":
+        what = "ran " + ", ".join(getattr(m, "name", "?") for m in msgs)
+    else:
+        what = "answer"
+    log.info("%s step %d  %-6s %5.2fs  %s", fn, n, node, elapsed, what)
+
+
 def run(user_input: str, history: list[dict]) -> str:
     log.info("run()  input=%r", user_input[:80])
     t0 = time.perf_counter()
 
-    history  = _trim_history(history)
-    messages = _to_lc_messages(history) + [HumanMessage(content=user_input)]
-    result   = agent.invoke({"messages": messages})
-    reply    = result["messages"][-1].content
+    if (r := route(user_input)) is not None:
+        reply = _fast_reply(r)
+        log.info("run() fast path (%s) done in %.2fs", r.intent, time.perf_counter() - t0)
+        return reply
+    if (cached := responses.lookup(user_input, history)) is not None:
+        log.info("run() response cache hit in %.2fs", time.perf_counter() - t0)
+        return cached
+
+    history  = _compact(history)
+    messages = _build_messages(history, user_input)
+    reply    = ""
+    ran: set[str] = set()
+
+    n, t_step = 0, time.perf_counter()
+    for chunk in agent.stream({"messages": messages}, stream_mode="updates"):
+        for node, update in chunk.items():
+            n += 1
+            _log_step("run()", n, node, update, time.perf_counter() - t_step)
+            t_step = time.perf_counter()
+            if node == "agent":
+                reply = update["messages"][-1].content
+            else:
+                ran.update(getattr(m, "name", None) for m in update["messages"])
+
+    if "search_and_rank_places" in ran:
+        responses.store(user_input, history, reply)
+    log.info("run() done in %.2fs  steps=%d", time.perf_counter() - t0, n)
+    return reply
+
+
+async def arun(user_input: str, history: list[dict]) -> str:
+    """Async twin of run() — tools run their coroutine variants, no worker thread."""
+    log.info("arun()  input=%r", user_input[:80])
+    t0 = time.perf_counter()
 
-    log.info("run() done in %.2fs", time.perf_counter() - t0)
+    if (r := await asyncio.to_thread(route, user_input)) is not None:
+        reply = await _afast_reply(r)
+        log.info("arun() fast path (%s) done in %.2fs", r.intent, time.perf_counter() - t0)
+        return reply
+    if (cached := await asyncio.to_thread(responses.lookup, user_input, history)) is not None:
+        log.info("arun() response cache hit in %.2fs", time.perf_counter() - t0)
+        return cached
+
+    history  = await _acompact(history)
+    messages = _build_messages(history, user_input)
+    reply    = ""
+    ran: set[str] = set()
+
+    n, t_step = 0, time.perf_counter()
+    async for chunk in agent.astream({"messages": messages}, stream_mode="updates"):
+        for node, update in chunk.items():
+            n += 1
+            _log_step("arun()", n, node, update, time.perf_counter() - t_step)
+            t_step = time.perf_counter()
+            if node == "agent":
+                reply = update["messages"][-1].content
+            else:
+                ran.update(getattr(m, "name", None) for m in update["messages"])
+
+    if "search_and_rank_places" in ran:
+        await asyncio.to_thread(responses.store, user_input, history, reply)
+    log.info("arun() done in %.2fs  steps=%d", time.perf_counter() - t0, n)
     return reply
 
 
+async def astream(user_input: str, history: list[dict]) -> AsyncIterator[dict]:
+    """
+    Streaming twin of arun(). Yields events as the graph runs:
+        {"type": "tool_start", "name": ...}   the model decided to call a tool
+        {"type": "tool_end",   "name": ...}   the tool returned
+        {"type": "token",      "text": ...}   a piece of the model's answer
+        {"type": "done",       "reply": ...}  final answer — always last
+    Tokens of a step that ends in tool calls may arrive before its tool_start;
+    consumers should treat "done" as authoritative.
+    """
+    log.info("astream()  input=%r", user_input[:80])
+    t0 = time.perf_counter()
+    first_token_at = None
+
+    if (r := await asyncio.to_thread(route, user_input)) is not None:
+        reply = await _afast_reply(r)
+        log.info("astream() fast path (%s) done in %.2fs", r.intent, time.perf_counter() - t0)
+        yield {"type": "done", "reply": reply}
+        return
+    if (cached := await asyncio.to_thread(responses.lookup, user_input, history)) is not None:
+        log.info("astream() response cache hit in %.2fs", time.perf_counter() - t0)
+        yield {"type": "done", "reply": cached}
+        return
+
+    history  = await _acompact(history)
+    messages = _build_messages(history, user_input)
+    reply    = ""
+    ran: set[str] = set()
+
+    n, t_step = 0, time.perf_counter()
+    async for mode, payload in agent.astream(
+        {"messages": messages}, stream_mode=["messages", "updates"],
+    ):
+        if mode == "messages":
+            chunk, meta = payload
+            if meta.get("langgraph_node") == "agent" and isinstance(chunk.content, str) \
+                    and chunk.content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter() - t0
+                yield {"type": "token", "text": chunk.content}
+            continue
+
+        for node, update in payload.items():
+            n += 1
+            _log_step("astream()", n, node, update, time.perf_counter() - t_step)
+            t_step = time.perf_counter()
+            for m in (update or {}).get("messages", []):
+                if getattr(m, "tool_calls", None):
+                    for tc in m.tool_calls:
+                        log.debug("astream  tool_call=%s  args=%s", tc["name"], tc.get("args"))
+                        yield {"type": "tool_start", "name": tc["name"]}
+                elif getattr(m, "type", None) == "tool":
+                    ran.add(getattr(m, "name", None))
+                    yield {"type": "tool_end", "name": getattr(m, "name", "?")}
+                elif getattr(m, "type", None) == "ai":
+                    reply = m.content
+
+    if "search_and_rank_places" in ran:
+        await asyncio.to_thread(responses.store, user_input, history, reply)
+    log.info("astream() done in %.2fs  steps=%d  first token at %s", time.perf_counter() - t0, n,
+             f"{first_token_at:.2f}s" if first_token_at is not None else "—")
+    yield {"type": "done", "reply": reply}
+
+
 def run_verbose(user_input: str, history: list[dict]) -> str:
     log.info("run_verbose()  input=%r", user_input[:80])
     t0 = time.perf_counter()
 
-    history  = _trim_history(history)
-    messages = _to_lc_messages(history) + [HumanMessage(content=user_input)]
+    if (r := route(user_input)) is not None:
+        print(f"\n── Fast path: {r.intent} (no agent loop) ──")
+        reply = _fast_reply(r)
+        log.info("run_verbose() fast path (%s) done in %.2fs", r.intent, time.perf_counter() - t0)
+        return reply
+    if (cached := responses.lookup(user_input, history)) is not None:
+        print("\n── Response cache hit (no agent loop) ──")
+        return cached
+
+    history  = _compact(history)
+    messages = _build_messages(history, user_input)
 
     print("\n── Agent reasoning ──────────────────────────────────────────")
     final_content = ""
     step_n = 0
+    ran: set[str] = set()
 
     for step in agent.stream({"messages": messages}, stream_mode="values"):
         step_n += 1
@@ -150,6 +363,7 @@ def run_verbose(user_input: str, history: list[dict]) -> str:
         elif getattr(last, "type", None) == "tool":
             content_str = str(last.content)
             preview     = content_str[:100] + ("..." if len(content_str) > 100 else "")
+            ran.add(getattr(last, "name", None))
             print(f"\n[{elapsed:5.1f}s] RESULT     {getattr(last, 'name', '?')}")
             print(f"          {preview}")
             log.debug("step=%d  tool_result=%s  preview=%s", step_n, getattr(last, "name", "?"), preview)
@@ -159,5 +373,7 @@ def run_verbose(user_input: str, history: list[dict]) -> str:
             log.debug("step=%d  final_answer (%d chars)", step_n, len(final_content))
 
     print("─────────────────────────────────────────────────────────────\n")
+    if "search_and_rank_places" in ran:
+        responses.store(user_input, history, final_content)
     log.info("run_verbose() done in %.2fs  steps=%d", time.perf_counter() - t0, step_n)
     return final_content
\ No newline at end of file
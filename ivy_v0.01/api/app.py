@@ -4,23 +4,53 @@
 # Run with: uvicorn api.app:app --reload --port 8000
 
 import asyncio
+import json
 import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import startup                           # first: its import time is the app's t0
 
-import httpx
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from agent import run as agent_run
+from api import jobs, telegram
+from history import count_tokens
 from api.model import ChatRequest, ChatResponse, TelegramUpdate
-from tools import session
+import router
+from response_cache import responses
+from tools import cache, embeddings, session, tools, venue_index
+
+TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_KEY")
+
+# Streamed Telegram replies: the first message goes out once this many
+# characters have arrived, then it is edited at most once per interval.
+TELEGRAM_FIRST_CHUNK_CHARS = 40
+TELEGRAM_EDIT_INTERVAL_S   = float(os.getenv("TELEGRAM_EDIT_INTERVAL_S", "1.5"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup.begin()                      # agent + encoder load in the background
+    if TELEGRAM_TOKEN:
+        telegram.start(TELEGRAM_TOKEN)
+    jobs.start(_process_update)
+    sweeper = asyncio.create_task(session.sweeper())
+    yield
+    sweeper.cancel()
+    await jobs.stop()
+    await telegram.stop()
+    await tools.aclose()
+
 
 app = FastAPI(
     title="LocalWhisper API",
     description="Urban leisure recommendations powered by Ivy.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
-TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_KEY")
-
 
 # ── Telegram helper ───────────────────────────────────────────────────────────
 
@@ -28,39 +58,94 @@ async def send_telegram_message(chat_id: int, text: str) -> None:
     """
     Send a message back to a Telegram user.
     Telegram doesn't read our webhook response body — we have to
-    actively call their API to deliver the reply.
+    actively call their API to deliver the reply. Goes through the pooled
+    client in api/telegram.py (retries + per-chat rate limit).
     """
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    async with httpx.AsyncClient() as client:
-        await client.post(url, json={"chat_id": chat_id, "text": text})
+    await telegram.get_client().send_message(chat_id, text)
 
 
 # ── Shared agent runner ───────────────────────────────────────────────────────
 
-async def _run_agent(session_id: str, user_text: str) -> str:
+async def _run_agent(session_id: str, user_text: str, location: dict | None = None) -> str:
     """
-    Set the active session, load history, run the agent, save history.
+    Under the session's turn lock: store the location if one was shared,
+    load history, run the agent, save history.
     Used by both /chat and /webhook so the logic lives in one place.
+    Waits for warm-up first — the agent module is only imported once it is done.
     """
-    session.set_active(session_id)
-    history = session.get_history()
+    await startup.wait_ready()
+    from agent import arun as agent_arun
 
-    loop  = asyncio.get_event_loop()
-    reply = await loop.run_in_executor(None, agent_run, user_text, history)
+    async with session.turn(session_id):
+        if location:
+            session.set_location(location)
+        history = session.get_history()
 
-    session.append_to_history("user",      user_text)
-    session.append_to_history("assistant", reply)
+        reply = await agent_arun(user_text, history)
+
+        session.append_to_history("user",      user_text, count_tokens(user_text))
+        session.append_to_history("assistant", reply,     count_tokens(reply))
 
     return reply
 
 
-# ── Health check ──────────────────────────────────────────────────────────────
+async def _stream_agent(session_id: str, user_text: str,
+                        location: dict | None = None) -> AsyncIterator[dict]:
+    """
+    Streaming twin of _run_agent: yields agent.astream events while holding
+    the turn lock, and saves history once the "done" event has been seen.
+    """
+    await startup.wait_ready()
+    from agent import astream as agent_astream
+
+    async with session.turn(session_id):
+        if location:
+            session.set_location(location)
+        history = session.get_history()
+
+        async for event in agent_astream(user_text, history):
+            if event["type"] == "done":
+                reply = event["reply"]
+                session.append_to_history("user",      user_text, count_tokens(user_text))
+                session.append_to_history("assistant", reply,     count_tokens(reply))
+            yield event
+
+
+# ── Health checks ─────────────────────────────────────────────────────────────
+# Liveness answers as soon as uvicorn is up; readiness only once startup.py
+# has loaded the agent and encoder. Route traffic on /health/ready.
 
 @app.get("/health")
+@app.get("/health/live")
 def health():
     return {"status": "ok"}
 
 
+@app.get("/health/ready")
+def ready():
+    if startup.is_ready():
+        return startup.status()
+    return JSONResponse(status_code=503, content=startup.status())
+
+
+@app.get("/stats")
+def stats():
+    """Cache and job-queue counters — how many Maps calls and encoder runs the process has saved."""
+    return {
+        "place_details":  cache.place_details.stats(),
+        "search_results": cache.search_results.stats(),
+        "embeddings":     embeddings.store.stats(),
+        "encoder":        tools.encoder_stats(),
+        "jobs":           jobs.get_queue().stats(),
+        "sessions":       session.store_stats(),
+        "session_locks":  session.lock_stats(),
+        "router":         router.stats(),
+        "responses":      responses.stats(),
+        "venue_index":    index.stats() if (index := venue_index.get()) else None,
+        "startup":        startup.status(),
+    }
+
+
 # ── Chat (generic — any client) ───────────────────────────────────────────────
 
 @app.post("/chat", response_model=ChatResponse)
@@ -69,20 +154,50 @@ async def chat(req: ChatRequest):
     return ChatResponse(reply=reply, session_id=req.session_id)
 
 
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Same as /chat, as Server-Sent Events: tool_start / tool_end progress,
+    token deltas, then a final done event carrying the full reply.
+    """
+    async def events():
+        async for event in _stream_agent(req.session_id, req.message):
+            data = json.dumps(event, ensure_ascii=False)
+            yield f"event: {event['type']}\ndata: {data}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
 # ── Webhook (Telegram) ────────────────────────────────────────────────────────
 
 @app.post("/webhook")
 async def webhook(update: TelegramUpdate):
     """
     Telegram calls this endpoint every time a user sends a message.
-    Two message types are handled — text and location — both go through
-    the agent so Ivy always responds naturally with full context.
+    Acknowledge immediately and hand the update to the job queue — a slow
+    agent run must never make Telegram retry (and duplicate) the update.
     """
     if not update.message:
         return {"ok": True}
 
+    jobs.get_queue().submit(jobs.Job(
+        update_id=update.update_id,
+        session_id=str(update.message.chat.id),
+        payload=update.model_dump(),
+    ))
+    return {"ok": True}
+
+
+async def _process_update(job: jobs.Job) -> None:
+    """
+    Job handler — runs on a queue worker, never concurrently for one chat.
+    Two message types are handled — text and location — both go through
+    the agent so Ivy always responds naturally with full context.
+    """
+    update     = TelegramUpdate.model_validate(job.payload)
     chat_id    = update.message.chat.id
-    session_id = str(chat_id)
+    session_id = job.session_id
 
     # ── GPS location shared via Telegram attachment button ────────────────────
     # Store the real coordinates in session, then pass a synthetic message to
@@ -90,24 +205,61 @@ async def webhook(update: TelegramUpdate):
     # was trying to do — it responds naturally without any hardcoded string.
     if update.message.location:
         loc = update.message.location
-        session.set_active(session_id)
-        session.set_location({
-            "lat":     loc.latitude,
-            "lng":     loc.longitude,
-            "city":    "compartilhada via GPS",
-            "country": "",
-        })
-        reply = await _run_agent(
+        await _reply_streaming(
+            chat_id,
             session_id,
             "[usuario compartilhou localizacao via GPS]",
+            location={
+                "lat":     loc.latitude,
+                "lng":     loc.longitude,
+                "city":    "compartilhada via GPS",
+                "country": "",
+            },
         )
-        await send_telegram_message(chat_id, reply)
-        return {"ok": True}
+        return
 
     # ── Text message ──────────────────────────────────────────────────────────
     if not update.message.text:
-        return {"ok": True}   # photo, sticker, etc. — ignore silently
+        return   # photo, sticker, etc. — ignore silently
+
+    await _reply_streaming(chat_id, session_id, update.message.text)
+
+
+async def _reply_streaming(chat_id: int, session_id: str, user_text: str,
+                           location: dict | None = None) -> None:
+    """
+    Deliver a reply progressively: "typing…" while tools run, a first message
+    as soon as some text exists, edits as more arrives, a final edit with the
+    complete reply.
+    """
+    tg         = telegram.get_client()
+    started    = False      # first message attempted — don't retry it per token
+    message_id = None
+    shown      = ""
+    text       = ""
+    last_edit  = 0.0
+
+    async for event in _stream_agent(session_id, user_text, location):
+        if event["type"] == "tool_start":
+            text = ""       # text before a tool call is the model thinking aloud
+            await tg.send_typing(chat_id)
+
+        elif event["type"] == "token":
+            text += event["text"]
+            if not started:
+                if len(text) >= TELEGRAM_FIRST_CHUNK_CHARS:
+                    started    = True
+                    sent       = await tg.send_message(chat_id, text)
+                    message_id = (sent or {}).get("message_id")
+                    shown, last_edit = text, time.monotonic()
+            elif message_id is not None and text != shown \
+                    and time.monotonic() - last_edit >= TELEGRAM_EDIT_INTERVAL_S:
+                await tg.edit_message(chat_id, message_id, text)
+                shown, last_edit = text, time.monotonic()
 
-    reply = await _run_agent(session_id, update.message.text)
-    await send_telegram_message(chat_id, reply)
-    return {"ok": True}
\ No newline at end of file
+        elif event["type"] == "done":
+            reply = event["reply"]
+            if message_id is None:
+                await send_telegram_message(chat_id, reply)
+            elif reply != shown:
+                await tg.edit_message(chat_id, message_id, reply)
@@ -0,0 +1,227 @@
+# api/jobs.py
+#
+# In-process job queue for Telegram updates.
+#
+# The webhook only enqueues and returns — Telegram gets its 200 in
+# milliseconds and never retries an update because the agent was slow.
+#
+# Guarantees:
+#   - dedupe:   an update_id is accepted once; Telegram retries are dropped
+#   - ordering: jobs of the same session run one at a time, in arrival order
+#   - bounded:  at most JOB_WORKERS jobs run at once across all sessions
+#
+# Backends:
+#   MemoryJobBackend  — default; pending jobs are lost on restart
+#   SQLiteJobBackend  — set JOB_QUEUE_DB; pending jobs survive a restart and
+#                       are replayed in update_id order on the next start()
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from logger import log
+
+# ── Config ────────────────────────────────────────────────────────────────────
+
+JOB_WORKERS      = int(os.getenv("JOB_WORKERS", "16"))
+JOB_QUEUE_DB     = os.getenv("JOB_QUEUE_DB")            # unset → memory only
+JOB_DEDUPE_SIZE  = int(os.getenv("JOB_DEDUPE_SIZE", "10000"))
+JOB_KEEP_DONE_S  = 24 * 3600
+
+
+@dataclass
+class Job:
+    update_id:  int
+    session_id: str
+    payload:    dict
+
+
+# ── Backends ──────────────────────────────────────────────────────────────────
+
+class MemoryJobBackend:
+    """Remembers the last JOB_DEDUPE_SIZE update_ids. Nothing survives a restart."""
+
+    def __init__(self, dedupe_size: int):
+        self._seen: OrderedDict[int, None] = OrderedDict()
+        self._max  = dedupe_size
+
+    def add(self, job: Job) -> bool:
+        if job.update_id in self._seen:
+            return False
+        self._seen[job.update_id] = None
+        while len(self._seen) > self._max:
+            self._seen.popitem(last=False)
+        return True
+
+    def complete(self, update_id: int) -> None:
+        pass
+
+    def pending(self) -> list[Job]:
+        return []
+
+
+class SQLiteJobBackend:
+    """Durable queue table — update_id is the primary key, so dedupe is free."""
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "  update_id  INTEGER PRIMARY KEY,"
+            "  session_id TEXT NOT NULL,"
+            "  payload    TEXT NOT NULL,"
+            "  done       INTEGER NOT NULL DEFAULT 0,"
+            "  created_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "DELETE FROM jobs WHERE done = 1 AND created_at < ?",
+            (time.time() - JOB_KEEP_DONE_S,),
+        )
+        self._db.commit()
+        log.info("jobs: SQLite backend at %s", path)
+
+    def add(self, job: Job) -> bool:
+        cur = self._db.execute(
+            "INSERT OR IGNORE INTO jobs (update_id, session_id, payload, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (job.update_id, job.session_id, json.dumps(job.payload), time.time()),
+        )
+        self._db.commit()
+        return cur.rowcount == 1
+
+    def complete(self, update_id: int) -> None:
+        self._db.execute("UPDATE jobs SET done = 1 WHERE update_id = ?", (update_id,))
+        self._db.commit()
+
+    def pending(self) -> list[Job]:
+        rows = self._db.execute(
+            "SELECT update_id, session_id, payload FROM jobs WHERE done = 0 ORDER BY update_id"
+        ).fetchall()
+        return [Job(uid, sid, json.loads(payload)) for uid, sid, payload in rows]
+
+
+# ── Queue ─────────────────────────────────────────────────────────────────────
+
+class JobQueue:
+    """
+    Per-session FIFO lanes served by a fixed pool of worker tasks.
+    A session id sits in _ready only while it has jobs and none running,
+    which is what keeps one chat's messages in order.
+    """
+
+    def __init__(self, backend, handler: Callable[[Job], Awaitable[None]], workers: int):
+        self._backend = backend
+        self._handler = handler
+        self._workers = workers
+        self._lanes: dict[str, deque[Job]] = {}
+        self._ready: asyncio.Queue[str] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+
+        self.accepted   = 0
+        self.duplicates = 0
+        self.running    = 0
+        self.done       = 0
+        self.failed     = 0
+
+    def _push(self, job: Job) -> None:
+        lane = self._lanes.get(job.session_id)
+        if lane is None:
+            self._lanes[job.session_id] = deque([job])
+            self._ready.put_nowait(job.session_id)
+        else:
+            lane.append(job)
+
+    def submit(self, job: Job) -> bool:
+        """Enqueue a job. Returns False if its update_id was already seen."""
+        if not self._backend.add(job):
+            self.duplicates += 1
+            log.info("jobs: duplicate update_id=%d dropped", job.update_id)
+            return False
+        self.accepted += 1
+        self._push(job)
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            sid  = await self._ready.get()
+            lane = self._lanes[sid]
+            job  = lane.popleft()
+
+            self.running += 1
+            t0 = time.perf_counter()
+            try:
+                await self._handler(job)
+                self.done += 1
+            except Exception as e:
+                self.failed += 1
+                log.error("jobs: update_id=%d failed: %s", job.update_id, e, exc_info=True)
+            finally:
+                self.running -= 1
+
+            # Not reached on cancellation — an interrupted job stays pending for replay.
+            self._backend.complete(job.update_id)
+            log.debug("jobs: update_id=%d session=%r done in %.2fs",
+                      job.update_id, sid, time.perf_counter() - t0)
+
+            # The lane lives on while it has work — hand it back to the pool.
+            if lane:
+                self._ready.put_nowait(sid)
+            else:
+                del self._lanes[sid]
+
+    def start(self) -> None:
+        replay = self._backend.pending()
+        for job in replay:
+            self._push(job)
+        if replay:
+            log.info("jobs: replaying %d pending jobs", len(replay))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers)]
+        log.info("jobs: %d workers started", self._workers)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "accepted":   self.accepted,
+            "duplicates": self.duplicates,
+            "queued":     sum(len(lane) for lane in self._lanes.values()),
+            "running":    self.running,
+            "done":       self.done,
+            "failed":     self.failed,
+        }
+
+
+# ── Lifespan singleton ────────────────────────────────────────────────────────
+
+_queue: JobQueue | None = None
+
+
+def start(handler: Callable[[Job], Awaitable[None]]) -> None:
+    """Create the queue and its workers. Called once from the API lifespan."""
+    global _queue
+    backend = SQLiteJobBackend(JOB_QUEUE_DB) if JOB_QUEUE_DB else MemoryJobBackend(JOB_DEDUPE_SIZE)
+    _queue  = JobQueue(backend, handler, JOB_WORKERS)
+    _queue.start()
+
+
+async def stop() -> None:
+    global _queue
+    if _queue is not None:
+        await _queue.stop()
+        _queue = None
+
+
+def get_queue() -> JobQueue:
+    if _queue is None:
+        raise RuntimeError("Job queue not started")
+    return _queue
@@ -0,0 +1,147 @@
+# api/telegram.py
+#
+# Outbound Telegram Bot API client.
+#
+# One httpx.AsyncClient per process, opened in the FastAPI lifespan and
+# reused for every reply: keep-alive + HTTP/2 means a reply costs one request
+# on a warm connection instead of a fresh TCP + TLS handshake.
+#
+# Delivery rules:
+#   - 429 → wait exactly the retry_after Telegram asks for, then retry
+#   - 5xx / network error → exponential backoff, then retry
+#   - other 4xx → give up immediately (bad chat_id, bot blocked, …)
+#   - per chat, messages and edits are spaced TELEGRAM_CHAT_INTERVAL_S apart,
+#     so a burst of replies (or a streamed reply being edited) to one user
+#     doesn't trip Telegram's flood control
+
+import asyncio
+import os
+import time
+
+import httpx
+
+from logger import log
+
+# ── Config ────────────────────────────────────────────────────────────────────
+
+TELEGRAM_API_URL          = "https://api.telegram.org"
+TELEGRAM_MAX_CONNECTIONS  = int(os.getenv("TELEGRAM_MAX_CONNECTIONS", "20"))
+TELEGRAM_MAX_RETRIES      = int(os.getenv("TELEGRAM_MAX_RETRIES", "4"))
+TELEGRAM_BACKOFF_S        = float(os.getenv("TELEGRAM_BACKOFF_S", "0.5"))
+TELEGRAM_CHAT_INTERVAL_S  = float(os.getenv("TELEGRAM_CHAT_INTERVAL_S", "1.0"))
+
+
+# ── Per-chat rate limiter ─────────────────────────────────────────────────────
+
+class ChatRateLimiter:
+    """Spaces sends to the same chat at least `interval_s` apart."""
+
+    def __init__(self, interval_s: float):
+        self._interval = interval_s
+        self._next_at: dict[int, float] = {}
+
+    async def wait(self, chat_id: int) -> None:
+        now  = time.monotonic()
+        slot = max(now, self._next_at.get(chat_id, 0.0))
+        self._next_at[chat_id] = slot + self._interval   # reserve before sleeping
+        if slot > now:
+            log.debug("telegram: chat %s throttled %.2fs", chat_id, slot - now)
+            await asyncio.sleep(slot - now)
+
+        # Forget chats that have been quiet for a while — keeps the dict small.
+        if len(self._next_at) > 10_000:
+            cutoff = time.monotonic() - 60
+            self._next_at = {c: t for c, t in self._next_at.items() if t > cutoff}
+
+
+# ── Client ────────────────────────────────────────────────────────────────────
+
+class TelegramClient:
+
+    def __init__(self, token: str):
+        self._base    = f"{TELEGRAM_API_URL}/bot{token}"
+        self._limiter = ChatRateLimiter(TELEGRAM_CHAT_INTERVAL_S)
+        self._http    = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(10, connect=5),
+            limits=httpx.Limits(
+                max_connections=TELEGRAM_MAX_CONNECTIONS,
+                max_keepalive_connections=TELEGRAM_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def call(self, method: str, payload: dict) -> dict | None:
+        """
+        POST a Bot API method with retries. Returns the "result" field,
+        or None once retries are exhausted or the error is not retryable.
+        """
+        for attempt in range(TELEGRAM_MAX_RETRIES + 1):
+            delay = TELEGRAM_BACKOFF_S * 2 ** attempt
+            try:
+                resp = await self._http.post(f"{self._base}/{method}", json=payload)
+            except httpx.TransportError as e:
+                log.warning("telegram: %s network error (attempt %d): %s", method, attempt + 1, e)
+            else:
+                if resp.status_code == 200:
+                    return resp.json().get("result")
+                if resp.status_code == 429:
+                    try:
+                        delay = float(resp.json()["parameters"]["retry_after"])
+                    except (ValueError, KeyError, TypeError):
+                        pass
+                    log.warning("telegram: %s rate limited — retry_after=%.1fs", method, delay)
+                elif resp.status_code >= 500:
+                    log.warning("telegram: %s HTTP %d (attempt %d)",
+                                method, resp.status_code, attempt + 1)
+                else:
+                    log.error("telegram: %s HTTP %d — %s", method, resp.status_code, resp.text[:200])
+                    return None
+
+            if attempt < TELEGRAM_MAX_RETRIES:
+                await asyncio.sleep(delay)
+
+        log.error("telegram: %s gave up after %d attempts", method, TELEGRAM_MAX_RETRIES + 1)
+        return None
+
+    async def send_message(self, chat_id: int, text: str) -> dict | None:
+        await self._limiter.wait(chat_id)
+        return await self.call("sendMessage", {"chat_id": chat_id, "text": text})
+
+    async def edit_message(self, chat_id: int, message_id: int, text: str) -> dict | None:
+        await self._limiter.wait(chat_id)
+        return await self.call(
+            "editMessageText", {"chat_id": chat_id, "message_id": message_id, "text": text},
+        )
+
+    async def send_typing(self, chat_id: int) -> None:
+        """Show "typing…" for ~5s. Not rate limited — it is only a hint."""
+        await self.call("sendChatAction", {"chat_id": chat_id, "action": "typing"})
+
+
+# ── Lifespan singleton ────────────────────────────────────────────────────────
+
+_client: TelegramClient | None = None
+
+
+def start(token: str) -> None:
+    """Open the shared client. Called once from the API lifespan."""
+    global _client
+    _client = TelegramClient(token)
+    log.info("telegram: client started (HTTP/2, %d connections)", TELEGRAM_MAX_CONNECTIONS)
+
+
+async def stop() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> TelegramClient:
+    if _client is None:
+        raise RuntimeError("Telegram client not started — is TELEGRAM_BOT_KEY set?")
+    return _client
@@ -0,0 +1,105 @@
+# bench/encoder_backends.py
+#
+# Each ENCODER_BACKEND (tools/encoder.py) against the PyTorch model:
+#   load      — time to construct the encoder (imports included)
+#   query p50/p95 — one short query, batch of 1: the per-request cost
+#   docs/s    — venue cards + review chunks at --batch, like ingestion
+#   cos mean/min — cosine between the backend's and PyTorch's vector per text
+#   top10     — overlap of each query's 10 nearest cards with PyTorch's
+# Backends whose runtime or exported files are missing are skipped.
+# Run from ivy_v0.01/:  python -m bench.encoder_backends [--docs 512] [--batch 32]
+# (after: python -m tools.encoder export)
+
+import argparse
+import time
+
+import numpy as np
+
+from tools import encoder as encoders
+
+QUERIES = [
+    "bar com música ao vivo", "restaurante japonês barato", "café para trabalhar",
+    "balada aberta agora", "pizza perto de mim", "rooftop com vista", "boteco tradicional",
+    "comida vegana", "hamburgueria artesanal", "bar de vinhos tranquilo",
+]
+TYPES  = ["bar", "restaurant", "cafe", "night club", "bakery", "pizzeria"]
+REVIEW = ("Lugar aconchegante, atendimento ótimo e música ao vivo de qualidade. "
+          "Os drinks são caprichados mas o preço é um pouco alto. ")
+
+
+def _docs(n: int) -> list[str]:
+    """Alternating venue cards (venue_index.venue_text shape) and review chunks."""
+    rng = np.random.default_rng(0)
+    out = []
+    for i in range(n):
+        if i % 2 == 0:
+            out.append(f"Lugar {i}. {TYPES[i % len(TYPES)]}. Rua {i}, Pinheiros, São Paulo - SP")
+        else:
+            out.append(REVIEW * int(rng.integers(1, 6)))
+    return out
+
+
+def _top10(qs: np.ndarray, docs: np.ndarray) -> np.ndarray:
+    return np.argsort(-(qs @ docs.T), axis=1)[:, :10]
+
+
+def _run(backend: str, docs: list[str], batch: int, reps: int) -> dict | None:
+    try:
+        t0  = time.perf_counter()
+        enc = encoders.load(backend)
+        load_s = time.perf_counter() - t0
+    except (ImportError, FileNotFoundError) as e:
+        print(f"{backend:>10}: skipped ({e})")
+        return None
+
+    enc.encode(QUERIES[:2], normalize_embeddings=True)            # warm-up
+    lat = []
+    for _ in range(reps):
+        for q in QUERIES:
+            t0 = time.perf_counter()
+            enc.encode([q], normalize_embeddings=True)
+            lat.append(time.perf_counter() - t0)
+
+    t0   = time.perf_counter()
+    vecs = enc.encode(docs, batch_size=batch, normalize_embeddings=True)
+    dps  = len(docs) / (time.perf_counter() - t0)
+    return {
+        "load":  load_s,
+        "p50":   np.percentile(lat, 50) * 1000,
+        "p95":   np.percentile(lat, 95) * 1000,
+        "dps":   dps,
+        "docs":  np.asarray(vecs, dtype=np.float32),
+        "qs":    np.asarray(enc.encode(QUERIES, normalize_embeddings=True), dtype=np.float32),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs",  type=int, default=512)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--reps",  type=int, default=5, help="passes over the query list")
+    args = parser.parse_args()
+
+    docs    = _docs(args.docs)
+    results = {b: r for b in encoders.BACKENDS if (r := _run(b, docs, args.batch, args.reps))}
+    ref     = results.get("torch")
+    cards   = slice(0, None, 2)
+
+    print(f"\n{len(docs)} docs at batch {args.batch}, {len(QUERIES) * args.reps} single queries, "
+          f"{encoders._threads()} ONNX threads")
+    print(f"{'backend':>10} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'docs/s':>8} "
+          f"{'cos mean':>9} {'cos min':>8} {'top10':>6}")
+    for name, r in results.items():
+        agree = "—".rjust(9), "—".rjust(8), "—".rjust(6)
+        if ref is not None:
+            cos     = np.sum(r["docs"] * ref["docs"], axis=1)
+            mine   = _top10(r["qs"], r["docs"][cards])
+            theirs = _top10(ref["qs"], ref["docs"][cards])
+            overlap = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(mine, theirs)])
+            agree = f"{cos.mean():>9.4f}", f"{cos.min():>8.4f}", f"{overlap:>6.2f}"
+        print(f"{name:>10} {r['load']:>7.2f} {r['p50']:>7.2f} {r['p95']:>7.2f} {r['dps']:>8.1f} "
+              + " ".join(agree))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# bench/encoder_service.py
+#
+# In-process encoder, the in-process micro-batcher (tools/batcher.py) and the
+# shared encoder service (tools/encoder_service.py) under concurrency. Each caller thread stands in for one session: it sends
+# requests of 1 query + --texts venue cards (the cache misses of a search)
+# back to back. Reported per concurrency level: requests/s, p50/p95 latency,
+# and for the batched modes the average number of requests merged per batch.
+# Memory: RSS added by loading the encoder in-process (paid once per uvicorn
+# worker) against the service's RSS (paid once per host).
+# Uses ENCODER_BACKEND, like the app.
+# Run from ivy_v0.01/:  python -m bench.encoder_service [--requests 40]
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from tools import batcher, encoder_service
+from tools import encoder as encoders
+
+CONCURRENCY = (1, 4, 16)
+
+
+def _rss_mb(pid: int | str = "self") -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _request(i: int, n_texts: int) -> list[str]:
+    return [f"bar com música ao vivo {i}"] + [
+        f"Lugar {i}-{j}. bar. Rua {j}, Pinheiros, São Paulo - SP" for j in range(n_texts)
+    ]
+
+
+def _load(enc, concurrency: int, requests: int, n_texts: int) -> tuple[float, np.ndarray]:
+    def one(i: int) -> float:
+        t0 = time.perf_counter()
+        enc.encode(_request(i, n_texts), normalize_embeddings=True)
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        lat = np.array(list(pool.map(one, range(requests * concurrency))))
+    return requests * concurrency / (time.perf_counter() - t0), lat * 1000
+
+
+def _row(name: str, c: int, rps: float, lat: np.ndarray, extra: str = "") -> None:
+    print(f"{name:>10} {c:>5} {rps:>8.1f} {np.percentile(lat, 50):>8.1f} "
+          f"{np.percentile(lat, 95):>8.1f} {extra:>10}")
+
+
+def _merged(name: str, enc, c: int, args) -> None:
+    """_load + _row, with requests per batch from the stats() counters."""
+    before   = enc.stats()
+    rps, lat = _load(enc, c, args.requests, args.texts)
+    after    = enc.stats()
+    merged   = (after["requests"] - before["requests"]) / (after["batches"] - before["batches"])
+    _row(name, c, rps, lat, f"{merged:.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=40, help="per caller thread")
+    parser.add_argument("--texts",    type=int, default=4,  help="cards per request")
+    args = parser.parse_args()
+
+    print(f"{'mode':>10} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'reqs/batch':>10}")
+
+    rss0 = _rss_mb()
+    enc  = encoders.load()
+    enc.encode(["warm-up"], normalize_embeddings=True)
+    in_process_mb = _rss_mb() - rss0
+    for c in CONCURRENCY:
+        _row("in-process", c, *_load(enc, c, args.requests, args.texts))
+    batched = batcher.EncodeBatcher(enc)
+    for c in CONCURRENCY:
+        _merged("batched", batched, c, args)
+    del enc, batched
+
+    path = os.path.join(tempfile.mkdtemp(), "encoder.sock")
+    proc = subprocess.Popen([sys.executable, "-m", "tools.encoder_service", path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        remote = encoder_service.RemoteEncoder(path, connect_s=120)
+        remote.encode(["warm-up"])
+        service_mb = _rss_mb(proc.pid)
+        for c in CONCURRENCY:
+            _merged("service", remote, c, args)
+        client_mb = _rss_mb()
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    print(f"\nRSS: in-process encoder +{in_process_mb:.0f} MB per worker, "
+          f"service {service_mb:.0f} MB per host (this client process: {client_mb:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# bench/quantized_search.py
+#
+# Recall@k and speed of quantized two-stage search against exact float32.
+# Vectors: the venue index at VENUE_INDEX_PATH when it exists (and its built
+# int8 / binary codes, if present — the same files search loads), otherwise
+# synthetic clustered unit vectors (dim 384) — random Gaussians would make
+# every neighbour equally far and say nothing about real embeddings.
+# Queries are perturbed copies of indexed vectors, like a query that
+# paraphrases a venue's description.
+# Run from ivy_v0.01/:  python -m bench.quantized_search
+
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from tools import quantize, venue_index
+
+N_SYNTH   = 200_000
+DIM       = 384
+CLUSTERS  = 2_000
+QUERIES   = 200
+K         = 10
+RESCORES  = (20, 50, 100, 200)
+
+
+def _index_files() -> tuple[Path, Path, Path] | None:
+    """The float, int8 and binary files of the venue index, as venue_index names them."""
+    path = os.getenv("VENUE_INDEX_PATH")
+    if not path:
+        return None
+    npy = venue_index._paths(path)[0]
+    return (npy, *venue_index._quant_paths(path)) if npy.exists() else None
+
+
+def _vectors(rng: np.random.Generator, files) -> np.ndarray:
+    if files:
+        print(f"vectors: {files[0]}")
+        return np.load(files[0])
+    print(f"vectors: synthetic, {N_SYNTH} in {CLUSTERS} clusters")
+    centers = rng.standard_normal((CLUSTERS, DIM), dtype=np.float32)
+    vecs    = centers[rng.integers(0, CLUSTERS, N_SYNTH)] \
+        + 0.6 * rng.standard_normal((N_SYNTH, DIM), dtype=np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def _codes(vecs: np.ndarray, files) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The index's built codes when present, so the bench scores what search does."""
+    if files and files[1].exists() and files[2].exists():
+        print(f"codes: {files[1]}, {files[2]}")
+        data = np.load(files[1])
+        return data["codes"], data["scale"], np.load(files[2])
+    return (*quantize.int8_codes(vecs), quantize.binary_codes(vecs))
+
+
+def _recall(exact: np.ndarray, found: np.ndarray) -> float:
+    return len(set(exact.tolist()) & set(found[:K].tolist())) / K
+
+
+def main() -> None:
+    rng   = np.random.default_rng(0)
+    files = _index_files()
+    vecs  = _vectors(rng, files)
+    rows = np.arange(len(vecs))
+    qs   = vecs[rng.integers(0, len(vecs), QUERIES)] \
+        + 0.3 * rng.standard_normal((QUERIES, vecs.shape[1]), dtype=np.float32) / np.sqrt(vecs.shape[1])
+    qs   = (qs / np.linalg.norm(qs, axis=1, keepdims=True)).astype(np.float32)
+
+    codes8, scale, bits = _codes(vecs, files)
+    approx = {
+        "int8":   (codes8.nbytes, lambda q: quantize.int8_scores(codes8, scale, q)),
+        "binary": (bits.nbytes,   lambda q: quantize.hamming_scores(bits, q)),
+    }
+
+    t0    = time.perf_counter()
+    exact = [np.argsort(-(vecs @ q))[:K] for q in qs]
+    f_ms  = (time.perf_counter() - t0) / QUERIES * 1000
+
+    print(f"{len(vecs)} vectors × {vecs.shape[1]}, {QUERIES} queries, recall@{K}")
+    print(f"{'scoring':>8} {'rescore':>8} {'MB':>8} {'ms/query':>9} {'recall':>7}")
+    print(f"{'float32':>8} {'—':>8} {vecs.nbytes / 2**20:>8.1f} {f_ms:>9.2f} {1.0:>7.3f}")
+    for name, (nbytes, score) in approx.items():
+        for rescore in RESCORES:
+            t0, hits = time.perf_counter(), 0.0
+            for q, ex in zip(qs, exact):
+                found, _ = quantize.two_stage(score(q), rows, vecs, q, rescore)
+                hits += _recall(ex, found)
+            ms = (time.perf_counter() - t0) / QUERIES * 1000
+            print(f"{name:>8} {rescore:>8} {nbytes / 2**20:>8.1f} {ms:>9.2f} {hits / QUERIES:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
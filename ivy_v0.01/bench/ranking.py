@@ -0,0 +1,80 @@
+# bench/ranking.py
+#
+# Per-place Python scoring (what _rank_and_store did before tools/ranking.py)
+# against the vectorised engine, at 20 (one Maps text search), 1k and 100k
+# (a venue-index neighbourhood) candidates.
+#   loop       — Python scoring per place dict + sorted()
+#   columns    — Candidates.from_places: dicts → arrays
+#   vectorised — score() + top_k(K) on ready-made arrays, the venue-index case
+# Run from ivy_v0.01/:  python -m bench.ranking
+
+import math
+import time
+
+import numpy as np
+
+from tools import ranking
+
+SIZES  = (20, 1_000, 100_000)
+K      = 10
+LAT    = -23.56
+LNG    = -46.65
+RADIUS = 3000
+
+
+def _places(n: int, rng: np.random.Generator) -> tuple[list[dict], np.ndarray]:
+    lats    = LAT + rng.uniform(-0.05, 0.05, n)
+    lngs    = LNG + rng.uniform(-0.05, 0.05, n)
+    ratings = rng.uniform(3, 5, n).round(1)
+    totals  = rng.integers(0, 20_000, n)
+    prices  = rng.integers(0, 5, n)
+    places  = [
+        {"lat": float(lats[i]), "lng": float(lngs[i]), "rating": float(ratings[i]),
+         "ratings_total": int(totals[i]), "price_level": None if prices[i] == 4 else int(prices[i])}
+        for i in range(n)
+    ]
+    return places, rng.uniform(-1, 1, n)
+
+
+def _loop(places: list[dict], sem: np.ndarray) -> list[int]:
+    """The old per-place scoring, condensed."""
+    def clamp01(x): return max(0.0, min(1.0, float(x)))
+    scores = []
+    for i, p in enumerate(places):
+        lat1, lat2 = math.radians(LAT), math.radians(p["lat"])
+        a = (math.sin((lat2 - lat1) / 2) ** 2
+             + math.cos(lat1) * math.cos(lat2) * math.sin(math.radians(p["lng"] - LNG) / 2) ** 2)
+        dist  = round(6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)), 2)
+        conf  = clamp01(math.log1p(p["ratings_total"]) / math.log1p(10_000))
+        rat   = clamp01(p["rating"] / 5.0) * conf
+        prox  = clamp01(1.0 - dist / (RADIUS / 1000))
+        price = 0.5 if p["price_level"] is None else clamp01(1.0 - p["price_level"] / 4.0)
+        sem01 = clamp01((sem[i] + 1.0) / 2.0)
+        scores.append(round(0.60 * sem01 + 0.15 * rat + 0.15 * prox + 0.10 * price, 4))
+    return sorted(range(len(places)), key=scores.__getitem__, reverse=True)[:K]
+
+
+def _time(fn, reps: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        out = fn()
+    return (time.perf_counter() - t0) / reps * 1000, out
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    print(f"top {K}; ms per ranking")
+    print(f"{'n':>8} {'loop':>9} {'columns':>9} {'vectorised':>11} {'speedup':>8} {'same top':>9}")
+    for n in SIZES:
+        places, sem = _places(n, rng)
+        reps        = max(1, 20_000 // n)
+        loop_ms, loop_top = _time(lambda: _loop(places, sem), reps)
+        col_ms, cand      = _time(lambda: ranking.Candidates.from_places(places, sem), reps)
+        vec_ms, vec_top   = _time(
+            lambda: ranking.top_k(np.round(ranking.score(cand, LAT, LNG, RADIUS).final, 4), K), reps)
+        same = set(loop_top) == set(vec_top.tolist())
+        print(f"{n:>8} {loop_ms:>9.3f} {col_ms:>9.3f} {vec_ms:>11.3f} {loop_ms / vec_ms:>7.0f}× {str(same):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# bench/session_backends.py
+#
+# Save + load round-trip cost of each SessionBackend on a realistic session
+# (20 places with reviews, 20 history messages), and serialized size.
+# Run from ivy_v0.01/:  python -m bench.session_backends [--n 2000]
+#
+# The default memory backend stores nothing (session.py's working copy is the
+# only one), so it has no row. The baseline is "codec": dumps + loads alone,
+# the floor every persistent backend pays before any I/O.
+#
+# The Redis row uses fakeredis (in-process) when installed — it measures
+# serialization + client overhead, not network latency.
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from tools import session_backends as sb
+
+
+def _sample_state() -> dict:
+    review = "Lugar aconchegante, atendimento ótimo e música ao vivo de qualidade. " * 4
+    places = {
+        f"Bar {i}": {
+            "place_id": f"ChIJ{i:020d}", "name": f"Bar {i}", "address": f"Rua {i}, Pinheiros",
+            "type": "bar", "lat": -23.56 + i * 1e-3, "lng": -46.68, "rating": 4.5,
+            "ratings_total": 1200 + i, "price_level": 2, "open_now": True,
+            "website": f"https://bar{i}.com.br", "reviews": [review] * 3,
+            "distance_km": 0.4, "final_score": 0.61,
+        }
+        for i in range(20)
+    }
+    history = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": "mensagem " * 60}
+        for i in range(20)
+    ]
+    return {"location": {"lat": -23.56, "lng": -46.68, "city": "Pinheiros", "country": ""},
+            "places": places, "history": history}
+
+
+def _report(name: str, seconds: float, n: int) -> None:
+    per_op = seconds / n * 1e6
+    print(f"  {name:<8} {per_op:9.1f} µs/round-trip   {1e6 / per_op:9.0f} ops/s")
+
+
+def _bench(name: str, backend, state: dict, n: int) -> None:
+    t0 = time.perf_counter()
+    for i in range(n):
+        backend.save(f"s{i % 100}", state)
+        backend.load(f"s{i % 100}")
+    _report(name, time.perf_counter() - t0, n)
+
+
+def _bench_codec(state: dict, n: int) -> None:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        sb.loads(sb.dumps(state))
+    _report("codec", time.perf_counter() - t0, n)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=2000)
+    args  = parser.parse_args()
+    state = _sample_state()
+
+    as_json = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    print(f"serialized size: json={len(as_json):,} B   "
+          f"{'msgpack' if sb.msgpack else 'active'}={len(sb.dumps(state)):,} B")
+
+    print(f"round-trips (n={args.n}, codec={'msgpack' if sb.msgpack else 'json'}):")
+    _bench_codec(state, args.n)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _bench("sqlite", sb.SQLiteSessionBackend(str(Path(tmp) / "s.db")), state, args.n)
+
+    try:
+        import fakeredis
+    except ImportError:
+        print("  redis    skipped (pip install fakeredis)")
+    else:
+        _bench("redis", sb.RedisSessionBackend(fakeredis.FakeRedis(), ttl_s=3600), state, args.n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# bench/trim_history.py
+#
+# Per-turn cost of history trimming: the old loop (re-encode the whole history
+# once per popped message) versus history.trim_history (cached per-message
+# counts, one running total).
+# Run from ivy_v0.01/:  python -m bench.trim_history
+
+import time
+
+import history
+from history import count_tokens, trim_history
+
+SIZES   = (10, 100, 1000)
+REPEATS = 20
+
+
+def _legacy_trim(hist: list[dict]) -> list[dict]:
+    """The pre-cache implementation, kept here as the baseline."""
+    def count(h):
+        return sum(len(history._get_enc().encode(m["content"])) + 4 for m in h)
+
+    while len(hist) > 2 and count(hist) > history.MAX_HISTORY_TOKENS:
+        hist.pop(0)
+        if hist and hist[0]["role"] == "assistant":
+            hist.pop(0)
+        count(hist)     # the debug log line re-counted too
+    return hist
+
+
+def _make(n: int, with_tokens: bool) -> list[dict]:
+    text = "Quero um bar com música ao vivo perto de Pinheiros, algo tranquilo. " * 3
+    msgs = [{"role": "user" if i % 2 == 0 else "assistant", "content": text} for i in range(n)]
+    if with_tokens:
+        tokens = count_tokens(text)
+        for m in msgs:
+            m["tokens"] = tokens
+    return msgs
+
+
+def _time(fn, n: int, with_tokens: bool) -> float:
+    total = 0.0
+    for _ in range(REPEATS):
+        hist = _make(n, with_tokens)
+        t0 = time.perf_counter()
+        fn(hist)
+        total += time.perf_counter() - t0
+    return total / REPEATS * 1000
+
+
+def main() -> None:
+    print(f"budget={history.MAX_HISTORY_TOKENS} tokens, repeats={REPEATS}")
+    print(f"{'messages':>9} {'legacy ms':>11} {'cached ms':>11} {'speed-up':>9}")
+    for n in SIZES:
+        legacy = _time(_legacy_trim, n, with_tokens=False)
+        cached = _time(trim_history, n, with_tokens=True)
+        print(f"{n:>9} {legacy:>11.3f} {cached:>11.3f} {legacy / cached:>8.0f}×")
+
+
+if __name__ == "__main__":
+    main()
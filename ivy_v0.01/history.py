@@ -0,0 +1,143 @@
+# history.py
+#
+# Token budget for the conversation history sent to the LLM.
+#
+# Rolling summary:
+#   Only the most recent HISTORY_WINDOW_TOKENS of turns are sent verbatim.
+#   When the window overflows, the oldest turns are cut down to
+#   HISTORY_KEEP_TOKENS and folded into one summary message kept at the head
+#   of the history ({"role": "summary", ...}). The summary is stored with the
+#   history, so it persists with the session and is only recomputed when new
+#   turns are evicted — every few turns, not every turn.
+#   agent.py owns the LLM call; this module only decides what to fold.
+#   MAX_HISTORY_TOKENS stays as the hard cap if summarizing fails.
+#
+# Each message carries its own token count ("tokens"), computed once when it
+# is appended to the session (the API passes count_tokens(text) to
+# session.append_to_history) or lazily the first time it is trimmed.
+# Trimming is then a running total over ints — O(messages dropped), with no
+# re-encoding. Cost per turn: python -m bench.trim_history
+
+import os
+
+import tiktoken
+
+from logger import log
+
+# ── Token counting ────────────────────────────────────────────────────────────
+
+_enc: tiktoken.Encoding | None = None      # loaded on first count — see _get_enc
+MAX_HISTORY_TOKENS = 6_000
+
+HISTORY_WINDOW_TOKENS = int(os.getenv("HISTORY_WINDOW_TOKENS", "2000"))
+HISTORY_KEEP_TOKENS   = HISTORY_WINDOW_TOKENS // 2
+SUMMARY_ROLE          = "summary"
+
+
+def _get_enc() -> tiktoken.Encoding:
+    """Lazy singleton — building the BPE tables is not free, so not at import."""
+    global _enc
+    if _enc is None:
+        _enc = tiktoken.encoding_for_model("gpt-4o")
+    return _enc
+
+
+def count_tokens(content: str) -> int:
+    """Tokens one message costs in the prompt, including ~4 tokens of framing."""
+    return len(_get_enc().encode(content)) + 4
+
+
+def _message_tokens(m: dict) -> int:
+    tokens = m.get("tokens")
+    if tokens is None:
+        content = m.get("content", "")
+        tokens  = count_tokens(content) if isinstance(content, str) else 0
+        m["tokens"] = tokens
+    return tokens
+
+
+def _count_tokens(history: list[dict]) -> int:
+    return sum(_message_tokens(m) for m in history)
+
+
+# ── Trimming ──────────────────────────────────────────────────────────────────
+
+def _cut(history: list[dict], start: int, total: int, budget: int) -> int:
+    """
+    Index where the kept part of history begins so that the tokens from there
+    on fit in budget. Walks forward from start, dropping a message and the
+    reply after it if that is the assistant's; always keeps the last two.
+    """
+    cut = start
+    while len(history) - cut > 2 and total > budget:
+        total -= history[cut]["tokens"]
+        cut   += 1
+        if cut < len(history) and history[cut]["role"] == "assistant":
+            total -= history[cut]["tokens"]
+            cut   += 1
+    return cut
+
+
+def _head(history: list[dict]) -> int:
+    """1 if history starts with the summary message, else 0."""
+    return 1 if history and history[0]["role"] == SUMMARY_ROLE else 0
+
+
+def trim_history(history: list[dict]) -> list[dict]:
+    """Drop oldest turns until the history fits within MAX_HISTORY_TOKENS."""
+    total = _count_tokens(history)
+    if total <= MAX_HISTORY_TOKENS:
+        return history
+
+    head = _head(history)
+    cut  = _cut(history, head, total, MAX_HISTORY_TOKENS)
+    del history[head:cut]
+    log.debug("history: trimmed %d messages → %d messages (%d tokens)",
+              cut - head, len(history), _count_tokens(history))
+    return history
+
+
+# ── Rolling summary ───────────────────────────────────────────────────────────
+
+def take_overflow(history: list[dict]) -> list[dict]:
+    """
+    If the verbatim turns exceed HISTORY_WINDOW_TOKENS, remove the oldest ones
+    down to HISTORY_KEEP_TOKENS and return them for folding. Otherwise [].
+    """
+    head  = _head(history)
+    total = _count_tokens(history[head:])
+    if total <= HISTORY_WINDOW_TOKENS:
+        return []
+
+    cut     = _cut(history, head, total, HISTORY_KEEP_TOKENS)
+    evicted = history[head:cut]
+    del history[head:cut]
+    return evicted
+
+
+def get_summary(history: list[dict]) -> str:
+    return history[0]["content"] if _head(history) else ""
+
+
+def set_summary(history: list[dict], text: str) -> None:
+    """Insert or replace the summary message at the head of history."""
+    message = {"role": SUMMARY_ROLE, "content": text, "tokens": count_tokens(text)}
+    if _head(history):
+        history[0] = message
+    else:
+        history.insert(0, message)
+
+
+def summary_prompt(previous: str, evicted: list[dict]) -> str:
+    """Instruction for the summarizer LLM: fold evicted turns into the summary."""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in evicted)
+    return (
+        "You maintain a running summary of a conversation between a user and Ivy, "
+        "an urban leisure assistant. Update the summary with the new messages below.\n"
+        "Keep: the user's tastes and constraints (budget, music, food, mood, who they "
+        "go out with), where they are, venues already recommended and how they reacted.\n"
+        "Drop smalltalk. At most 120 words, in the language of the conversation. "
+        "Reply with the summary only.\n\n"
+        f"Current summary:\n{previous or '(empty)'}\n\n"
+        f"New messages:\n{transcript}"
+    )
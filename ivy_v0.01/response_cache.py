@@ -0,0 +1,165 @@
+# response_cache.py
+#
+# Semantic cache for whole agent turns.
+#
+# Opening messages repeat: a dozen users in the same bairro send some form of
+# "bar com música ao vivo perto de mim" as their first message. Each one costs
+# two gpt-4o calls, a Maps text search and a round of place details — for the
+# same five places and roughly the same reply.
+#
+# An entry is (embedding of the normalized message, geohash tile of the
+# session location, reply, copies of the places that turn's search ranked). A new turn is a hit
+# when:
+#   - the session has a location and the history is empty or short
+#     (RESPONSE_CACHE_MAX_HISTORY messages, no rolling summary) — deeper into
+#     a conversation the reply depends on what was said before
+#   - an entry in the same tile has cosine ≥ RESPONSE_CACHE_MIN_SIM
+#   - the entry is still fresh: RESPONSE_CACHE_TTL_S, shortened to the
+#     opening-hours TTL when any stored place carries open_now
+# A hit returns the cached reply and seeds session places, so follow-ups
+# ("o mais perto?") work exactly as after a real search. No LLM, no Maps.
+#
+# Only turns that ran search_and_rank_places are stored — smalltalk and
+# location questions are cheap and personal. Distances in a cached reply are
+# from the original asker, at most one tile (≈1.2 × 0.6 km at precision 6) off.
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from history import SUMMARY_ROLE
+from logger import log
+from tools import session
+from tools.cache import PLACE_FIELD_TTL_S, geohash, normalize_query
+from tools.tools import embed
+
+# ── Config ────────────────────────────────────────────────────────────────────
+
+RESPONSE_CACHE_SIZE        = int(os.getenv("RESPONSE_CACHE_SIZE", "2000"))
+RESPONSE_CACHE_MIN_SIM     = float(os.getenv("RESPONSE_CACHE_MIN_SIM", "0.92"))
+RESPONSE_CACHE_TTL_S       = float(os.getenv("RESPONSE_CACHE_TTL_S", str(6 * 3600)))
+RESPONSE_CACHE_GEOHASH     = int(os.getenv("RESPONSE_CACHE_GEOHASH", "6"))
+RESPONSE_CACHE_MAX_HISTORY = int(os.getenv("RESPONSE_CACHE_MAX_HISTORY", "2"))
+
+
+@dataclass
+class Entry:
+    vec:         np.ndarray
+    text:        str          # normalized message, for the log
+    reply:       str
+    places:      list[dict]
+    fresh_until: float
+
+
+# ── Cache ─────────────────────────────────────────────────────────────────────
+
+class ResponseCache:
+    """Per-tile lists of entries, LRU-capped by total entry count."""
+
+    def __init__(self, max_entries: int, min_sim: float, ttl_s: float, precision: int):
+        self._tiles: OrderedDict[str, list[Entry]] = OrderedDict()
+        self._count     = 0
+        self._max       = max_entries
+        self._min_sim   = min_sim
+        self._ttl_s     = ttl_s
+        self._precision = precision
+        self._lock      = threading.Lock()
+
+        self.hits      = 0
+        self.misses    = 0
+        self.skipped   = 0
+        self.stored    = 0
+        self.expired   = 0
+        self.evictions = 0
+
+    def _tile(self, history: list[dict]) -> str | None:
+        """Tile of the session location, or None when this turn is not cacheable."""
+        location = session.get_location()
+        if not location or len(history) > RESPONSE_CACHE_MAX_HISTORY \
+                or any(m["role"] == SUMMARY_ROLE for m in history):
+            return None
+        return geohash(location["lat"], location["lng"], self._precision)
+
+    def lookup(self, user_input: str, history: list[dict]) -> str | None:
+        """Cached reply for this turn, seeding session places. None on miss."""
+        tile = self._tile(history)
+        if tile is None:
+            self.skipped += 1
+            return None
+
+        text = normalize_query(user_input)
+        vec  = embed([text])[0]
+        now  = time.time()
+        with self._lock:
+            entries = self._tiles.get(tile, [])
+            live    = [e for e in entries if e.fresh_until > now]
+            if len(live) < len(entries):
+                self.expired += len(entries) - len(live)
+                self._count  -= len(entries) - len(live)
+                self._tiles[tile] = live
+            if not live:
+                self.misses += 1
+                return None
+
+            sims = np.stack([e.vec for e in live]) @ vec
+            best = int(np.argmax(sims))
+            if sims[best] < self._min_sim:
+                self.misses += 1
+                return None
+            hit = live[best]
+            self._tiles.move_to_end(tile)
+            self.hits += 1
+
+        log.info("response cache: hit %r ≈ %r (%.3f) in tile %s",
+                 text[:60], hit.text[:60], sims[best], tile)
+        session.set_places(copy.deepcopy(hit.places))
+        return hit.reply
+
+    def store(self, user_input: str, history: list[dict], reply: str) -> None:
+        """Remember a turn that searched, with copies of that search's places only."""
+        tile   = self._tile(history)
+        places = copy.deepcopy(session.last_places())
+        if tile is None or not places or not reply:
+            return
+
+        ttl = self._ttl_s
+        if any(p.get("open_now") is not None for p in places):
+            ttl = min(ttl, PLACE_FIELD_TTL_S["opening_hours"])
+        text  = normalize_query(user_input)
+        entry = Entry(embed([text])[0], text, reply, places, time.time() + ttl)
+
+        with self._lock:
+            self._tiles.setdefault(tile, []).append(entry)
+            self._tiles.move_to_end(tile)
+            self._count += 1
+            self.stored += 1
+            while self._count > self._max:
+                _, evicted = self._tiles.popitem(last=False)
+                self._count    -= len(evicted)
+                self.evictions += len(evicted)
+        log.debug("response cache: stored %r in tile %s (ttl %.0fs)", text[:60], tile, ttl)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries":   self._count,
+                "tiles":     len(self._tiles),
+                "hits":      self.hits,
+                "misses":    self.misses,
+                "skipped":   self.skipped,
+                "stored":    self.stored,
+                "expired":   self.expired,
+                "evictions": self.evictions,
+                "hit_rate":  round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+responses = ResponseCache(
+    RESPONSE_CACHE_SIZE, RESPONSE_CACHE_MIN_SIM, RESPONSE_CACHE_TTL_S, RESPONSE_CACHE_GEOHASH,
+)
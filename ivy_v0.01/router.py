@@ -0,0 +1,238 @@
+# router.py
+#
+# Fast path for follow-up questions about places already in the session.
+#
+# "qual está aberto agora?", "o mais perto?", "e o mais barato?", "me fala
+# mais do Girondino" — the answer is already in session.last_places() (the
+# places of the latest search, not everything the session has seen), so the
+# full ReAct loop (gpt-4o deciding to call get_session_places, then writing)
+# is two expensive round-trips for a sort and a filter.
+#
+# route(text) decides, deterministically and locally:
+#   1. rules       — keyword patterns per intent (PT + EN), accent-insensitive
+#   2. classifier  — nearest prototype phrase by MiniLM cosine, only when no
+#                    rule fired, with a high threshold and an explicit
+#                    "other" class that wins for new searches and smalltalk
+# A message that names a kind of venue none of those places is ("tem alguma
+# pizzaria aberta?" after a bar search) is a new search in disguise and also
+# goes to the agent.
+# Otherwise route() returns a Route: the prompt for ONE cheap LLM call that phrases the
+# already-selected places, plus a template answer if that call fails.
+# None means "not a follow-up" → the normal agent handles it.
+# The LLM call itself lives in agent.py.
+
+import json
+import os
+import re
+from dataclasses import dataclass
+
+import numpy as np
+
+from logger import log
+from tools import session
+from tools.cache import normalize_query
+from tools.tools import embed
+
+ROUTER_MAX_WORDS = 14
+ROUTER_MIN_SIM   = float(os.getenv("ROUTER_MIN_SIM", "0.72"))
+
+# ── Rules ─────────────────────────────────────────────────────────────────────
+# Patterns run on normalize_query() output: lowercase, no accents.
+
+_RULES = {
+    "open_now":   r"\b(abert[oa]s?|funcionando|open( now)?)\b",
+    "closest":    r"\b(mais pert[oa]|mais proxim[oa]|closest|nearest)\b",
+    "cheapest":   r"\b(mais barat[oa]|barat[oa]s?|em conta|cheapest|cheaper|cheap)\b",
+    "best_rated": r"\b((melhor|mais bem) avaliad[oa]|melhor nota|best rated|highest rated)\b",
+    "details":    r"\b((fala|conta|saber) mais|mais sobre|detalhes?|endereco|site|horarios?"
+                  r"|telefone|tell me more|details|address|website|hours)\b",
+}
+
+# A new search or a change of plan is never a follow-up.
+_NEW_SEARCH = re.compile(
+    r"\b(outr[oa]s?|diferente|procur\w*|busca\w*|quero|queria|indica\w*|recomend\w*"
+    r"|sugest\w*|sugir\w*|another|other|different|search|find|looking|recommend\w*"
+    r"|suggest\w*)\b"
+)
+
+# Kinds of venue a message can name → substrings of a place's name or type
+# that make it one. Every kind named must match some place of the last search.
+_VENUE_KINDS = {
+    r"bar(es)?|pubs?|botecos?|botequim":              ("bar", "pub", "boteco"),
+    r"restaurantes?|restaurants?":                    ("restaura",),
+    r"pizzarias?|pizzas?|pizzerias?":                 ("pizz",),
+    r"japones(a|es)?|sushi|japanese|temaki|ramen":    ("japan", "japon", "sushi", "temaki", "ramen"),
+    r"cafes?|cafeterias?|coffee":                     ("cafe", "coffee"),
+    r"padarias?|bakery|bakeries":                     ("padaria", "bakery", "panific"),
+    r"baladas?|boates?|night ?clubs?|clubs?":         ("night club", "balada", "club", "boate"),
+    r"hamburguerias?|hamburguer(es)?|burgers?":       ("burger", "hamburg"),
+    r"vinhos?|wines?":                                ("vinho", "wine"),
+    r"cervejarias?|cervejas?|brewery|beers?":         ("cerveja", "brew", "beer"),
+    r"museus?|museums?":                              ("museu", "museum"),
+    r"parques?|parks?":                               ("parque", "park"),
+    r"sorveterias?|sorvetes?|ice cream|gelato":       ("sorvet", "ice cream", "gelat"),
+    r"churrascarias?|churrasco|steakhouses?":         ("churrasc", "steak"),
+    r"italian[oa]s?|italian":                         ("italian",),
+    r"mexican[oa]s?|mexican":                         ("mexican",),
+    r"vegan[oa]s?|vegetarian[oa]s?|vegan|vegetarian": ("vegan", "vegetarian"),
+    r"cinemas?|movies?":                              ("cinema", "movie"),
+    r"teatros?|theaters?|theatres?":                  ("teatro", "theater", "theatre"),
+}
+_VENUE_KIND_RES = [(re.compile(rf"\b({pat})\b"), keys) for pat, keys in _VENUE_KINDS.items()]
+
+
+def _names_other_venue(norm_text: str, places: list[dict]) -> bool:
+    """True when the text names a kind of venue that none of places is."""
+    labels = [normalize_query(f"{p.get('name', '')} {p.get('type', '')}".replace("_", " "))
+              for p in places]
+    for kind, keys in _VENUE_KIND_RES:
+        if kind.search(norm_text) and not any(k in label for label in labels for k in keys):
+            return True
+    return False
+
+# ── Classifier prototypes ─────────────────────────────────────────────────────
+
+_PROTOTYPES = {
+    "open_now":   ["which ones are open now", "qual deles está aberto agora",
+                   "tem algum funcionando agora"],
+    "closest":    ["which one is the closest", "qual fica mais perto de mim",
+                   "qual é o mais próximo"],
+    "cheapest":   ["which one is the cheapest", "qual sai mais em conta",
+                   "qual é o mais barato"],
+    "best_rated": ["which one has the best reviews", "qual tem a melhor avaliação",
+                   "qual é o melhor avaliado"],
+    "other":      ["I want a bar with live music", "quero um restaurante japonês",
+                   "hello how are you", "oi tudo bem", "thanks", "obrigado",
+                   "procura uma pizzaria em Pinheiros", "where am I"],
+}
+_proto_labels: list[str] = []
+_proto_embs: np.ndarray | None = None
+
+
+def _classify(text: str) -> tuple[str, float]:
+    """Nearest prototype by cosine. Prototypes are embedded once, lazily."""
+    global _proto_labels, _proto_embs
+    if _proto_embs is None:
+        _proto_labels = [label for label, phrases in _PROTOTYPES.items() for _ in phrases]
+        _proto_embs   = embed([p for phrases in _PROTOTYPES.values() for p in phrases])
+    sims = _proto_embs @ embed([text])[0]
+    best = int(np.argmax(sims))
+    return _proto_labels[best], float(sims[best])
+
+
+# ── Place selection ───────────────────────────────────────────────────────────
+
+def _match_place(norm_text: str, places: list[dict]) -> dict | None:
+    """The session place whose name (or its longest word) appears in the text."""
+    best, best_len = None, 0
+    for p in places:
+        name  = normalize_query(p.get("name", ""))
+        words = sorted((w for w in re.findall(r"\w+", name) if len(w) >= 5), key=len)
+        for needle in [name] + words[-1:]:
+            if needle and needle in norm_text and len(needle) > best_len:
+                best, best_len = p, len(needle)
+    return best
+
+
+def _select(intent: str, places: list[dict]) -> list[dict]:
+    if intent == "open_now":
+        rows = [p for p in places if p.get("open_now") is True]
+        return sorted(rows, key=lambda p: p.get("final_score") or 0, reverse=True)[:5]
+    if intent == "closest":
+        rows = [p for p in places if p.get("distance_km") is not None]
+        return sorted(rows, key=lambda p: p["distance_km"])[:3]
+    if intent == "cheapest":
+        rows = [p for p in places if p.get("price_level") is not None]
+        return sorted(rows, key=lambda p: (p["price_level"], -(p.get("final_score") or 0)))[:3]
+    if intent == "best_rated":
+        rows = [p for p in places if p.get("rating") is not None]
+        return sorted(rows, key=lambda p: (p["rating"], p.get("ratings_total") or 0),
+                      reverse=True)[:3]
+    return []
+
+
+_SLIM_FIELDS = ("name", "address", "rating", "ratings_total", "price_level",
+                "open_now", "distance_km", "website")
+
+
+# ── Route ─────────────────────────────────────────────────────────────────────
+
+@dataclass
+class Route:
+    intent:   str
+    prompt:   str      # for one cheap LLM call
+    fallback: str      # template answer if that call fails
+
+
+_stats = {"routed": 0, "passed": 0, "by_rules": 0, "by_classifier": 0}
+
+
+def _prompt(user_text: str, intent: str, rows: list[dict]) -> str:
+    return (
+        "You are Ivy, a warm urban leisure assistant — like a local friend, no emojis. "
+        "The user asked a follow-up about places you already recommended. Answer using "
+        "ONLY the data below (it was selected for this question; empty means none match "
+        "— say so kindly). Never invent data. Reply in the user's language, briefly.\n\n"
+        f"Question: {user_text}\n"
+        f"Intent: {intent}\n"
+        f"Places: {json.dumps(rows, ensure_ascii=False)}"
+    )
+
+
+def _template(intent: str, rows: list[dict]) -> str:
+    if not rows:
+        return "Dos lugares que vimos, não encontrei nenhum que responda a isso."
+    if intent == "details":
+        p = rows[0]
+        parts = [p["name"], p.get("address") or ""]
+        if p.get("rating") is not None:
+            parts.append(f"nota {p['rating']}")
+        if p.get("website"):
+            parts.append(p["website"])
+        return " — ".join(x for x in parts if x)
+    names = ", ".join(p["name"] for p in rows)
+    return {
+        "open_now":   f"Abertos agora: {names}.",
+        "closest":    f"Os mais perto: {names}.",
+        "cheapest":   f"Os mais em conta: {names}.",
+        "best_rated": f"Os mais bem avaliados: {names}.",
+    }[intent]
+
+
+def route(user_text: str) -> Route | None:
+    """Return a Route for a follow-up the session can answer, else None."""
+    places = session.last_places()
+    norm   = normalize_query(user_text)
+    if (not places or len(norm.split()) > ROUTER_MAX_WORDS or _NEW_SEARCH.search(norm)
+            or _names_other_venue(norm, places)):
+        _stats["passed"] += 1
+        return None
+
+    intent = next((i for i, pat in _RULES.items() if re.search(pat, norm)), None)
+    source = "rules"
+    if intent is None:
+        label, sim = _classify(user_text)
+        if label != "other" and sim >= ROUTER_MIN_SIM:
+            intent, source = label, "classifier"
+        log.debug("router: classifier → %s (%.2f)", label, sim)
+
+    if intent == "details":
+        place = _match_place(norm, places)
+        rows  = [place] if place else []
+        if not rows:
+            intent = None            # "details" of something not in session
+    elif intent is not None:
+        rows = [{k: p.get(k) for k in _SLIM_FIELDS} for p in _select(intent, places)]
+
+    if intent is None:
+        _stats["passed"] += 1
+        return None
+
+    _stats["routed"] += 1
+    _stats["by_rules" if source == "rules" else "by_classifier"] += 1
+    log.info("router: %r → %s via %s (%d places)", user_text[:60], intent, source, len(rows))
+    return Route(intent, _prompt(user_text, intent, rows), _template(intent, rows))
+
+
+def stats() -> dict:
+    return dict(_stats)
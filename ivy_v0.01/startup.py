@@ -0,0 +1,99 @@
+# startup.py
+#
+# Warm-up off the critical path, so uvicorn binds in well under a second.
+#
+# The expensive parts of a worker are all lazy now: the agent module
+# (langchain_openai + langgraph imports, graph compile), the MiniLM encoder
+# (torch import + weights) and the tiktoken tables. begin() — called from the
+# API lifespan — loads them on a worker thread while the app already serves:
+#
+#   liveness  — GET /health, /health/live: the process is up. Always 200.
+#   readiness — GET /health/ready: 200 once warm-up finished, 503 before
+#               (and if it failed). Point the load balancer / k8s
+#               readinessProbe here so no traffic lands on a cold worker.
+#
+# Requests that arrive anyway (a Telegram update is accepted immediately and
+# queued) await wait_ready() before touching the agent. Every step's duration
+# is logged and reported by status() on /health/ready and /stats.
+
+import asyncio
+import importlib
+import time
+from contextlib import contextmanager
+
+from logger import log
+
+_t_import = time.perf_counter()          # ≈ when the API started importing
+
+_timings: dict[str, float] = {}
+_state    = "starting"                   # starting → warming → ready | failed
+_error: str | None = None
+_ready: asyncio.Event | None = None
+_task: asyncio.Task | None = None
+
+
+@contextmanager
+def timed(name: str):
+    """Record how long the block took under `name`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings[name] = time.perf_counter() - t0
+        log.info("startup: %s in %.2fs", name, _timings[name])
+
+
+def _warm() -> None:
+    """Runs on a worker thread — imports and first calls, in dependency order."""
+    with timed("import agent"):
+        importlib.import_module("agent")
+    with timed("encoder"):
+        from tools.tools import warm_up
+        warm_up()
+    with timed("tokenizer"):
+        from history import count_tokens
+        count_tokens("warm-up")
+
+
+async def _run() -> None:
+    global _state, _error
+    _state = "warming"
+    try:
+        await asyncio.to_thread(_warm)
+        _state = "ready"
+        log.info("startup: ready %.2fs after import", time.perf_counter() - _t_import)
+    except Exception as e:
+        _state, _error = "failed", str(e)
+        log.error("startup: warm-up failed: %s", e, exc_info=True)
+    finally:
+        _ready.set()
+
+
+def begin() -> None:
+    """Start warm-up in the background. Called once from the API lifespan."""
+    global _ready, _task
+    _timings["import app"] = time.perf_counter() - _t_import
+    _ready = asyncio.Event()
+    _task  = asyncio.create_task(_run())
+
+
+async def wait_ready() -> None:
+    """Block until warm-up is done. Raises if it failed."""
+    if _ready is None:
+        raise RuntimeError("startup.begin() was not called")
+    await _ready.wait()
+    if _state != "ready":
+        raise RuntimeError(f"Worker not ready: {_error}")
+
+
+def is_ready() -> bool:
+    return _state == "ready"
+
+
+def status() -> dict:
+    return {
+        "state":    _state,
+        "uptime_s": round(time.perf_counter() - _t_import, 2),
+        "timings":  {name: round(s, 3) for name, s in _timings.items()},
+        "error":    _error,
+    }
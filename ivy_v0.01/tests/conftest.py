@@ -0,0 +1,10 @@
+# tests/conftest.py
+#
+# Run from ivy_v0.01/:  python -m pytest tests
+# Modules import each other as top-level packages (from tools import …),
+# so the app directory goes on sys.path.
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,56 @@
+# tests/test_batcher.py
+#
+# The batching thread is the only one: a cancelled caller or a failing
+# encoder must not take it down for everyone queued behind them.
+
+import threading
+
+import numpy as np
+
+from tools.batcher import EncodeBatcher
+
+
+class _Encoder:
+    """Each text becomes [len(text), 1, 0, …]; the first call waits on `gate`."""
+
+    def __init__(self, fail: bool = False):
+        self.gate = threading.Event()
+        self.fail = fail
+        self.seen: list[list[str]] = []
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 4
+
+    def encode(self, texts, **_):
+        self.gate.wait(5)
+        self.seen.append(list(texts))
+        if self.fail:
+            self.fail = False
+            raise RuntimeError("boom")
+        return np.array([[len(t), 1, 0, 0] for t in texts], dtype=np.float32)
+
+
+def test_cancelled_futures_are_dropped():
+    enc     = _Encoder()
+    batcher = EncodeBatcher(enc, max_batch=64, max_wait_s=0)
+    first   = batcher.submit(["a"])          # holds the thread inside encode()
+    doomed  = batcher.submit(["bb"])
+    assert doomed.cancel()
+    kept    = batcher.submit(["ccc"])
+    enc.gate.set()
+
+    assert first.result(5)[0, 0] == 1
+    assert kept.result(5)[0, 0] == 3
+    assert ["bb"] not in enc.seen and all("bb" not in call for call in enc.seen)
+    assert batcher.encode(["dddd"])[0, 0] == 4
+
+
+def test_encode_error_fails_the_batch_not_the_thread():
+    enc     = _Encoder(fail=True)
+    enc.gate.set()
+    batcher = EncodeBatcher(enc, max_batch=64, max_wait_s=0)
+    failed  = batcher.submit(["a"])
+
+    assert isinstance(failed.exception(5), RuntimeError)
+    assert batcher.encode(["bb"])[0, 0] == 2
+    assert batcher.stats()["errors"] == 1
@@ -0,0 +1,66 @@
+# tests/test_encoder_service.py
+#
+# RemoteEncoder against a stand-in service that drops the first connection
+# halfway through a response: the client must discard that socket and get
+# its rows on the one reconnect.
+
+import json
+import socket
+import threading
+
+import numpy as np
+
+from tools.encoder_service import _PAIR, _U32, RemoteEncoder
+
+DIM = 4
+
+
+def _serve(path: str, connections: list[int]) -> socket.socket:
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+
+    def handle(conn: socket.socket, n: int) -> None:
+        with conn:
+            conn.sendall(_PAIR.pack(DIM, 0))
+            while True:
+                head = conn.recv(_U32.size, socket.MSG_WAITALL)
+                if len(head) < _U32.size:
+                    return
+                (size,) = _U32.unpack(head)
+                texts   = json.loads(conn.recv(size, socket.MSG_WAITALL))
+                vecs    = np.full((len(texts), DIM), 0.5, dtype=np.float32)
+                reply   = _PAIR.pack(len(texts), DIM) + vecs.tobytes()
+                if n == 0:                      # first connection: cut off mid-payload
+                    conn.sendall(reply[:_PAIR.size + 6])
+                    return
+                conn.sendall(reply)
+
+    def accept() -> None:
+        n = 0
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            connections.append(n)
+            threading.Thread(target=handle, args=(conn, n), daemon=True).start()
+            n += 1
+
+    threading.Thread(target=accept, daemon=True).start()
+    return server
+
+
+def test_half_read_response_is_retried_on_a_fresh_socket(tmp_path):
+    path        = str(tmp_path / "enc.sock")
+    connections: list[int] = []
+    server      = _serve(path, connections)
+    try:
+        enc  = RemoteEncoder(path, connect_s=1)
+        vecs = enc.encode(["a", "b"])
+        assert vecs.shape == (2, DIM) and np.allclose(vecs, 0.5)
+        assert connections == [0, 1]
+        assert enc.encode(["c"]).shape == (1, DIM)      # keeps the good socket
+        assert connections == [0, 1]
+    finally:
+        server.close()
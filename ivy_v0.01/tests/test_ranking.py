@@ -0,0 +1,102 @@
+# tests/test_ranking.py
+#
+# The vectorised engine against the per-place scoring _rank_and_store did
+# before tools/ranking.py, kept here as the reference: same scores, same
+# missing-value rules, same order.
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+from tools import ranking
+
+LAT, LNG, RADIUS = -23.56, -46.65, 3000
+
+
+# ── Reference: the old scalar code ────────────────────────────────────────────
+
+def _clamp01(x) -> float:
+    return max(0.0, min(1.0, float(x)))
+
+
+def _safe_float(x, default=None):
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return default
+
+
+def _haversine_km(lat1, lng1, lat2, lng2) -> float:
+    lat1_rad, lat2_rad = math.radians(lat1), math.radians(lat2)
+    dlat, dlng = math.radians(lat2 - lat1), math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng / 2) ** 2
+    return round(6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)), 2)
+
+
+def _old_scores(places, sem, lat, lng, radius_m) -> list[tuple[float | None, float]]:
+    """(distance_km, final_score) per place, as the old loop computed them."""
+    out = []
+    for i, p in enumerate(places):
+        dist = _haversine_km(lat, lng, p["lat"], p["lng"]) if p.get("lat") and p.get("lng") else None
+        sem01 = _clamp01((float(sem[i]) + 1) / 2)
+        rating = _safe_float(p.get("rating"))
+        if rating is None:
+            rat = 0.0
+        else:
+            n   = _safe_float(p.get("ratings_total"), 0.0) or 0.0
+            rat = _clamp01(rating / 5) * _clamp01(math.log1p(n) / math.log1p(10_000))
+        prox  = 0.5 if dist is None else _clamp01(1 - dist / (radius_m / 1000))
+        level = _safe_float(p.get("price_level"))
+        price = 0.5 if level is None else _clamp01(1 - level / 4)
+        out.append((dist, round(0.6 * sem01 + 0.15 * rat + 0.15 * prox + 0.1 * price, 4)))
+    return out
+
+
+def _random_places(rnd: random.Random, n: int) -> list[dict]:
+    def coord(center):
+        return rnd.choice([None, 0, 0.0]) if rnd.random() < 0.15 else center + rnd.uniform(-0.05, 0.05)
+    return [
+        {"name": f"P{i}", "lat": coord(LAT), "lng": coord(LNG),
+         "rating": rnd.choice([None, 3.2, 4.5, 5, "x"]),
+         "ratings_total": rnd.choice([None, 0, 10, 5000, 20_000]),
+         "price_level": rnd.choice([None, 0, 1, 2, 3, 4])}
+        for i in range(n)
+    ]
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_the_old_loop(seed):
+    rnd    = random.Random(seed)
+    places = _random_places(rnd, rnd.randint(1, 30))
+    sem    = np.random.default_rng(seed).uniform(-1, 1, len(places))
+
+    expected = _old_scores(places, sem, LAT, LNG, RADIUS)
+    scores   = ranking.score(ranking.Candidates.from_places(places, sem), LAT, LNG, RADIUS)
+    final    = np.round(scores.final, 4)
+
+    for (dist, f), got_dist, got_f in zip(expected, scores.distance_km.tolist(), final.tolist()):
+        assert got_f == pytest.approx(f, abs=1e-9)
+        if dist is None:
+            assert math.isnan(got_dist)
+        else:
+            assert got_dist == pytest.approx(dist, abs=1e-9)
+
+    old_order = sorted(range(len(places)), key=lambda i: expected[i][1], reverse=True)
+    assert ranking.top_k(final, len(places)).tolist() == old_order
+
+
+def test_zero_coordinates_count_as_missing():
+    places = [{"lat": 0, "lng": LNG}, {"lat": LAT, "lng": 0.0}, {"lat": LAT, "lng": LNG}]
+    scores = ranking.score(ranking.Candidates.from_places(places, np.zeros(3)), LAT, LNG, RADIUS)
+    assert np.isnan(scores.distance_km[:2]).all()
+    assert scores.proximity.tolist() == [0.5, 0.5, 1.0]
+
+
+@pytest.mark.parametrize("k", [0, 1, 5, 99, 100, 150])
+def test_top_k_is_a_prefix_of_the_stable_sort(k):
+    final = np.round(np.random.default_rng(k).uniform(size=100), 2)    # plenty of ties
+    assert ranking.top_k(final, k).tolist() == np.argsort(-final, kind="stable")[:k].tolist()
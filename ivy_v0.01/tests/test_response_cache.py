@@ -0,0 +1,51 @@
+# tests/test_response_cache.py
+#
+# A stored turn keeps copies of that turn's search only — not every place the
+# session has accumulated — and a hit hands the session its own copies. The
+# embedder is stubbed: every message maps to the same unit vector.
+
+import uuid
+
+import numpy as np
+import pytest
+
+import response_cache
+from tools import session
+
+
+def _place(name: str) -> dict:
+    return {"name": name, "type": "bar", "open_now": None, "final_score": 0.5}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    session.set_active(f"test-{uuid.uuid4()}")
+    session.set_location({"lat": -23.56, "lng": -46.65})
+    monkeypatch.setattr(response_cache, "embed",
+                        lambda texts: np.ones((len(texts), 4), dtype=np.float32) / 2)
+    yield response_cache.ResponseCache(10, 0.9, 3600, 6)
+    session.clear()
+
+
+def test_store_keeps_only_the_last_search(cache):
+    session.set_places([_place("Velho")])
+    session.set_places([_place("Novo A"), _place("Novo B")])
+    cache.store("bar com música ao vivo", [], "reply")
+
+    (entry,) = cache._tiles.popitem()[1]
+    assert [p["name"] for p in entry.places] == ["Novo A", "Novo B"]
+
+
+def test_entries_do_not_share_dicts_with_sessions(cache):
+    session.set_places([_place("Novo A")])
+    cache.store("bar com música ao vivo", [], "reply")
+    session.last_places()[0]["final_score"] = 0.0
+
+    session.set_active(f"test-{uuid.uuid4()}")
+    session.set_location({"lat": -23.56, "lng": -46.65})
+    assert cache.lookup("bar com musica ao vivo", []) == "reply"
+    assert session.last_places()[0]["final_score"] == 0.5
+
+    session.last_places()[0]["final_score"] = 1.0
+    assert cache.lookup("bar com musica ao vivo", []) == "reply"
+    assert session.last_places()[0]["final_score"] == 0.5
@@ -0,0 +1,72 @@
+# tests/test_router.py
+#
+# route() must only answer follow-ups about the latest search, and hand
+# anything that names a different kind of venue to the agent. The
+# classifier is stubbed out: these cases are decided by rules alone.
+
+import uuid
+
+import pytest
+
+import router
+from tools import session
+
+
+def _place(name: str, type_: str, **kw) -> dict:
+    return {"name": name, "type": type_, "address": f"Rua {name}", "rating": 4.5,
+            "ratings_total": 100, "price_level": 2, "open_now": True,
+            "distance_km": 1.0, "final_score": 0.5, **kw}
+
+
+BARS  = [_place("Bar do Zé", "bar", price_level=1), _place("Boteco Seu Jorge", "bar", price_level=2)]
+SUSHI = [_place("Sushi Yassu", "restaurant", price_level=3), _place("Temakeria Aoyama", "restaurant", price_level=0)]
+
+
+@pytest.fixture(autouse=True)
+def fresh_session(monkeypatch):
+    session.set_active(f"test-{uuid.uuid4()}")
+    monkeypatch.setattr(router, "_classify", lambda text: ("other", 0.0))
+    yield
+    session.clear()
+
+
+@pytest.mark.parametrize("text", [
+    "tem alguma pizzaria aberta agora?",
+    "me indica um restaurante japonês barato",
+    "e um bar de vinhos aberto perto?",
+    "what are the opening hours of MASP?",
+])
+def test_new_venue_kinds_go_to_the_agent(text):
+    session.set_places(BARS)
+    assert router.route(text) is None
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("qual está aberto agora?", "open_now"),
+    ("e o mais barato?", "cheapest"),
+    ("qual desses bares é o mais perto?", "closest"),
+    ("me fala mais do Bar do Zé", "details"),
+])
+def test_follow_ups_about_the_last_search_are_routed(text, intent):
+    session.set_places(BARS)
+    route = router.route(text)
+    assert route is not None and route.intent == intent
+
+
+def test_selection_uses_only_the_last_search():
+    session.set_places(BARS)
+    session.set_places(SUSHI)
+    route = router.route("o mais barato?")
+    assert route.intent == "cheapest"
+    assert "Temakeria Aoyama" in route.fallback
+    assert "Bar do Zé" not in route.fallback
+
+
+def test_details_of_an_earlier_search_go_to_the_agent():
+    session.set_places(BARS)
+    session.set_places(SUSHI)
+    assert router.route("me fala mais do Bar do Zé") is None
+
+
+def test_no_places_no_route():
+    assert router.route("qual está aberto agora?") is None
@@ -0,0 +1,76 @@
+# tests/test_search_cache.py
+#
+# Async single-flight: the caller that started a fetch can go away (client
+# disconnect, cancelled job) without leaving its key stuck in flight.
+
+import asyncio
+
+import pytest
+
+from tools.cache import SearchResultCache
+
+KEY = ("bar", "6gyf79", 500)
+
+
+def _cache() -> SearchResultCache:
+    return SearchResultCache(10, fresh_s=60, stale_s=120, precision=6)
+
+
+def test_cancelled_owner_does_not_poison_the_key():
+    async def main():
+        cache   = _cache()
+        release = asyncio.Event()
+
+        async def slow_fetch():
+            await release.wait()
+            return ["slow"]
+
+        owner = asyncio.create_task(cache.aget_or_fetch(KEY, slow_fetch))
+        await asyncio.sleep(0)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+
+        waiter = asyncio.create_task(cache.aget_or_fetch(KEY, slow_fetch))
+        release.set()
+        assert await asyncio.wait_for(waiter, 1) == ["slow"]
+        assert KEY not in cache._ainflight
+        assert await cache.aget_or_fetch(KEY, slow_fetch) == ["slow"]     # now a plain hit
+
+    asyncio.run(main())
+
+
+def test_cancelled_fetch_releases_the_key():
+    async def main():
+        cache = _cache()
+
+        async def cancelled_fetch():
+            raise asyncio.CancelledError
+
+        async def fetch():
+            return ["fresh"]
+
+        with pytest.raises(asyncio.CancelledError):
+            await cache.aget_or_fetch(KEY, cancelled_fetch)
+        assert KEY not in cache._ainflight
+        assert await asyncio.wait_for(cache.aget_or_fetch(KEY, fetch), 1) == ["fresh"]
+
+    asyncio.run(main())
+
+
+def test_failed_fetch_reaches_every_waiter():
+    async def main():
+        cache = _cache()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("maps down")
+
+        results = await asyncio.gather(cache.aget_or_fetch(KEY, failing),
+                                       cache.aget_or_fetch(KEY, failing),
+                                       return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert cache.misses == 1 and cache.coalesced == 1
+        assert KEY not in cache._ainflight
+
+    asyncio.run(main())
@@ -0,0 +1,25 @@
+# tests/test_session.py
+#
+# Session housekeeping must not block the event loop: sweep() talks to the
+# SQLite / Redis backend.
+
+import asyncio
+import threading
+
+from tools import session
+
+
+def test_sweeper_runs_sweep_off_the_loop(monkeypatch):
+    threads: list[threading.Thread] = []
+    monkeypatch.setattr(session, "SESSION_SWEEP_S", 0)
+    monkeypatch.setattr(session, "sweep", lambda: threads.append(threading.current_thread()))
+
+    async def main():
+        task = asyncio.create_task(session.sweeper())
+        while not threads:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(main())
+    assert threads and all(t is not loop_thread for t in threads)
@@ -0,0 +1,51 @@
+# tests/test_session_backends.py
+#
+# Every persistent SessionBackend round-trips a session state, deletes it and
+# expires idle ones. Redis runs on fakeredis and is skipped without it.
+
+import time
+
+import pytest
+
+from tools import session_backends as sb
+
+STATE = {
+    "location":    {"lat": -23.56, "lng": -46.68, "city": "Pinheiros", "country": ""},
+    "places":      {"Bar do Zé": {"name": "Bar do Zé", "rating": 4.5, "price_level": None,
+                                  "reviews": ["ótimo chopp"], "open_now": True}},
+    "history":     [{"role": "user", "content": "bar com música ao vivo"}],
+    "last_search": ["Bar do Zé"],
+}
+
+
+def test_sqlite_round_trip(tmp_path):
+    backend = sb.SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    assert backend.load("a") is None
+    backend.save("a", STATE)
+    assert backend.load("a") == STATE
+
+    backend.delete("a")
+    assert backend.load("a") is None
+
+
+def test_sqlite_expire(tmp_path, monkeypatch):
+    backend = sb.SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    backend.save("old", STATE)
+    now = time.time()
+    monkeypatch.setattr(sb.time, "time", lambda: now + 120)
+    backend.save("new", STATE)
+    assert backend.expire(60) == 1
+    assert backend.load("old") is None and backend.load("new") == STATE
+
+
+def test_redis_round_trip():
+    fakeredis = pytest.importorskip("fakeredis")
+    client    = fakeredis.FakeRedis()
+    backend   = sb.RedisSessionBackend(client, ttl_s=3600)
+    assert backend.load("a") is None
+    backend.save("a", STATE)
+    assert backend.load("a") == STATE
+    assert 0 < client.ttl("ivy:session:a") <= 3600      # Redis does the expiry
+
+    backend.delete("a")
+    assert backend.load("a") is None
@@ -0,0 +1,35 @@
+# tests/test_tools.py
+#
+# The sync and async bodies of search_and_rank_places agree on when a Maps
+# key is needed: only when the local venue index cannot answer.
+
+import asyncio
+import json
+
+import pytest
+
+from tools import tools
+
+
+@pytest.fixture(autouse=True)
+def no_maps_key(monkeypatch):
+    monkeypatch.delenv("GOOGLE_MAPS_API", raising=False)
+    monkeypatch.setattr(tools, "_gmaps", None)
+
+
+def _both(query: str) -> tuple[str, str]:
+    args = (query, -23.56, -46.65, 500)
+    return (tools.search_and_rank_places.func(*args),
+            asyncio.run(tools._asearch_and_rank_places(*args)))
+
+
+def test_index_answer_needs_no_maps_key(monkeypatch):
+    monkeypatch.setattr(tools, "_local_search", lambda *a: [])
+    sync, async_ = _both("bar index")
+    assert json.loads(sync) == json.loads(async_) == []
+
+
+def test_maps_fallback_reports_the_missing_key(monkeypatch):
+    monkeypatch.setattr(tools, "_local_search", lambda *a: None)
+    sync, async_ = _both("bar maps")
+    assert json.loads(sync) == json.loads(async_) == {"error": "GOOGLE_MAPS_API env variable not set"}
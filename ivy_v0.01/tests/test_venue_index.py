@@ -0,0 +1,30 @@
+# tests/test_venue_index.py
+#
+# get() is hit from several tool threads at once on the first searches: every
+# caller must get the index, built once — not None while another thread loads.
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tools import venue_index
+
+
+def test_concurrent_first_get_waits_for_the_load(monkeypatch):
+    built = []
+
+    class SlowIndex:
+        def __init__(self, path):
+            time.sleep(0.05)
+            built.append(threading.current_thread())
+
+    monkeypatch.setattr(venue_index, "VenueIndex", SlowIndex)
+    monkeypatch.setattr(venue_index, "VENUE_INDEX_PATH", "/tmp/venues")
+    monkeypatch.setattr(venue_index, "_index", None)
+    monkeypatch.setattr(venue_index, "_loaded", False)
+
+    with ThreadPoolExecutor(8) as pool:
+        got = list(pool.map(lambda _: venue_index.get(), range(8)))
+
+    assert len(built) == 1
+    assert all(isinstance(i, SlowIndex) for i in got) and len({id(i) for i in got}) == 1
@@ -0,0 +1,165 @@
+# tools/batcher.py
+#
+# Dynamic micro-batching in front of an encoder.
+#
+# Concurrent searches each call encode() with a handful of texts, and the CPU
+# runs many tiny batches one after another. EncodeBatcher puts every call on a
+# queue; one batching thread takes the first waiting call, keeps collecting
+# for up to max_wait_s (or until max_batch texts), runs a single
+# encoder.encode over all of them and hands each caller back its own rows.
+# A lone caller pays at most max_wait_s extra. Calls whose Future was
+# cancelled before their batch started (an encoder-service client that went
+# away) are dropped.
+#
+# It wraps the in-process encoder in tools.py (ENCODE_BATCH_WAIT_MS > 0) and
+# is the batching stage of the shared encoder service (encoder_service.py).
+#
+# stats(): batch sizes (texts and calls per batch, size histogram), queueing
+# delay from submit to batch start (p50/p95/max over the recent window) and
+# encode time per batch.
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from logger import log
+
+# ── Config ────────────────────────────────────────────────────────────────────
+
+ENCODE_BATCH_MAX     = int(os.getenv("ENCODE_BATCH_MAX", "64"))            # texts per encode call
+ENCODE_BATCH_WAIT_MS = float(os.getenv("ENCODE_BATCH_WAIT_MS", "2"))       # 0 → no batching
+STATS_WINDOW         = 1000                                                # recent batches kept
+
+
+class EncodeBatcher:
+    """Same encode() interface as the encoder it wraps; safe to call from any thread."""
+
+    def __init__(self, encoder, max_batch: int = ENCODE_BATCH_MAX,
+                 max_wait_s: float = ENCODE_BATCH_WAIT_MS / 1000):
+        self.encoder    = encoder
+        self.max_batch  = max_batch
+        self.max_wait_s = max_wait_s
+        self.cache_tag  = getattr(encoder, "cache_tag", "")
+        self._queue: queue.SimpleQueue[tuple[list[str], Future, float]] = queue.SimpleQueue()
+
+        self.requests = 0
+        self.batches  = 0
+        self.texts    = 0
+        self.errors   = 0
+        self._sizes:     deque[int]   = deque(maxlen=STATS_WINDOW)   # texts per batch
+        self._waits:     deque[float] = deque(maxlen=STATS_WINDOW)   # seconds queued, per call
+        self._encode_s:  deque[float] = deque(maxlen=STATS_WINDOW)
+        self._stats_lock = threading.Lock()
+
+        threading.Thread(target=self._run, name="encode-batcher", daemon=True).start()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.encoder.get_sentence_embedding_dimension()
+
+    def submit(self, texts: list[str]) -> Future:
+        """Queue texts; the Future resolves to their normalised vectors."""
+        future: Future = Future()
+        self._queue.put((list(texts), future, time.perf_counter()))
+        return future
+
+    def encode(self, texts: list[str], batch_size: int | None = None,
+               normalize_embeddings: bool = True, **_) -> np.ndarray:
+        """Blocks until the batch holding texts has run. Always L2-normalised."""
+        if not len(texts):
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        return self.submit(texts).result()
+
+    # ── Batching thread ───────────────────────────────────────────────────────
+
+    def _collect(self) -> list[tuple[list[str], Future, float]]:
+        """Block for one call, then take whatever else arrives within max_wait_s."""
+        batch    = [self._queue.get()]
+        size     = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait_s
+        while size < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._encode_batch(self._collect())
+            except Exception as e:              # never lose the only batching thread
+                log.error("batcher: batch failed: %s", e)
+
+    def _encode_batch(self, batch: list[tuple[list[str], Future, float]]) -> None:
+        # Claim each future; ones a caller already cancelled are dropped, never resolved.
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        start = time.perf_counter()
+        texts = [t for ts, _, _ in batch for t in ts]
+        try:
+            vecs = np.asarray(
+                self.encoder.encode(texts, batch_size=self.max_batch, normalize_embeddings=True),
+                dtype=np.float32,
+            )
+        except Exception as e:
+            log.error("batcher: encode of %d texts failed: %s", len(texts), e)
+            with self._stats_lock:
+                self.errors += 1
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        with self._stats_lock:
+            self._encode_s.append(time.perf_counter() - start)
+            self._sizes.append(len(texts))
+            self._waits.extend(start - queued for _, _, queued in batch)
+            self.requests += len(batch)
+            self.batches  += 1
+            self.texts    += len(texts)
+
+        row = 0
+        for ts, future, _ in batch:
+            future.set_result(vecs[row:row + len(ts)])
+            row += len(ts)
+
+    # ── Metrics ───────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            sizes  = list(self._sizes)
+            waits  = np.array(self._waits) * 1000
+            encode = np.array(self._encode_s) * 1000
+        # Histogram buckets 1, 2-3, 4-7, … up to max_batch: how often batching actually merges.
+        hist = {}
+        for size in sizes:
+            low = 1 << (size.bit_length() - 1)
+            key = f"{low}" if low == 1 else f"{low}-{2 * low - 1}"
+            hist[key] = hist.get(key, 0) + 1
+        return {
+            "requests":        self.requests,
+            "batches":         self.batches,
+            "texts":           self.texts,
+            "errors":          self.errors,
+            "avg_batch_texts": round(self.texts / self.batches, 1) if self.batches else 0.0,
+            "avg_batch_reqs":  round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "batch_texts":     dict(sorted(hist.items(), key=lambda kv: int(kv[0].split("-")[0]))),
+            "wait_ms":         _percentiles(waits),
+            "encode_ms":       _percentiles(encode),
+            "max_batch":       self.max_batch,
+            "max_wait_ms":     self.max_wait_s * 1000,
+        }
+
+
+def _percentiles(ms: np.ndarray) -> dict:
+    if not len(ms):
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    p50, p95 = np.percentile(ms, [50, 95])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "max": round(float(ms.max()), 2)}
@@ -0,0 +1,384 @@
+# tools/cache.py
+#
+# Process-wide caches in front of the Google Maps API.
+# Shared by every session — place data is the same no matter who asked for it.
+#
+# PlaceDetailsCache — gmaps.place() results keyed by place_id.
+#   Every field has its own TTL: reviews and website change slowly, opening
+#   hours do not. A lookup returns whatever is still fresh plus the list of
+#   fields that still have to be fetched, so a partial hit only pays for the
+#   stale part.
+#   Memory tier: LRU capped at PLACE_CACHE_SIZE places.
+#   Disk tier (optional): set PLACE_CACHE_DB to a file path and entries are
+#   written through to SQLite, so they survive restarts and are shared by
+#   every worker process on the host.
+#
+# SearchResultCache — gmaps.places() text-search results keyed by
+#   (normalized query, geohash tile of lat/lng, radius bucket), so two users
+#   in the same bairro asking for the same thing share one upstream call.
+#   Fresh entries are served as-is; stale ones are still served while a
+#   background thread refreshes them; past the stale window it is a miss.
+#   Concurrent misses on the same key wait for one in-flight fetch.
+#   get_or_fetch serves the sync tools, aget_or_fetch the async ones.
+#
+# Counters are exposed through stats() and served by GET /stats in api/app.py.
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Callable
+
+from logger import log
+
+# ── Config ────────────────────────────────────────────────────────────────────
+
+PLACE_FIELD_TTL_S = {
+    "website":       7 * 24 * 3600,
+    "reviews":       3 * 24 * 3600,
+    "opening_hours":      1 * 3600,
+}
+PLACE_CACHE_SIZE = int(os.getenv("PLACE_CACHE_SIZE", "5000"))
+PLACE_CACHE_DB   = os.getenv("PLACE_CACHE_DB")          # unset → memory only
+
+SEARCH_CACHE_SIZE    = int(os.getenv("SEARCH_CACHE_SIZE", "2000"))
+SEARCH_CACHE_FRESH_S = float(os.getenv("SEARCH_CACHE_FRESH_S", "900"))
+SEARCH_CACHE_STALE_S = float(os.getenv("SEARCH_CACHE_STALE_S", str(6 * 3600)))
+SEARCH_CACHE_GEOHASH = int(os.getenv("SEARCH_CACHE_GEOHASH", "6"))   # ≈1.2 × 0.6 km
+SEARCH_RADIUS_BUCKETS_M = (500, 1000, 2000, 5000, 10_000, 50_000)
+
+
+# ── Place details ─────────────────────────────────────────────────────────────
+
+class PlaceDetailsCache:
+    """LRU of place_id → {field: (value, stored_at)} with per-field TTLs."""
+
+    def __init__(self, max_entries: int, field_ttl: dict[str, float],
+                 db_path: str | None = None):
+        self._mem: OrderedDict[str, dict[str, tuple]] = OrderedDict()
+        self._max  = max_entries
+        self._ttl  = field_ttl
+        self._lock = threading.Lock()
+        self._db   = self._open_db(db_path) if db_path else None
+
+        self.hits         = 0
+        self.partial_hits = 0
+        self.misses       = 0
+        self.evictions    = 0
+
+    @staticmethod
+    def _open_db(path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS place_details ("
+            "  place_id  TEXT NOT NULL,"
+            "  field     TEXT NOT NULL,"
+            "  value     TEXT,"
+            "  stored_at REAL NOT NULL,"
+            "  PRIMARY KEY (place_id, field))"
+        )
+        db.commit()
+        log.info("place cache: SQLite tier at %s", path)
+        return db
+
+    def _load(self, place_id: str) -> dict[str, tuple] | None:
+        """Memory first, then disk. Caller holds the lock."""
+        entry = self._mem.get(place_id)
+        if entry is not None:
+            self._mem.move_to_end(place_id)
+            return entry
+        if self._db is None:
+            return None
+
+        rows = self._db.execute(
+            "SELECT field, value, stored_at FROM place_details WHERE place_id = ?",
+            (place_id,),
+        ).fetchall()
+        if not rows:
+            return None
+        entry = {field: (json.loads(value), stored_at) for field, value, stored_at in rows}
+        self._insert(place_id, entry)
+        return entry
+
+    def _insert(self, place_id: str, entry: dict[str, tuple]) -> None:
+        """Put an entry in the memory tier and evict past the cap. Caller holds the lock."""
+        self._mem[place_id] = entry
+        self._mem.move_to_end(place_id)
+        while len(self._mem) > self._max:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+    def lookup(self, place_id: str, fields: list[str]) -> tuple[dict, list[str]]:
+        """
+        Return (fresh, missing): the cached values still within their TTL,
+        and the fields that must be fetched from Maps.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._load(place_id) or {}
+            fresh, missing = {}, []
+            for field in fields:
+                cached = entry.get(field)
+                if cached is not None and now - cached[1] < self._ttl.get(field, 0):
+                    fresh[field] = cached[0]
+                else:
+                    missing.append(field)
+
+            if not missing:
+                self.hits += 1
+            elif fresh:
+                self.partial_hits += 1
+            else:
+                self.misses += 1
+        return fresh, missing
+
+    def store(self, place_id: str, fields: list[str], result: dict) -> None:
+        """
+        Cache the requested fields from a gmaps.place() result.
+        Fields absent from the result are stored as None — a place without a
+        website should not cost a detail call on every search.
+        """
+        now = time.time()
+        with self._lock:
+            entry = dict(self._load(place_id) or {})
+            for field in fields:
+                entry[field] = (result.get(field), now)
+            self._insert(place_id, entry)
+
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO place_details VALUES (?, ?, ?, ?)",
+                    [(place_id, f, json.dumps(result.get(f), ensure_ascii=False), now)
+                     for f in fields],
+                )
+                self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.partial_hits + self.misses
+        return {
+            "entries":      len(self._mem),
+            "hits":         self.hits,
+            "partial_hits": self.partial_hits,
+            "misses":       self.misses,
+            "evictions":    self.evictions,
+            "hit_rate":     round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+place_details = PlaceDetailsCache(PLACE_CACHE_SIZE, PLACE_FIELD_TTL_S, PLACE_CACHE_DB)
+
+
+# ── Search results ────────────────────────────────────────────────────────────
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat: float, lng: float, precision: int) -> str:
+    """Standard geohash — nearby points share a prefix, one char ≈ 5 bits."""
+    lat_rng, lng_rng = [-90.0, 90.0], [-180.0, 180.0]
+    out, ch, bit, even = [], 0, 0, True
+    while len(out) < precision:
+        rng, val = (lng_rng, lng) if even else (lat_rng, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if val >= mid:
+            ch, rng[0] = (ch << 1) | 1, mid
+        else:
+            ch, rng[1] = ch << 1, mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            out.append(_GEOHASH_BASE32[ch])
+            ch, bit = 0, 0
+    return "".join(out)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, strip accents and collapse whitespace: 'Bar  com Música' → 'bar com musica'."""
+    text = unicodedata.normalize("NFKD", query.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def radius_bucket(radius_m: int) -> int:
+    for bucket in SEARCH_RADIUS_BUCKETS_M:
+        if radius_m <= bucket:
+            return bucket
+    return SEARCH_RADIUS_BUCKETS_M[-1]
+
+
+class SearchResultCache:
+    """LRU of tiled text-search results with stale-while-revalidate."""
+
+    def __init__(self, max_entries: int, fresh_s: float, stale_s: float, precision: int):
+        self._mem: OrderedDict[tuple, tuple[list, float]] = OrderedDict()
+        self._inflight: dict[tuple, Future] = {}
+        self._ainflight: dict[tuple, asyncio.Future] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._max       = max_entries
+        self._fresh_s   = fresh_s
+        self._stale_s   = stale_s
+        self._precision = precision
+        self._lock      = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="search-refresh")
+
+        self.hits       = 0
+        self.stale_hits = 0
+        self.misses     = 0
+        self.coalesced  = 0
+        self.refreshes  = 0
+        self.evictions  = 0
+
+    def key(self, query: str, lat: float, lng: float, radius_m: int) -> tuple:
+        return (normalize_query(query), geohash(lat, lng, self._precision), radius_bucket(radius_m))
+
+    def _peek(self, key: tuple) -> tuple[list | None, bool]:
+        """
+        Return (results, needs_refresh) for a servable entry, (None, False)
+        when it is missing or past the stale window. Caller holds the lock.
+        """
+        cached = self._mem.get(key)
+        if cached is None:
+            return None, False
+        results, stored_at = cached
+        age = time.time() - stored_at
+        if age >= self._stale_s:
+            return None, False
+
+        self._mem.move_to_end(key)
+        if age < self._fresh_s:
+            self.hits += 1
+            log.debug("search cache: hit %s (age %.0fs)", key, age)
+            return results, False
+        self.stale_hits += 1
+        log.debug("search cache: stale hit %s (age %.0fs) — refreshing", key, age)
+        return results, True
+
+    def _store(self, key: tuple, results: list) -> None:
+        """Caller holds the lock."""
+        self._mem[key] = (results, time.time())
+        self._mem.move_to_end(key)
+        while len(self._mem) > self._max:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_fetch(self, key: tuple, fetch: Callable[[], list]) -> list:
+        """
+        Return cached results for key, calling fetch() only when needed.
+        fetch must be safe to run on a background thread — it is reused for refreshes.
+        """
+        with self._lock:
+            results, refresh = self._peek(key)
+            if results is not None:
+                if refresh and key not in self._inflight:
+                    self._inflight[key] = Future()
+                    self._refresher.submit(self._run_fetch, key, fetch)
+                    self.refreshes += 1
+                return results
+
+            pending = self._inflight.get(key)
+            owner   = pending is None
+            if owner:
+                pending = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if owner:
+            self._run_fetch(key, fetch)
+        else:
+            log.debug("search cache: waiting on in-flight fetch for %s", key)
+        return pending.result()
+
+    def _run_fetch(self, key: tuple, fetch: Callable[[], list]) -> None:
+        """Run fetch, store the result and wake everyone waiting on the key."""
+        with self._lock:
+            pending = self._inflight[key]
+        try:
+            results = fetch()
+        except Exception as e:
+            log.warning("search cache: fetch failed for %s: %s", key, e)
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.set_exception(e)
+            return
+
+        with self._lock:
+            self._store(key, results)
+            self._inflight.pop(key, None)
+        pending.set_result(results)
+
+    # Async path — same entries and counters, but in-flight fetches are
+    # asyncio futures on the running loop, and every fetch (a miss or a
+    # refresh) runs as a tracked task: a caller that is cancelled while
+    # waiting never takes the fetch, or the key, down with it.
+
+    async def aget_or_fetch(self, key: tuple, fetch: Callable[[], Awaitable[list]]) -> list:
+        """Async twin of get_or_fetch — fetch is a coroutine function."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            results, refresh = self._peek(key)
+            if results is not None:
+                if refresh and key not in self._ainflight:
+                    self._ainflight[key] = loop.create_future()
+                    self._spawn(loop, key, fetch)
+                    self.refreshes += 1
+                return results
+
+            pending = self._ainflight.get(key)
+            if pending is None:
+                pending = self._ainflight[key] = loop.create_future()
+                self._spawn(loop, key, fetch)
+                self.misses += 1
+            else:
+                self.coalesced += 1
+                log.debug("search cache: waiting on in-flight fetch for %s", key)
+        return await asyncio.shield(pending)
+
+    def _spawn(self, loop: asyncio.AbstractEventLoop, key: tuple,
+               fetch: Callable[[], Awaitable[list]]) -> None:
+        task = loop.create_task(self._arun_fetch(key, fetch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _arun_fetch(self, key: tuple, fetch: Callable[[], Awaitable[list]]) -> None:
+        pending = self._ainflight[key]
+        try:
+            results = await fetch()
+            with self._lock:
+                self._store(key, results)
+            pending.set_result(results)
+        except Exception as e:
+            log.warning("search cache: fetch failed for %s: %s", key, e)
+            pending.set_exception(e)
+            pending.exception()     # mark retrieved — a failed refresh has no waiter
+        except BaseException:
+            pending.cancel()        # the fetch task itself was cancelled (shutdown)
+            raise
+        finally:
+            self._ainflight.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "entries":    len(self._mem),
+            "hits":       self.hits,
+            "stale_hits": self.stale_hits,
+            "misses":     self.misses,
+            "coalesced":  self.coalesced,
+            "refreshes":  self.refreshes,
+            "evictions":  self.evictions,
+            "hit_rate":   round((self.hits + self.stale_hits + self.coalesced) / lookups, 3)
+                          if lookups else 0.0,
+        }
+
+
+search_results = SearchResultCache(
+    SEARCH_CACHE_SIZE, SEARCH_CACHE_FRESH_S, SEARCH_CACHE_STALE_S, SEARCH_CACHE_GEOHASH,
+)
@@ -0,0 +1,232 @@
+# tools/embeddings.py
+#
+# Content-addressed embedding cache for the ranking stage.
+#
+# search_and_rank_places embeds the query plus one text per place on every
+# call. The same place with the same reviews produces the same text, so its
+# vector is looked up by a hash of that text instead of re-running the model.
+#
+# Memory tier: LRU of hash → float32 vector, capped at EMBED_CACHE_SIZE.
+# Disk tier (optional): set EMBED_CACHE_PATH and vectors are also written to
+#   a memory-mapped .npy matrix of EMBED_CACHE_ROWS rows, used as a ring, with
+#   a sidecar .idx file of "slot hash" lines. The OS page cache keeps hot rows
+#   in RAM and the vectors survive restarts. One writer process per file.
+#   The .idx is rewritten to one line per live slot whenever it reaches
+#   2 × EMBED_CACHE_ROWS lines, so it stays bounded as the ring wraps.
+#
+# All vectors are L2-normalised (normalize_embeddings=True), matching how
+# tools.py scores with a plain dot product.
+#
+# Reviews are embedded one chunk at a time, not as one joined blob that
+# MiniLM would truncate after 256 word pieces. chunk_text / pack / aggregate
+# lay the chunks of many places out as one flat list plus CSR offsets and
+# reduce their similarities back to one score per place with NumPy.
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from logger import log
+
+# ── Config ────────────────────────────────────────────────────────────────────
+
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "20000"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH")        # unset → memory only
+EMBED_CACHE_ROWS = int(os.getenv("EMBED_CACHE_ROWS", "200000"))
+
+REVIEW_CHUNK_WORDS = int(os.getenv("REVIEW_CHUNK_WORDS", "120"))   # fits MiniLM's 256 pieces
+REVIEW_MAX_WEIGHT  = float(os.getenv("REVIEW_MAX_WEIGHT", "0.7"))  # max vs mean per place
+
+
+# ── Disk tier ─────────────────────────────────────────────────────────────────
+
+class _MemmapStore:
+    """Fixed-size ring of float32 rows in a .npy file, indexed by content hash."""
+
+    def __init__(self, path: str, rows: int, dim: int):
+        self._npy = Path(path).with_suffix(".npy")
+        self._idx = Path(path).with_suffix(".idx")
+
+        if self._npy.exists():
+            self._mat = np.lib.format.open_memmap(self._npy, mode="r+")
+            if self._mat.shape[1] != dim:
+                raise ValueError(f"{self._npy} has dim {self._mat.shape[1]}, encoder has {dim}")
+        else:
+            self._mat = np.lib.format.open_memmap(
+                self._npy, mode="w+", dtype=np.float32, shape=(rows, dim),
+            )
+
+        # Replay the index — a later line for the same slot overwrites the earlier one,
+        # and the ring cursor resumes after the last slot written.
+        self._slot_of: dict[str, int] = {}
+        self._hash_at: dict[int, str] = {}
+        self._cursor = 0
+        self._lines  = 0
+        if self._idx.exists():
+            for line in self._idx.read_text().splitlines():
+                slot_s, key = line.split(" ", 1)
+                self._assign(int(slot_s), key)
+                self._cursor = (int(slot_s) + 1) % len(self._mat)
+                self._lines += 1
+        self._idx_f = open(self._idx, "a", encoding="ascii")
+        if self._lines >= 2 * len(self._mat):
+            self._compact()
+        log.info("embedding cache: memmap %s (%d/%d rows used)",
+                 self._npy, len(self._slot_of), len(self._mat))
+
+    def _assign(self, slot: int, key: str) -> None:
+        old = self._hash_at.get(slot)
+        if old is not None:
+            self._slot_of.pop(old, None)
+        self._hash_at[slot] = key
+        self._slot_of[key]  = slot
+
+    def _compact(self) -> None:
+        """Rewrite the index with one line per live slot, oldest first, so it stops growing."""
+        rows  = len(self._mat)
+        order = [(self._cursor + i) % rows for i in range(rows)]
+        tmp   = self._idx.with_suffix(".idx.tmp")
+        with open(tmp, "w", encoding="ascii") as f:
+            f.writelines(f"{slot} {self._hash_at[slot]}\n" for slot in order if slot in self._hash_at)
+        self._idx_f.close()
+        os.replace(tmp, self._idx)
+        self._idx_f = open(self._idx, "a", encoding="ascii")
+        self._lines = len(self._hash_at)
+
+    def get(self, key: str) -> np.ndarray | None:
+        slot = self._slot_of.get(key)
+        return None if slot is None else np.array(self._mat[slot])
+
+    def put(self, key: str, vec: np.ndarray) -> None:
+        if key in self._slot_of:
+            return
+        slot = self._cursor
+        self._mat[slot] = vec
+        self._assign(slot, key)
+        self._idx_f.write(f"{slot} {key}\n")
+        self._idx_f.flush()
+        self._cursor = (slot + 1) % len(self._mat)
+        self._lines += 1
+        if self._lines >= 2 * len(self._mat):      # every disk_rows overwrites
+            self._compact()
+
+
+# ── Cache ─────────────────────────────────────────────────────────────────────
+
+class EmbeddingCache:
+    """Wraps encoder.encode() so only texts never seen before reach the model."""
+
+    def __init__(self, max_entries: int, path: str | None = None, disk_rows: int = 0):
+        self._mem: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._max       = max_entries
+        self._path      = path
+        self._disk_rows = disk_rows
+        self._disk: _MemmapStore | None = None
+        self._lock      = threading.Lock()
+
+        self.hits      = 0
+        self.disk_hits = 0
+        self.misses    = 0
+
+    @staticmethod
+    def _key(text: str, tag: str = "") -> str:
+        # tag: encoder.cache_tag, set by backends whose vectors differ (int8 weights)
+        return hashlib.blake2b((tag + "\0" + text if tag else text).encode("utf-8"),
+                               digest_size=16).hexdigest()
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        """Caller holds the lock."""
+        self._mem[key] = vec
+        self._mem.move_to_end(key)
+        while len(self._mem) > self._max:
+            self._mem.popitem(last=False)
+
+    def encode(self, encoder, texts: list[str]) -> np.ndarray:
+        """Return normalised embeddings for texts, shape (len(texts), dim)."""
+        tag  = getattr(encoder, "cache_tag", "")
+        keys = [self._key(t, tag) for t in texts]
+        vecs: dict[str, np.ndarray] = {}
+
+        with self._lock:
+            if self._path and self._disk is None:
+                self._disk = _MemmapStore(
+                    self._path, self._disk_rows, encoder.get_sentence_embedding_dimension(),
+                )
+            for key in keys:
+                if key in vecs:
+                    continue
+                vec = self._mem.get(key)
+                if vec is not None:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                elif self._disk is not None and (vec := self._disk.get(key)) is not None:
+                    self._remember(key, vec)
+                    self.disk_hits += 1
+                if vec is not None:
+                    vecs[key] = vec
+
+        todo = {key: text for key, text in zip(keys, texts) if key not in vecs}
+        if todo:
+            fresh = encoder.encode(list(todo.values()), normalize_embeddings=True)
+            fresh = np.asarray(fresh, dtype=np.float32)
+            with self._lock:
+                for key, vec in zip(todo, fresh):
+                    vecs[key] = vec
+                    self._remember(key, vec)
+                    if self._disk is not None:
+                        self._disk.put(key, vec)
+                self.misses += len(todo)
+
+        return np.stack([vecs[key] for key in keys])
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries":   len(self._mem),
+            "hits":      self.hits,
+            "disk_hits": self.disk_hits,
+            "misses":    self.misses,
+            "hit_rate":  round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+        }
+
+
+store = EmbeddingCache(EMBED_CACHE_SIZE, EMBED_CACHE_PATH, EMBED_CACHE_ROWS)
+
+
+# ── Multi-vector ──────────────────────────────────────────────────────────────
+
+def chunk_text(text: str, max_words: int = REVIEW_CHUNK_WORDS) -> list[str]:
+    """Split text into chunks of at most max_words words. Empty text → no chunks."""
+    words = text.split()
+    return [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words)]
+
+
+def pack(groups: list[list[str]]) -> tuple[list[str], np.ndarray]:
+    """Flatten per-place chunk lists: (all chunks, offsets) with group i at offsets[i]:offsets[i+1]."""
+    flat    = [text for group in groups for text in group]
+    offsets = np.zeros(len(groups) + 1, dtype=np.int64)
+    np.cumsum([len(g) for g in groups], out=offsets[1:])
+    return flat, offsets
+
+
+def aggregate(sims: np.ndarray, offsets: np.ndarray,
+              max_weight: float = REVIEW_MAX_WEIGHT) -> np.ndarray:
+    """
+    One score per group from per-chunk similarities:
+    max_weight · max-sim + (1 − max_weight) · mean. NaN for groups without chunks.
+    """
+    counts = np.diff(offsets)
+    out    = np.full(len(counts), np.nan, dtype=np.float32)
+    filled = counts > 0
+    if filled.any():
+        # Empty groups have zero length, so each non-empty slice still ends
+        # exactly where the next non-empty one starts.
+        starts      = offsets[:-1][filled]
+        best        = np.maximum.reduceat(sims, starts)
+        mean        = np.add.reduceat(sims, starts) / counts[filled]
+        out[filled] = max_weight * best + (1 - max_weight) * mean
+    return out
@@ -0,0 +1,185 @@
+# tools/encoder.py
+#
+# The sentence encoder behind tools.embed() and the ingestion job, on a
+# choice of CPU runtime (ENCODER_BACKEND):
+#
+#   torch      — sentence-transformers on PyTorch, full precision (default)
+#   onnx       — the same model exported to ONNX, run by ONNX Runtime
+#   onnx-int8  — that graph with dynamically quantized int8 weights: about a
+#                quarter of the size and the fastest of the three on CPU
+#
+# Every backend has the slice of the SentenceTransformer API that callers
+# use: encode(texts, batch_size=, normalize_embeddings=) and
+# get_sentence_embedding_dimension(). The ONNX backends need only
+# onnxruntime + tokenizers at run time, so a worker that uses them never
+# imports torch, which is most of the cold-start cost. Those extras are in
+# requirements-onnx.txt.
+#
+# Threads: ONNX Runtime's intra-op pool defaults to every core, and several
+# uvicorn workers on one box then fight over them. ENCODER_THREADS pins it.
+# The default is cores / WEB_CONCURRENCY.
+#
+# Export once (needs torch + sentence-transformers + onnx):
+#   python -m tools.encoder export [dir]
+# Latency, throughput and cosine agreement against PyTorch:
+#   python -m bench.encoder_backends
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from logger import log
+
+# ── Config ────────────────────────────────────────────────────────────────────
+
+ENCODER_MODEL    = os.getenv("ENCODER_MODEL", "all-MiniLM-L6-v2")
+ENCODER_BACKEND  = os.getenv("ENCODER_BACKEND", "torch")
+ENCODER_ONNX_DIR = os.getenv("ENCODER_ONNX_DIR",
+                             str(Path(__file__).resolve().parent.parent / "models" / "minilm-onnx"))
+ENCODER_THREADS  = int(os.getenv("ENCODER_THREADS", "0"))     # 0 → cores / workers
+
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model_int8.onnx"}
+TOKENIZER_FILE = "tokenizer.json"
+BACKENDS = ("torch", *ONNX_FILES)
+
+
+def _threads() -> int:
+    if ENCODER_THREADS > 0:
+        return ENCODER_THREADS
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+# ── ONNX Runtime backend ──────────────────────────────────────────────────────
+
+class OnnxEncoder:
+    """MiniLM on ONNX Runtime: tokenizers → transformer graph → mean pooling."""
+
+    def __init__(self, path: str, threads: int):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads     = threads
+        opts.inter_op_num_threads     = 1
+        opts.execution_mode           = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self.inputs  = {i.name for i in self.session.get_inputs()}
+        self.dim     = self.session.get_outputs()[0].shape[-1]
+
+        # Truncation to the model's max_seq_length is saved in the file by export().
+        self.tokenizer = Tokenizer.from_file(str(Path(path).with_name(TOKENIZER_FILE)))
+        pad = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad, pad_token="[PAD]")
+
+        # Embeddings differ slightly once weights are int8: keep them apart in the cache.
+        self.cache_tag = "" if Path(path).name == ONNX_FILES["onnx"] else Path(path).stem
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts: list[str], batch_size: int = 32,
+               normalize_embeddings: bool = False, **_) -> np.ndarray:
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        # Longest first, like sentence-transformers: similar lengths share a
+        # batch, so little of each batch is padding.
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            enc  = self.tokenizer.encode_batch([texts[i] for i in rows])
+            ids  = np.array([e.ids for e in enc], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in enc], dtype=np.int64)
+            feed = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self.inputs:
+                feed["token_type_ids"] = np.zeros_like(ids)
+            hidden = self.session.run(None, feed)[0]
+            m = mask[..., None].astype(np.float32)
+            out[rows] = (hidden * m).sum(axis=1) / np.maximum(m.sum(axis=1), 1e-9)
+        if normalize_embeddings:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out
+
+
+# ── Loading ───────────────────────────────────────────────────────────────────
+
+def load(backend: str = ENCODER_BACKEND, threads: int | None = None):
+    """A new encoder for `backend`. threads overrides ENCODER_THREADS (pool workers pass their share)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend {backend!r}, expected one of {BACKENDS}")
+    log.info("Loading %s encoder (%s)", backend, ENCODER_MODEL)
+    t0 = time.perf_counter()
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        if threads or ENCODER_THREADS > 0:
+            import torch
+            torch.set_num_threads(threads or ENCODER_THREADS)
+        encoder = SentenceTransformer(ENCODER_MODEL)
+    else:
+        path = os.path.join(ENCODER_ONNX_DIR, ONNX_FILES[backend])
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} missing, run: python -m tools.encoder export")
+        encoder = OnnxEncoder(path, threads or _threads())
+    log.info("Encoder loaded in %.2fs", time.perf_counter() - t0)
+    return encoder
+
+
+# ── Export ────────────────────────────────────────────────────────────────────
+
+def export(out_dir: str = ENCODER_ONNX_DIR) -> None:
+    """Write model.onnx, model_int8.onnx and tokenizer.json for ENCODER_MODEL."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    from sentence_transformers import SentenceTransformer
+
+    class Hidden(torch.nn.Module):
+        """Keyword call, one output: forward()'s positional order varies by version."""
+        def __init__(self, bert):
+            super().__init__()
+            self.bert = bert
+
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            return self.bert(input_ids=input_ids, attention_mask=attention_mask,
+                             token_type_ids=token_type_ids).last_hidden_state
+
+    out   = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    model = SentenceTransformer(ENCODER_MODEL, device="cpu")
+    bert  = Hidden(model[0].auto_model).eval()
+
+    sample = model.tokenizer(["an export sample"], return_tensors="pt")
+    names  = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    axes   = {n: {0: "batch", 1: "tokens"} for n in (*names, "last_hidden_state")}
+    with torch.no_grad():
+        torch.onnx.export(
+            bert, tuple(sample[n] for n in names), str(out / ONNX_FILES["onnx"]),
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes=axes, opset_version=17, dynamo=False,
+        )
+    log.info("exported %s", out / ONNX_FILES["onnx"])
+
+    # Shape inference + graph fusion first, so every MatMul gets quantized.
+    pre = out / "model_pre.onnx"
+    quant_pre_process(str(out / ONNX_FILES["onnx"]), str(pre), auto_merge=True)
+    quantize_dynamic(
+        str(pre), str(out / ONNX_FILES["onnx-int8"]),
+        weight_type=QuantType.QInt8, per_channel=True,
+    )
+    pre.unlink()
+    log.info("quantized %s", out / ONNX_FILES["onnx-int8"])
+
+    tok = model.tokenizer.backend_tokenizer
+    tok.no_padding()
+    tok.enable_truncation(model.max_seq_length)
+    tok.save(str(out / TOKENIZER_FILE))
+    log.info("saved %s", out / TOKENIZER_FILE)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "export":
+        sys.exit("usage: python -m tools.encoder export [dir]")
+    export(*sys.argv[2:3])
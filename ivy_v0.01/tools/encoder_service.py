@@ -0,0 +1,196 @@
+# tools/encoder_service.py
+#
+# One encoder process for every uvicorn worker on the host.
+#
+# With N workers, the in-process encoder means N copies of the weights and
+# N encoders that each run mostly batch-1 calls. Set ENCODER_SERVICE to a
+# Unix socket path, start the service once next to the API:
+#
+#   python -m tools.encoder_service            # listens on $ENCODER_SERVICE
+#
+# and tools._get_encoder() hands out a RemoteEncoder instead of loading a
+# model: same encode() / get_sentence_embedding_dimension() / cache_tag, so
+# the embedding cache and ranking code do not change. Workers then never
+# import torch or onnxruntime, and memory stays flat as workers are added.
+#
+# The service micro-batches with tools/batcher.py: the texts of every request
+# that lands within ENCODER_SERVICE_MAX_WAIT_MS (or until
+# ENCODER_SERVICE_MAX_BATCH texts) are encoded in one call to the configured
+# backend (tools/encoder.py). Each caller gets its own rows back.
+#
+# Wire format, little-endian, one request in flight per connection:
+#   hello    ← u32 dim, u32 len, cache_tag utf-8
+#   request  → u32 len, JSON array of texts utf-8
+#   response ← u32 rows, u32 dim, rows × dim float32      (L2-normalised)
+#   error    ← u32 0xFFFFFFFF, u32 len, message utf-8
+#   stats    → u32 0                     ← u32 len, JSON batcher stats utf-8
+
+import asyncio
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from logger import log
+from tools.batcher import EncodeBatcher
+
+# ── Config ────────────────────────────────────────────────────────────────────
+
+ENCODER_SERVICE            = os.getenv("ENCODER_SERVICE")              # socket path; unset → in-process
+ENCODER_SERVICE_MAX_BATCH  = int(os.getenv("ENCODER_SERVICE_MAX_BATCH", "64"))
+ENCODER_SERVICE_MAX_WAIT_S = float(os.getenv("ENCODER_SERVICE_MAX_WAIT_MS", "5")) / 1000
+ENCODER_SERVICE_CONNECT_S  = float(os.getenv("ENCODER_SERVICE_CONNECT_S", "30"))  # service may start after us
+
+_U32   = struct.Struct("<I")
+_PAIR  = struct.Struct("<II")
+_ERROR = 0xFFFFFFFF
+
+
+# ── Server ────────────────────────────────────────────────────────────────────
+
+class EncoderService:
+    """Accepts encode requests from any number of connections, batches them."""
+
+    def __init__(self, encoder, max_batch: int = ENCODER_SERVICE_MAX_BATCH,
+                 max_wait_s: float = ENCODER_SERVICE_MAX_WAIT_S):
+        self.batcher   = EncodeBatcher(encoder, max_batch, max_wait_s)
+        self.dim       = encoder.get_sentence_embedding_dimension()
+        self.cache_tag = getattr(encoder, "cache_tag", "")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tag = self.cache_tag.encode()
+        writer.write(_PAIR.pack(self.dim, len(tag)) + tag)
+        try:
+            while True:
+                (size,) = _U32.unpack(await reader.readexactly(4))
+                if size == 0:
+                    body = json.dumps(self.batcher.stats()).encode()
+                    writer.write(_U32.pack(len(body)) + body)
+                    await writer.drain()
+                    continue
+                texts = json.loads(await reader.readexactly(size))
+                try:
+                    vecs = np.ascontiguousarray(await asyncio.wrap_future(self.batcher.submit(texts)))
+                    writer.write(_PAIR.pack(len(vecs), self.dim) + vecs.tobytes())
+                except Exception as e:
+                    msg = str(e).encode()
+                    writer.write(_PAIR.pack(_ERROR, len(msg)) + msg)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass                                # worker went away
+        finally:
+            writer.close()
+
+
+async def serve(path: str) -> None:
+    """Load the configured encoder and serve it on `path` until cancelled."""
+    from tools import encoder as encoders
+
+    service = EncoderService(await asyncio.to_thread(encoders.load))
+    if os.path.exists(path):
+        os.unlink(path)                         # stale socket from a previous run
+    server = await asyncio.start_unix_server(service.handle, path=path)
+    log.info("encoder_service: listening on %s (max batch %d, max wait %.1f ms)",
+             path, service.batcher.max_batch, service.batcher.max_wait_s * 1000)
+    async with server:
+        while True:
+            await asyncio.sleep(60)
+            log.info("encoder_service: %s", service.batcher.stats())
+
+
+# ── Client ────────────────────────────────────────────────────────────────────
+
+class RemoteEncoder:
+    """Drop-in for the in-process encoder. One connection per calling thread."""
+
+    def __init__(self, path: str, connect_s: float = ENCODER_SERVICE_CONNECT_S):
+        self.path      = path
+        self.connect_s = connect_s
+        self._local    = threading.local()
+        self._sock()                            # fail (or wait) now, not mid-request
+
+    def _sock(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            return sock
+        deadline = time.monotonic() + self.connect_s
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+                break
+            except OSError:
+                sock.close()
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+        dim, size      = _PAIR.unpack(_recv(sock, _PAIR.size))
+        self.dim       = dim
+        self.cache_tag = _recv(sock, size).decode()
+        self._local.sock = sock
+        return sock
+
+    def _drop(self) -> None:
+        sock, self._local.sock = getattr(self._local, "sock", None), None
+        if sock is not None:
+            sock.close()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def stats(self) -> dict:
+        """The service's batching counters (shared by every worker)."""
+        sock = self._sock()
+        try:
+            sock.sendall(_U32.pack(0))
+            (size,) = _U32.unpack(_recv(sock, _U32.size))
+            return json.loads(_recv(sock, size))
+        except OSError:
+            self._drop()
+            raise
+
+    def encode(self, texts: list[str], batch_size: int | None = None,
+               normalize_embeddings: bool = True, **_) -> np.ndarray:
+        """Always L2-normalised — every caller asks for that. batch_size is the service's call."""
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        payload = json.dumps(list(texts)).encode()
+        for attempt in range(2):                # one reconnect if the service restarted
+            try:
+                sock = self._sock()
+                sock.sendall(_U32.pack(len(payload)) + payload)
+                rows, n = _PAIR.unpack(_recv(sock, _PAIR.size))
+                body    = _recv(sock, n if rows == _ERROR else rows * n * 4)
+                break
+            except OSError:                     # incl. ConnectionError: never reuse a half-read stream
+                self._drop()
+                if attempt:
+                    raise
+        if rows == _ERROR:
+            raise RuntimeError(f"encoder service: {body.decode()}")
+        return np.frombuffer(body, dtype=np.float32).reshape(rows, n)
+
+
+def _recv(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("encoder service closed the connection")
+        buf += chunk
+    return bytes(buf)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else ENCODER_SERVICE
+    if not path:
+        sys.exit("usage: python -m tools.encoder_service [socket path]  (or set ENCODER_SERVICE)")
+    try:
+        asyncio.run(serve(path))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,145 @@
+# tools/ranking.py
+#
+# Vectorised place ranking: the final score of search_and_rank_places for
+# any number of candidates at once.
+#
+# Candidates are columnar — one float64 array per field, NaN where Google
+# gave nothing — so every component is a handful of NumPy ops instead of a
+# Python call per place:
+#
+#   semantic   (sem + 1) / 2            cosine → [0, 1]
+#   rating     rating / 5 · confidence   confidence = log1p(n) / log1p(10 000)
+#   proximity  1 − distance / radius     0.5 when the place has no location
+#   price      1 − price_level / 4       0.5 when unknown
+#
+# final = Σ weight · component, weights from RANK_W_* (Weights). top_k picks
+# the best k with argpartition, so ranking 100k venue-index candidates costs
+# one O(n) pass plus a sort of k (VenueIndex.search).
+#
+# tests/test_ranking.py holds these to the per-place scoring they replaced.
+#
+# Scaling: python -m bench.ranking
+
+import math
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+# ── Weights ───────────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class Weights:
+    semantic:  float = float(os.getenv("RANK_W_SEMANTIC",  "0.60"))
+    rating:    float = float(os.getenv("RANK_W_RATING",    "0.15"))
+    proximity: float = float(os.getenv("RANK_W_PROXIMITY", "0.15"))
+    price:     float = float(os.getenv("RANK_W_PRICE",     "0.10"))
+
+
+RATING_CONFIDENCE_AT = 10_000        # reviews for full confidence in a rating
+
+
+# ── Candidates ────────────────────────────────────────────────────────────────
+
+def _column(values) -> np.ndarray:
+    """Floats with None (or anything non-numeric) as NaN."""
+    try:
+        return np.array(values, dtype=np.float64)         # None → NaN already
+    except (TypeError, ValueError):
+        pass
+    out = np.full(len(values), np.nan)
+    for i, v in enumerate(values):
+        try:
+            out[i] = float(v)
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+@dataclass
+class Candidates:
+    """One array per field, aligned by candidate index. NaN = missing."""
+    lat:           np.ndarray
+    lng:           np.ndarray
+    rating:        np.ndarray
+    ratings_total: np.ndarray
+    price_level:   np.ndarray
+    sem:           np.ndarray        # cosine similarity to the query
+
+    @classmethod
+    def from_places(cls, places: list[dict], sem: np.ndarray) -> "Candidates":
+        """Columns from session place dicts (tools._to_place shape).
+
+        A lat or lng of 0 counts as missing, as it always has for these dicts.
+        """
+        return cls(
+            lat           = _column([p.get("lat") or None for p in places]),
+            lng           = _column([p.get("lng") or None for p in places]),
+            rating        = _column([p.get("rating") for p in places]),
+            ratings_total = _column([p.get("ratings_total") for p in places]),
+            price_level   = _column([p.get("price_level") for p in places]),
+            sem           = np.asarray(sem, dtype=np.float64),
+        )
+
+
+@dataclass
+class Scores:
+    distance_km: np.ndarray          # NaN without a location
+    semantic:    np.ndarray
+    rating:      np.ndarray
+    proximity:   np.ndarray
+    price:       np.ndarray
+    final:       np.ndarray
+
+
+# ── Components ────────────────────────────────────────────────────────────────
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Great-circle distance from (lat, lng) to every (lats, lngs)."""
+    lat1, lat2 = math.radians(lat), np.radians(lats)
+    dlat = lat2 - lat1
+    dlng = np.radians(lngs) - math.radians(lng)
+    a    = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 6371 * 2 * np.arcsin(np.sqrt(a))
+
+
+def semantic_scores(sem: np.ndarray) -> np.ndarray:
+    return np.clip((sem + 1.0) / 2.0, 0.0, 1.0)
+
+
+def rating_scores(rating: np.ndarray, total: np.ndarray) -> np.ndarray:
+    """0 without a rating; a missing count gives zero confidence."""
+    conf = np.clip(np.log1p(np.nan_to_num(total, nan=0.0)) / math.log1p(RATING_CONFIDENCE_AT), 0.0, 1.0)
+    return np.nan_to_num(np.clip(rating / 5.0, 0.0, 1.0) * conf, nan=0.0)
+
+
+def proximity_scores(distance_km: np.ndarray, radius_m: float) -> np.ndarray:
+    return np.nan_to_num(np.clip(1.0 - distance_km / (radius_m / 1000), 0.0, 1.0), nan=0.5)
+
+
+def price_scores(price_level: np.ndarray) -> np.ndarray:
+    return np.nan_to_num(np.clip(1.0 - price_level / 4.0, 0.0, 1.0), nan=0.5)
+
+
+# ── Ranking ───────────────────────────────────────────────────────────────────
+
+def score(c: Candidates, lat: float, lng: float, radius_m: float,
+          weights: Weights = Weights()) -> Scores:
+    """Every component and the weighted final score, for all candidates."""
+    # Rounded like the distance shown to the user, so prox matches what they see.
+    dist  = np.round(haversine_km(lat, lng, c.lat, c.lng), 2)
+    sem   = semantic_scores(c.sem)
+    rat   = rating_scores(c.rating, c.ratings_total)
+    prox  = proximity_scores(dist, radius_m)
+    price = price_scores(c.price_level)
+    final = (weights.semantic * sem + weights.rating * rat
+             + weights.proximity * prox + weights.price * price)
+    return Scores(dist, sem, rat, prox, price, final)
+
+
+def top_k(final: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k best scores, best first; ties among them keep candidate order."""
+    if k >= len(final):
+        return np.argsort(-final, kind="stable")
+    best = np.argpartition(-final, k - 1)[:k] if k > 0 else np.empty(0, dtype=np.intp)
+    return best[np.lexsort((best, -final[best]))]
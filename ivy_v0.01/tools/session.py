@@ -14,19 +14,62 @@
 #   If two requests run in parallel, each thread has its own ContextVar value,
 #   so they never interfere with each other.
 #
-# Future evolution:
-#   - swap _store for Redis  → change only this file
-#   - add TTL/expiry logic   → change only this file
-#   - tools.py and agent.py stay untouched in all cases
-
+# Concurrency — two layers:
+#   turn(session_id)  async lock held for a whole agent turn (history read →
+#                     agent run → history write). Same session serializes,
+#                     different sessions run fully in parallel. Waits are
+#                     counted so lock_stats() shows how often users double-send.
+#   _mutate           one RLock around every _store write, because tools also
+#                     touch the session from worker threads (asyncio.to_thread).
+#
+# Memory bounds:
+#   - a session idle for SESSION_TTL_S is dropped by sweep()
+#   - past SESSION_MAX sessions or SESSION_MAX_BYTES (estimated JSON size),
+#     least-recently-used sessions are evicted — never one mid-turn
+#   - the API runs sweeper() as a background task; store_stats() reports
+#     live sessions, estimated bytes, evictions and expiries
+#
+# Persistence:
+#   _store is this process's working copy. Behind it sits one SessionBackend
+#   (session_backends.py, chosen by SESSION_BACKEND): every write is saved
+#   through, local misses are loaded from it, and with a shared backend
+#   (sqlite / redis) each turn starts by reloading — so several uvicorn
+#   workers can serve the same user without losing context.
+#   tools.py and agent.py stay untouched whichever backend runs.
+
+import asyncio
 import contextvars
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
 from logger import log
+from . import session_backends
 
 # ── Storage ───────────────────────────────────────────────────────────────────
-# _store maps session_id → state dict.
+# _store maps session_id → state dict, in least- to most-recently-used order.
 # Each state dict has the same shape as the old single _state.
+# _last_seen / _sizes hold per-session bookkeeping for expiry and the budget.
 
-_store: dict[str, dict] = {}
+SESSION_TTL_S     = float(os.getenv("SESSION_TTL_S", str(24 * 3600)))
+SESSION_MAX       = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+SESSION_SWEEP_S   = float(os.getenv("SESSION_SWEEP_S", "60"))
+
+_store: OrderedDict[str, dict] = OrderedDict()
+_last_seen: dict[str, float] = {}
+_sizes: dict[str, int] = {}
+_mutate = threading.RLock()
+_store_stats = {"bytes": 0, "evictions": 0, "expired": 0}
+_backend = session_backends.from_env(SESSION_TTL_S)
+
+
+def _new_state() -> dict:
+    # last_search: names of the places the latest set_places() stored, in rank order.
+    return {"location": None, "places": {}, "history": [], "last_search": []}
 
 # ── Active session ─────────────────────────────────────────────────────────────
 # ContextVar gives each thread its own copy of the current session_id.
@@ -52,10 +95,157 @@ def _current() -> dict:
     Creates a fresh slot if this session_id is new.
     """
     sid = _active_session_id.get()
-    if sid not in _store:
-        _store[sid] = {"location": None, "places": {}, "history": []}
+    with _mutate:
+        if sid not in _store:
+            _load(sid)
+        _store.move_to_end(sid)
+        _last_seen[sid] = time.monotonic()
+        return _store[sid]
+
+
+def _load(sid: str) -> None:
+    """(Re)fill the working copy for sid from the backend. Caller holds _mutate."""
+    state = _backend.load(sid)
+    if state is None:
+        state = _new_state()
         log.debug("session: new slot created for %r", sid)
-    return _store[sid]
+    else:
+        log.debug("session: loaded %r from backend", sid)
+    _store[sid] = state
+    _store.move_to_end(sid)
+    _last_seen[sid] = time.monotonic()
+    _account(sid, state)
+    _enforce_budget()
+
+
+# ── Budget & expiry ───────────────────────────────────────────────────────────
+
+def _resized() -> None:
+    """
+    After a write: save the active session through to the backend,
+    re-estimate its size and enforce the budget.
+    Only called on writes — a few per turn — so the JSON dump is affordable.
+    """
+    sid = _active_session_id.get()
+    with _mutate:
+        state = _store.get(sid)
+        if state is None:
+            return
+        _backend.save(sid, state)
+        _account(sid, state)
+        _enforce_budget()
+
+
+def _account(sid: str, state: dict) -> None:
+    """Update sid's estimated size in the byte budget. Caller holds _mutate."""
+    size = len(json.dumps(state, ensure_ascii=False, default=str))
+    _store_stats["bytes"] += size - _sizes.get(sid, 0)
+    _sizes[sid] = size
+
+
+def _drop(sid: str) -> None:
+    """Caller holds _mutate."""
+    del _store[sid]
+    _last_seen.pop(sid, None)
+    _store_stats["bytes"] -= _sizes.pop(sid, 0)
+
+
+def _enforce_budget() -> None:
+    """Evict LRU sessions past SESSION_MAX / SESSION_MAX_BYTES. Caller holds _mutate."""
+    for sid in list(_store):
+        if len(_store) <= SESSION_MAX and _store_stats["bytes"] <= SESSION_MAX_BYTES:
+            return
+        if sid in _turns or sid == _active_session_id.get():
+            continue
+        _drop(sid)
+        _store_stats["evictions"] += 1
+        log.info("session: evicted %r (budget)", sid)
+
+
+def sweep() -> int:
+    """
+    Drop sessions idle for longer than SESSION_TTL_S from the working copy
+    and let the backend expire its own. Returns how many were dropped locally.
+    """
+    cutoff = time.monotonic() - SESSION_TTL_S
+    with _mutate:
+        expired = [sid for sid in _store
+                   if _last_seen.get(sid, 0) < cutoff and sid not in _turns]
+        for sid in expired:
+            _drop(sid)
+        _store_stats["expired"] += len(expired)
+        _enforce_budget()
+    _backend.expire(SESSION_TTL_S)
+    if expired:
+        log.info("session: swept %d idle sessions, %d live", len(expired), len(_store))
+    return len(expired)
+
+
+async def sweeper() -> None:
+    """Background task: sweep() every SESSION_SWEEP_S. Started from the API lifespan."""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_S)
+        await asyncio.to_thread(sweep)      # backend expire is a SQLite / Redis round-trip
+
+
+def store_stats() -> dict:
+    return {
+        "backend":         type(_backend).__name__,
+        "live":            len(_store),
+        "bytes_estimated": _store_stats["bytes"],
+        "evictions":       _store_stats["evictions"],
+        "expired":         _store_stats["expired"],
+    }
+
+
+# ── Turn locks ─────────────────────────────────────────────────────────────────
+# session_id → [lock, holders + waiters]. The entry is dropped when the count
+# reaches zero, so idle sessions cost nothing. Mutated only on the event loop;
+# eviction and sweep() (on worker threads) just test membership.
+
+_turns: dict[str, list] = {}
+_lock_stats = {"turns": 0, "contended": 0, "wait_s_total": 0.0, "wait_s_max": 0.0}
+
+
+@asynccontextmanager
+async def turn(session_id: str):
+    """
+    Hold session_id's lock for one agent turn and make it the active session.
+    Usage:  async with session.turn(sid): ...
+    Not re-entrant — never nest two turns for the same session.
+    """
+    entry = _turns.setdefault(session_id, [asyncio.Lock(), 0])
+    entry[1] += 1
+    contended = entry[0].locked()
+    t0 = time.perf_counter()
+    try:
+        async with entry[0]:
+            waited = time.perf_counter() - t0
+            _lock_stats["turns"] += 1
+            if contended:
+                _lock_stats["contended"]    += 1
+                _lock_stats["wait_s_total"] += waited
+                _lock_stats["wait_s_max"]    = max(_lock_stats["wait_s_max"], waited)
+                log.info("session: %r waited %.2fs for its previous turn", session_id, waited)
+            set_active(session_id)
+            if _backend.shared:
+                with _mutate:
+                    _load(session_id)   # another worker may have written since
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _turns[session_id]
+
+
+def lock_stats() -> dict:
+    """Turn-lock counters — contended turns are users double-sending."""
+    return {
+        **_lock_stats,
+        "wait_s_total": round(_lock_stats["wait_s_total"], 3),
+        "wait_s_max":   round(_lock_stats["wait_s_max"], 3),
+        "active":       len(_turns),
+    }
 
 
 # ── Location ──────────────────────────────────────────────────────────────────
@@ -66,7 +256,9 @@ def get_location() -> dict | None:
 
 
 def set_location(location: dict) -> None:
-    _current()["location"] = location
+    with _mutate:
+        _current()["location"] = location
+        _resized()
     log.debug("session: location set → %s, %s",
               location.get("city"), location.get("country"))
 
@@ -85,18 +277,30 @@ def get_place(name: str) -> dict | None:
 
 def set_places(places: list[dict]) -> None:
     """Store the full dict for every place in the list, keyed by name."""
-    state = _current()
-    for place in places:
-        state["places"][place["name"]] = place
+    with _mutate:
+        state = _current()
+        for place in places:
+            state["places"][place["name"]] = place
+        state["last_search"] = [place["name"] for place in places]
+        _resized()
     log.debug("session: stored %d places", len(places))
 
 
 def all_place_names() -> list[str]:
-    return list(_current()["places"].keys())
+    with _mutate:
+        return list(_current()["places"].keys())
 
 
 def all_places() -> list[dict]:
-    return list(_current()["places"].values())
+    with _mutate:
+        return list(_current()["places"].values())
+
+
+def last_places() -> list[dict]:
+    """Only the places of the latest search, in rank order — what follow-ups refer to."""
+    with _mutate:
+        state = _current()
+        return [state["places"][n] for n in state.get("last_search", []) if n in state["places"]]
 
 
 # ── Lifecycle ─────────────────────────────────────────────────────────────────
@@ -104,7 +308,9 @@ def all_places() -> list[dict]:
 def clear() -> None:
     """Reset the active session — useful for 'start over' commands."""
     sid = _active_session_id.get()
-    _store[sid] = {"location": None, "places": {}, "history": []}
+    with _mutate:
+        _store[sid] = _new_state()
+        _resized()
     log.info("session: cleared for %r", sid)
 
 
@@ -117,9 +323,17 @@ def get_history() -> list[dict]:
     return _current()["history"]
 
 
-def append_to_history(role: str, content: str) -> None:
-    """Add one message to the conversation history."""
-    _current()["history"].append({"role": role, "content": content})
+def append_to_history(role: str, content: str, tokens: int | None = None) -> None:
+    """
+    Add one message to the conversation history.
+    Pass its token count (history.count_tokens) so trimming never re-encodes it.
+    """
+    message = {"role": role, "content": content}
+    if tokens is not None:
+        message["tokens"] = tokens
+    with _mutate:
+        _current()["history"].append(message)
+        _resized()
     log.debug("session: history +%s (%d chars)", role, len(content))
 
 
@@ -0,0 +1,173 @@
+# tools/session_backends.py
+#
+# Where session state lives beyond the current process.
+#
+# session.py keeps a per-process working copy of each session (_store, with
+# its LRU/TTL budget) and talks to exactly one SessionBackend behind it:
+#   - on a local miss, load(sid) is tried before creating a fresh slot
+#   - after every write, save(sid, state) persists the whole state
+#   - when a turn starts and the backend is shared, the working copy is
+#     reloaded, so whichever worker gets the next message sees the latest
+#
+# Backends (SESSION_BACKEND):
+#   memory  — default; nothing leaves the process (single-worker behaviour)
+#   sqlite  — SESSION_DB file in WAL mode; shared by every worker on one host
+#   redis   — SESSION_REDIS_URL; shared across hosts, expiry via key TTL.
+#             Any client with get/set/delete works, so fakeredis stands in locally.
+#
+# State is serialized with msgpack when installed (compact, fast), else JSON.
+# Compare them with:  python -m bench.session_backends
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Protocol
+
+from logger import log
+
+try:
+    import msgpack
+except ImportError:          # optional — JSON works, just bigger and slower
+    msgpack = None
+
+SESSION_BACKEND   = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB        = os.getenv("SESSION_DB", "sessions.db")
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+
+
+# ── Serialization ─────────────────────────────────────────────────────────────
+
+def dumps(state: dict) -> bytes:
+    if msgpack is not None:
+        return msgpack.packb(state, use_bin_type=True)
+    return json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(blob: bytes) -> dict:
+    if msgpack is not None:
+        return msgpack.unpackb(blob, raw=False, strict_map_key=False)
+    return json.loads(blob)
+
+
+# ── Interface ─────────────────────────────────────────────────────────────────
+
+class SessionBackend(Protocol):
+    shared: bool    # True → other processes may write, reload at turn start
+
+    def load(self, session_id: str) -> dict | None: ...
+    def save(self, session_id: str, state: dict) -> None: ...
+    def delete(self, session_id: str) -> None: ...
+    def expire(self, ttl_s: float) -> int: ...
+
+
+# ── Implementations ───────────────────────────────────────────────────────────
+
+class MemorySessionBackend:
+    """No-op: session.py's own _store is the only copy."""
+
+    shared = False
+
+    def load(self, session_id: str) -> dict | None:
+        return None
+
+    def save(self, session_id: str, state: dict) -> None:
+        pass
+
+    def delete(self, session_id: str) -> None:
+        pass
+
+    def expire(self, ttl_s: float) -> int:
+        return 0
+
+
+class SQLiteSessionBackend:
+    """One row per session. WAL lets every worker read while one writes."""
+
+    shared = True
+
+    def __init__(self, path: str):
+        self._db   = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "  session_id TEXT PRIMARY KEY,"
+            "  state      BLOB NOT NULL,"
+            "  updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        log.info("session: SQLite backend at %s", path)
+
+    def load(self, session_id: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return loads(row[0]) if row else None
+
+    def save(self, session_id: str, state: dict) -> None:
+        blob = dumps(state)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                (session_id, blob, time.time()),
+            )
+            self._db.commit()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+    def expire(self, ttl_s: float) -> int:
+        with self._lock:
+            cur = self._db.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - ttl_s,)
+            )
+            self._db.commit()
+        return cur.rowcount
+
+
+class RedisSessionBackend:
+    """
+    One key per session, expiring after ttl_s of inactivity.
+    client: redis.Redis, or fakeredis.FakeRedis for local runs.
+    """
+
+    shared = True
+
+    def __init__(self, client, ttl_s: float, prefix: str = "ivy:session:"):
+        self._r      = client
+        self._ttl    = int(ttl_s)
+        self._prefix = prefix
+
+    def load(self, session_id: str) -> dict | None:
+        blob = self._r.get(self._prefix + session_id)
+        return loads(blob) if blob is not None else None
+
+    def save(self, session_id: str, state: dict) -> None:
+        self._r.set(self._prefix + session_id, dumps(state), ex=self._ttl)
+
+    def delete(self, session_id: str) -> None:
+        self._r.delete(self._prefix + session_id)
+
+    def expire(self, ttl_s: float) -> int:
+        return 0     # Redis expires keys itself
+
+
+# ── Factory ───────────────────────────────────────────────────────────────────
+
+def from_env(ttl_s: float) -> SessionBackend:
+    """Build the backend selected by SESSION_BACKEND."""
+    if SESSION_BACKEND == "sqlite":
+        return SQLiteSessionBackend(SESSION_DB)
+    if SESSION_BACKEND == "redis":
+        import redis
+        log.info("session: Redis backend at %s", SESSION_REDIS_URL)
+        return RedisSessionBackend(redis.Redis.from_url(SESSION_REDIS_URL), ttl_s)
+    if SESSION_BACKEND != "memory":
+        raise ValueError(f"Unknown SESSION_BACKEND {SESSION_BACKEND!r}")
+    return MemorySessionBackend()
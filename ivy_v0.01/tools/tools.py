@@ -1,31 +1,81 @@
 # tools.py
 #
-# Three tools exposed to the LangChain agent.
+# Four tools exposed to the LangChain agent.
 # Session reads/writes go through session.py — never directly to _state.
+#
+# Every tool has a sync body (CLI, agent.invoke) and an async twin attached as
+# its coroutine (FastAPI, agent.ainvoke). The async twins talk to Maps and
+# ip-api over one shared httpx.AsyncClient, so a request waiting on the network
+# holds no thread.
 
+import asyncio
 import json
+import logging
 import math
 import os
+import threading
 import time
 
 import googlemaps
+import httpx
 import numpy as np
 import requests
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
-from sentence_transformers import SentenceTransformer
 
 from concurrent.futures import ThreadPoolExecutor
 
-from . import session
+from . import batcher, cache, embeddings, encoder, encoder_service, ranking, session, venue_index
 from logger import log
 
 # ── Encoder & singletons ──────────────────────────────────────────────────────
 
-log.info("Loading SentenceTransformer model")
-_t0 = time.perf_counter()
-_encoder = SentenceTransformer("all-MiniLM-L6-v2")
-log.info("Model loaded in %.2fs", time.perf_counter() - _t0)
+# Loaded on first use, not at import: importing torch + the model takes
+# seconds, and the API warms it in the background (startup.py) instead.
+# ENCODER_BACKEND picks PyTorch or ONNX Runtime — see tools/encoder.py.
+# With ENCODER_SERVICE set, every worker shares one encoder process instead
+# (tools/encoder_service.py). Otherwise concurrent calls are micro-batched in
+# process (tools/batcher.py) unless ENCODE_BATCH_WAIT_MS is 0.
+
+_encoder      = None
+_encoder_lock = threading.Lock()
+
+def _get_encoder():
+    """Lazy singleton — thread-safe, the first caller loads it."""
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                if encoder_service.ENCODER_SERVICE:
+                    _encoder = encoder_service.RemoteEncoder(encoder_service.ENCODER_SERVICE)
+                elif batcher.ENCODE_BATCH_WAIT_MS > 0:
+                    _encoder = batcher.EncodeBatcher(encoder.load())
+                else:
+                    _encoder = encoder.load()
+    return _encoder
+
+
+def encoder_stats() -> dict | None:
+    """Batching metrics — the in-process batcher's, or the shared service's."""
+    if isinstance(_encoder, batcher.EncodeBatcher):
+        return _encoder.stats()
+    if isinstance(_encoder, encoder_service.RemoteEncoder):
+        try:
+            return _encoder.stats()
+        except OSError as e:
+            return {"error": str(e)}
+    return None
+
+
+def embed(texts: list[str]) -> np.ndarray:
+    """Normalised embeddings for texts, through the content-hash cache."""
+    return embeddings.store.encode(_get_encoder(), texts)
+
+
+def warm_up() -> None:
+    """Load the encoder and run one encode, so the first request pays neither."""
+    _get_encoder().encode(["warm-up"], normalize_embeddings=True)
+
 
 _gmaps: googlemaps.Client | None = None
 
@@ -41,6 +91,59 @@ def _get_gmaps() -> googlemaps.Client:
     return _gmaps
 
 
+_http: httpx.AsyncClient | None = None
+
+MAPS_BASE_URL        = "https://maps.googleapis.com/maps/api"
+IP_API_URL           = "http://ip-api.com/json"
+MAPS_MAX_CONCURRENCY = int(os.getenv("MAPS_MAX_CONCURRENCY", "32"))
+
+# Caps concurrent Maps detail calls across ALL requests in this process,
+# not per search — a burst of users can't blow through the QPS quota.
+_maps_slots = asyncio.Semaphore(MAPS_MAX_CONCURRENCY)
+
+
+def _get_http() -> httpx.AsyncClient:
+    """Lazy singleton — shared by every async tool call in the process."""
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(max_connections=MAPS_MAX_CONCURRENCY),
+        )
+        log.info("httpx.AsyncClient initialised")
+    return _http
+
+
+async def aclose() -> None:
+    """Close the shared async client. Called from the API lifespan on shutdown."""
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+async def _maps_get(endpoint: str, **params) -> dict:
+    """
+    GET a Maps web-service endpoint, e.g. "place/textsearch".
+    Raises like googlemaps.Client does on anything but OK / ZERO_RESULTS.
+    """
+    api_key = os.getenv("GOOGLE_MAPS_API")
+    if not api_key:
+        raise ValueError("GOOGLE_MAPS_API env variable not set")
+
+    resp = await _get_http().get(
+        f"{MAPS_BASE_URL}/{endpoint}/json",
+        params={**params, "key": api_key},
+    )
+    resp.raise_for_status()
+    data = resp.json()
+    if data.get("status") not in ("OK", "ZERO_RESULTS"):
+        raise RuntimeError(
+            f"{endpoint}: {data.get('status')} {data.get('error_message', '')}".strip()
+        )
+    return data
+
+
 # ── Schemas ───────────────────────────────────────────────────────────────────
 
 class GetUserLocationInput(BaseModel):
@@ -69,10 +172,16 @@ class SearchAndRankPlacesInput(BaseModel):
         )
     )
     lat: float = Field(
-        description="Latitude from get_user_location. Never guess or invent this value."
+        description=(
+            "Latitude from get_user_location or the known-location note. "
+            "Never guess or invent this value."
+        )
     )
     lng: float = Field(
-        description="Longitude from get_user_location. Never guess or invent this value."
+        description=(
+            "Longitude from get_user_location or the known-location note. "
+            "Never guess or invent this value."
+        )
     )
     radius_m: int = Field(
         default=500,
@@ -97,20 +206,59 @@ class GetSessionPlacesInput(BaseModel):
 
 # ── Parallel detail fetcher ───────────────────────────────────────────────────
 
+DETAIL_FIELDS = ["website", "reviews", "opening_hours"]
+
+
 def _fetch_one_detail(args: tuple) -> dict:
-    """Fetch details for a single place. Runs in a thread pool."""
+    """
+    Fetch details for a single place. Runs in a thread pool.
+    Served from cache.place_details when fresh — only stale fields hit Maps.
+    """
     place_id, place_name = args
     if not place_id:
         return {}
+
+    cached, missing = cache.place_details.lookup(place_id, DETAIL_FIELDS)
+    if not missing:
+        return cached
+
     try:
-        return _get_gmaps().place(
+        fetched = _get_gmaps().place(
             place_id=place_id,
-            fields=["website", "reviews", "opening_hours"],
+            fields=missing,
         ).get("result", {})
     except Exception as e:
         log.warning("    detail fetch failed for %r: %s", place_name, e)
+        return cached
+
+    cache.place_details.store(place_id, missing, fetched)
+    return {**cached, **{f: fetched.get(f) for f in missing}}
+
+
+async def _afetch_one_detail(place_id: str, place_name: str) -> dict:
+    """Async twin of _fetch_one_detail — bounded by the process-wide _maps_slots."""
+    if not place_id:
         return {}
 
+    cached, missing = cache.place_details.lookup(place_id, DETAIL_FIELDS)
+    if not missing:
+        return cached
+
+    try:
+        async with _maps_slots:
+            data = await _maps_get(
+                "place/details",
+                place_id=place_id,
+                fields=",".join(missing),
+            )
+        fetched = data.get("result", {})
+    except Exception as e:
+        log.warning("    detail fetch failed for %r: %s", place_name, e)
+        return cached
+
+    cache.place_details.store(place_id, missing, fetched)
+    return {**cached, **{f: fetched.get(f) for f in missing}}
+
 
 # ── Tool 1: get_user_location ─────────────────────────────────────────────────
 
@@ -132,6 +280,29 @@ def get_user_location() -> str:
     log.info("→ get_user_location called")
     t0 = time.perf_counter()
 
+    known = _known_location(t0)
+    if known is not None:
+        return known
+
+    # CLI fallback — ip-api works correctly on a developer's local machine
+    try:
+        resp = requests.get(IP_API_URL, timeout=5)
+        resp.raise_for_status()
+        return _location_from_ip(resp.json(), t0)
+
+    except requests.Timeout:
+        log.error("  ip-api.com timed out")
+        return json.dumps({"error": "ip-api.com timed out — try again"})
+    except Exception as e:
+        log.error("  get_user_location failed: %s", e)
+        return json.dumps({"error": str(e)})
+
+
+def _known_location(t0: float) -> str | None:
+    """
+    Answer get_user_location without the network when possible: the session
+    location, or the no_location error on Telegram. None → fall back to ip-api.
+    """
     # Always check session first — works for both CLI and Telegram
     cached = session.get_location()
     if cached:
@@ -140,7 +311,7 @@ def get_user_location() -> str:
 
     # On Telegram (TELEGRAM_BOT_KEY set): ip-api returns the server location.
     # Return an error so the agent asks the user naturally where they are.
-    
+
     if os.getenv("TELEGRAM_BOT_KEY"):
         log.info("← get_user_location: no location in session (Telegram context)")
         return json.dumps({
@@ -151,32 +322,44 @@ def get_user_location() -> str:
                 "or simply say a neighbourhood, city, or landmark in text."
             )
         })
+    return None
+
+
+def _location_from_ip(data: dict, t0: float) -> str:
+    """Turn an ip-api.com response into the stored session location."""
+    if data.get("status") != "success":
+        msg = f"ip-api returned: {data.get('status')}"
+        log.warning("  %s", msg)
+        return json.dumps({"error": msg})
+
+    location = {
+        "lat":     data["lat"],
+        "lng":     data["lon"],
+        "city":    data.get("city", "unknown"),
+        "country": data.get("country", "unknown"),
+    }
+    session.set_location(location)
+    log.info(
+        "← get_user_location: fetched in %.2fs → %s, %s",
+        time.perf_counter() - t0, location["city"], location["country"],
+    )
+    return json.dumps(location)
+
+
+async def _aget_user_location() -> str:
+    log.info("→ get_user_location called (async)")
+    t0 = time.perf_counter()
+
+    known = await asyncio.to_thread(_known_location, t0)    # session read, may hit the backend
+    if known is not None:
+        return known
 
-    # CLI fallback — ip-api works correctly on a developer's local machine
     try:
-        resp = requests.get("http://ip-api.com/json", timeout=5)
+        resp = await _get_http().get(IP_API_URL, timeout=5)
         resp.raise_for_status()
-        data = resp.json()
-
-        if data.get("status") != "success":
-            msg = f"ip-api returned: {data.get('status')}"
-            log.warning("  %s", msg)
-            return json.dumps({"error": msg})
-
-        location = {
-            "lat":     data["lat"],
-            "lng":     data["lon"],
-            "city":    data.get("city", "unknown"),
-            "country": data.get("country", "unknown"),
-        }
-        session.set_location(location)
-        log.info(
-            "← get_user_location: fetched in %.2fs → %s, %s",
-            time.perf_counter() - t0, location["city"], location["country"],
-        )
-        return json.dumps(location)
+        return _location_from_ip(resp.json(), t0)
 
-    except requests.Timeout:
+    except httpx.TimeoutException:
         log.error("  ip-api.com timed out")
         return json.dumps({"error": "ip-api.com timed out — try again"})
     except Exception as e:
@@ -203,66 +386,194 @@ def set_user_location_by_text(location_text: str) -> str:
     try:
         gmaps   = _get_gmaps()
         results = gmaps.geocode(location_text)
+        return _location_from_geocode(location_text, results, t0)
+
+    except Exception as e:
+        log.error("  set_user_location_by_text failed: %s", e)
+        return json.dumps({"error": str(e)})
 
-        if not results:
-            log.warning("  geocode returned no results for %r", location_text)
+
+def _location_from_geocode(location_text: str, results: list[dict], t0: float) -> str:
+    """Store the geocoded location, or report not_found / ambiguous options."""
+    if not results:
+        log.warning("  geocode returned no results for %r", location_text)
+        return json.dumps({
+            "error":   "not_found",
+            "message": f"Nao encontrei '{location_text}'.",
+        })
+
+    # ── Ambiguity check ───────────────────────────────────────────────────────
+    # Extract the city/locality name from each result.
+    # If the top two results resolve to different cities, flag as ambiguous
+    # so the agent can ask the user to clarify instead of guessing.
+
+    def extract_city(result: dict) -> str:
+        for component in result.get("address_components", []):
+            if "locality" in component["types"] or \
+               "administrative_area_level_2" in component["types"]:
+                return component["long_name"].lower()
+        return ""
+
+    if len(results) >= 2:
+        city_a = extract_city(results[0])
+        city_b = extract_city(results[1])
+        if city_a and city_b and city_a != city_b:
+            options = [r.get("formatted_address", "") for r in results[:3]]
+            log.info("  ambiguous — options: %s", options)
             return json.dumps({
-                "error":   "not_found",
-                "message": f"Nao encontrei '{location_text}'.",
+                "ambiguous": True,
+                "options":   options,
             })
 
-        # ── Ambiguity check ───────────────────────────────────────────────────
-        # Extract the city/locality name from each result.
-        # If the top two results resolve to different cities, flag as ambiguous
-        # so the agent can ask the user to clarify instead of guessing.
-
-        def extract_city(result: dict) -> str:
-            for component in result.get("address_components", []):
-                if "locality" in component["types"] or \
-                   "administrative_area_level_2" in component["types"]:
-                    return component["long_name"].lower()
-            return ""
-
-        if len(results) >= 2:
-            city_a = extract_city(results[0])
-            city_b = extract_city(results[1])
-            if city_a and city_b and city_a != city_b:
-                options = [r.get("formatted_address", "") for r in results[:3]]
-                log.info("  ambiguous — options: %s", options)
-                return json.dumps({
-                    "ambiguous": True,
-                    "options":   options,
-                })
-
-        # ── Single clear result ───────────────────────────────────────────────
-        best    = results[0]
-        loc     = best["geometry"]["location"]
-        address = best.get("formatted_address", location_text)
-
-        session.set_location({
-            "lat":     loc["lat"],
-            "lng":     loc["lng"],
-            "city":    address,
-            "country": "",
-        })
-        log.info(
-            "← set_user_location_by_text OK in %.2fs → %s (%.4f, %.4f)",
-            time.perf_counter() - t0, address, loc["lat"], loc["lng"],
-        )
-        return json.dumps({"success": True, "resolved_to": address})
+    # ── Single clear result ───────────────────────────────────────────────────
+    best    = results[0]
+    loc     = best["geometry"]["location"]
+    address = best.get("formatted_address", location_text)
+
+    session.set_location({
+        "lat":     loc["lat"],
+        "lng":     loc["lng"],
+        "city":    address,
+        "country": "",
+    })
+    log.info(
+        "← set_user_location_by_text OK in %.2fs → %s (%.4f, %.4f)",
+        time.perf_counter() - t0, address, loc["lat"], loc["lng"],
+    )
+    return json.dumps({"success": True, "resolved_to": address})
+
+
+async def _aset_user_location_by_text(location_text: str) -> str:
+    log.info("→ set_user_location_by_text (async)  text=%r", location_text)
+    t0 = time.perf_counter()
+
+    try:
+        data = await _maps_get("geocode", address=location_text)
+        return _location_from_geocode(location_text, data.get("results", []), t0)
 
     except Exception as e:
         log.error("  set_user_location_by_text failed: %s", e)
         return json.dumps({"error": str(e)})
 
 
+# ── Place assembly & ranking ──────────────────────────────────────────────────
+# Shared by the sync and async search paths.
+
+def _to_place(r: dict, details: dict) -> dict:
+    """Merge one text-search hit with its details into the session place dict."""
+    review_texts = [
+        rev.get("text", "")
+        for rev in (details.get("reviews") or [])
+        if isinstance(rev, dict) and rev.get("text")
+    ]
+    # Venue-index hits carry no opening_hours — the live status comes from details.
+    hours = r.get("opening_hours") or details.get("opening_hours") or {}
+
+    return {
+        "place_id":      r.get("place_id", ""),
+        "name":          r.get("name", "?"),
+        "address":       r.get("formatted_address") or r.get("vicinity", ""),
+        "type":          (r.get("types") or ["unknown"])[0],
+        "lat":           r.get("geometry", {}).get("location", {}).get("lat"),
+        "lng":           r.get("geometry", {}).get("location", {}).get("lng"),
+        "rating":        r.get("rating"),
+        "ratings_total": r.get("user_ratings_total"),
+        "price_level":   r.get("price_level"),
+        "open_now":      hours.get("open_now"),
+        "website":       details.get("website"),
+        "reviews":       review_texts,
+    }
+
+
+def _place_text(p: dict) -> str:
+    """The place card that gets embedded next to the review chunks."""
+    return (
+        f"Name: {p.get('name','')}\n"
+        f"Type: {p.get('type','')}\n"
+        f"Address: {p.get('address','')}\n"
+        f"Rating: {p.get('rating','N/A')} ({p.get('ratings_total',0)} reviews)\n"
+        f"Price level: {p.get('price_level','N/A')}\n"
+        f"Open now: {p.get('open_now','unknown')}"
+    ).strip()
+
+
+def _rank_and_store(places: list[dict], query: str, lat: float, lng: float,
+                    radius_m: int, t0: float) -> str:
+    """Score and sort places, store them in session, return the top 5 as JSON."""
+    if not places:
+        return json.dumps([])
+
+    # Multi-vector: one vector for the place card, one per review chunk.
+    # A place's semantic score blends its card with the max/mean of its chunks.
+    chunks, offsets = embeddings.pack([
+        [c for review in (p.get("reviews") or []) for c in embeddings.chunk_text(review)]
+        for p in places
+    ])
+    vecs        = embed([query] + [_place_text(p) for p in places] + chunks)
+    q_emb       = vecs[0]
+    card_sims   = vecs[1:1 + len(places)] @ q_emb
+    review_sims = embeddings.aggregate(vecs[1 + len(places):] @ q_emb, offsets)
+    sem_scores  = np.where(np.isnan(review_sims), card_sims, 0.5 * card_sims + 0.5 * review_sims)
+    log.debug("  %d review chunks; embedding cache: %s", len(chunks), embeddings.store.stats())
+
+    scores = ranking.score(ranking.Candidates.from_places(places, sem_scores), lat, lng, radius_m)
+    final  = np.round(scores.final, 4)
+    for p, dist, f in zip(places, scores.distance_km.tolist(), final.tolist()):
+        p["distance_km"] = None if math.isnan(dist) else dist
+        p["final_score"] = f
+
+    if log.isEnabledFor(logging.DEBUG):
+        for i, p in enumerate(places):
+            log.debug(
+                "    %-30s  dist=%.2fkm  sem=%.3f  rating=%.3f  prox=%.3f  price=%.3f  → %.3f",
+                p.get("name", "?")[:30], p["distance_km"] or 0, scores.semantic[i],
+                scores.rating[i], scores.proximity[i], scores.price[i], p["final_score"],
+            )
+
+    # The session keeps every candidate in rank order, so this is a full sort;
+    # argpartition pays off in VenueIndex.search, over thousands of rows.
+    ranked = [places[i] for i in ranking.top_k(final, len(places))]
+
+    session.set_places(ranked)
+
+    log.info(
+        "← search_and_rank_places OK in %.2fs → top: %r (%.3f)",
+        time.perf_counter() - t0,
+        ranked[0]["name"] if ranked else "—",
+        ranked[0].get("final_score", 0) if ranked else 0,
+    )
+
+    return json.dumps([
+        {
+            "name":        p["name"],
+            "address":     p["address"],
+            "rating":      p.get("rating"),
+            "open_now":    p.get("open_now"),
+            "website":     p.get("website"),
+            "distance_km": p.get("distance_km"),
+            "final_score": p["final_score"],
+            "top_review":  p["reviews"][0] if p.get("reviews") else None,
+        }
+        for p in ranked[:5]
+    ], ensure_ascii=False)
+
+
 # ── Tool 3: search_and_rank_places ────────────────────────────────────────────
 
+def _local_search(query: str, lat: float, lng: float, radius_m: int) -> list[dict] | None:
+    """Text-search-shaped hits from the local venue index, None → ask Maps."""
+    index = venue_index.get()
+    if index is None:
+        return None
+    return index.search(embed([query])[0], lat, lng, radius_m)
+
+
 @tool("search_and_rank_places", args_schema=SearchAndRankPlacesInput)
 def search_and_rank_places(query: str, lat: float, lng: float, radius_m: int = 500) -> str:
     """
     Search Google Maps for leisure venues near a location, rank by relevance,
-    and return the top 5. Use the exact coordinates returned by get_user_location.
+    and return the top 5. Use the exact coordinates from get_user_location or
+    the known-location note.
 
     ONLY call this when the user wants to discover a NEW type of venue not yet
     searched in this conversation. If places are already cached from a previous
@@ -274,18 +585,17 @@ def search_and_rank_places(query: str, lat: float, lng: float, radius_m: int = 5
     t0 = time.perf_counter()
 
     try:
-        gmaps = _get_gmaps()
-    except ValueError as e:
-        return json.dumps({"error": str(e)})
-
-    try:
-        raw = gmaps.places(
-            query=query,
-            location=(lat, lng),
-            radius=radius_m,
-        ).get("results", [])[:20]
-
-        log.info("  gmaps.places → %d results", len(raw))
+        raw = _local_search(query, lat, lng, radius_m)
+        if raw is None:
+            raw = cache.search_results.get_or_fetch(
+                cache.search_results.key(query, lat, lng, radius_m),
+                lambda: _get_gmaps().places(
+                    query=query,
+                    location=(lat, lng),
+                    radius=radius_m,
+                ).get("results", [])[:20],
+            )
+            log.info("  gmaps.places → %d results", len(raw))
 
         detail_args = [(r.get("place_id", ""), r.get("name", "?")) for r in raw]
 
@@ -293,135 +603,60 @@ def search_and_rank_places(query: str, lat: float, lng: float, radius_m: int = 5
         with ThreadPoolExecutor(max_workers=5) as pool:
             details_list = list(pool.map(_fetch_one_detail, detail_args))
 
-        places = []
-        for r, details in zip(raw, details_list):
-            review_texts = [
-                rev.get("text", "")
-                for rev in (details.get("reviews") or [])[:3]
-                if isinstance(rev, dict) and rev.get("text")
-            ]
-
-            places.append({
-                "place_id":      r.get("place_id", ""),
-                "name":          r.get("name", "?"),
-                "address":       r.get("formatted_address") or r.get("vicinity", ""),
-                "type":          (r.get("types") or ["unknown"])[0],
-                "lat":           r.get("geometry", {}).get("location", {}).get("lat"),
-                "lng":           r.get("geometry", {}).get("location", {}).get("lng"),
-                "rating":        r.get("rating"),
-                "ratings_total": r.get("user_ratings_total"),
-                "price_level":   r.get("price_level"),
-                "open_now":      r.get("opening_hours", {}).get("open_now"),
-                "website":       details.get("website"),
-                "reviews":       review_texts,
-            })
+        places = [_to_place(r, details) for r, details in zip(raw, details_list)]
 
         log.info("  fetched %d places in %.2fs — ranking…", len(places), time.perf_counter() - t0)
+        log.debug("  place cache: %s", cache.place_details.stats())
 
     except Exception as e:
         log.error("  search failed: %s", e, exc_info=True)
         return json.dumps({"error": str(e)})
 
-    if not places:
-        return json.dumps([])
+    return _rank_and_store(places, query, lat, lng, radius_m, t0)
 
-    # ── Ranking ───────────────────────────────────────────────────────────────
-
-    def clamp01(x): return max(0.0, min(1.0, float(x)))
-    def safe_float(x, default=None):
-        try: return float(x)
-        except: return default
-
-    def haversine_km(lat1, lng1, lat2, lng2):
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        dlat     = math.radians(lat2 - lat1)
-        dlng     = math.radians(lng2 - lng1)
-        a        = (math.sin(dlat / 2) ** 2
-                    + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng / 2) ** 2)
-        return round(6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)), 2)
-
-    def proximity_score(distance_km, search_radius_m):
-        if distance_km is None:
-            return 0.5
-        return clamp01(1.0 - distance_km / (search_radius_m / 1000))
-
-    def price_score(p):
-        v = safe_float(p)
-        return 0.5 if v is None else clamp01(1.0 - v / 4.0)
-
-    def rating_score(rating, total):
-        r = safe_float(rating)
-        if r is None: return 0.0
-        n    = safe_float(total, 0.0) or 0.0
-        conf = clamp01(math.log1p(n) / math.log1p(10_000))
-        return clamp01(r / 5.0) * conf
-
-    def place_to_text(p):
-        return (
-            f"Name: {p.get('name','')}\n"
-            f"Type: {p.get('type','')}\n"
-            f"Address: {p.get('address','')}\n"
-            f"Rating: {p.get('rating','N/A')} ({p.get('ratings_total',0)} reviews)\n"
-            f"Price level: {p.get('price_level','N/A')}\n"
-            f"Open now: {p.get('open_now','unknown')}\n"
-            f"Reviews: {' '.join(p.get('reviews') or [])}"
-        ).strip()
-
-    texts      = [place_to_text(p) for p in places]
-    q_emb      = _encoder.encode([query], normalize_embeddings=True)[0]
-    p_embs     = _encoder.encode(texts,   normalize_embeddings=True)
-    sem_scores = np.dot(p_embs, q_emb)
-
-    for p in places:
-        if p.get("lat") and p.get("lng"):
-            p["distance_km"] = haversine_km(lat, lng, p["lat"], p["lng"])
-        else:
-            p["distance_km"] = None
-
-    W_SEM, W_RATING, W_PROXIMITY, W_PRICE = 0.60, 0.15, 0.15, 0.10
-
-    for i, p in enumerate(places):
-        sem   = float(sem_scores[i])
-        sem01 = clamp01((sem + 1.0) / 2.0)
-        r_s   = rating_score(p.get("rating"), p.get("ratings_total"))
-        pr_s  = proximity_score(p.get("distance_km"), radius_m)
-        pc_s  = price_score(p.get("price_level"))
-
-        p["final_score"] = round(
-            W_SEM * sem01 + W_RATING * r_s + W_PROXIMITY * pr_s + W_PRICE * pc_s, 4
-        )
-        log.debug(
-            "    %-30s  dist=%.2fkm  sem=%.3f  rating=%.3f  prox=%.3f  price=%.3f  → %.3f",
-            p.get("name", "?")[:30],
-            p.get("distance_km") or 0,
-            sem01, r_s, pr_s, pc_s, p["final_score"],
+
+async def _atext_search(query: str, lat: float, lng: float, radius_m: int) -> list[dict]:
+    async with _maps_slots:
+        data = await _maps_get(
+            "place/textsearch",
+            query=query,
+            location=f"{lat},{lng}",
+            radius=radius_m,
         )
+    return data.get("results", [])[:20]
 
-    ranked = sorted(places, key=lambda x: x["final_score"], reverse=True)
 
-    session.set_places(ranked)
+async def _asearch_and_rank_places(query: str, lat: float, lng: float, radius_m: int = 500) -> str:
+    log.info("→ search_and_rank_places (async)  query=%r  lat=%.4f  lng=%.4f  radius=%dm",
+             query, lat, lng, radius_m)
+    t0 = time.perf_counter()
 
-    log.info(
-        "← search_and_rank_places OK in %.2fs → top: %r (%.3f)",
-        time.perf_counter() - t0,
-        ranked[0]["name"] if ranked else "—",
-        ranked[0].get("final_score", 0) if ranked else 0,
-    )
+    try:
+        raw = await asyncio.to_thread(_local_search, query, lat, lng, radius_m)
+        if raw is None:
+            raw = await cache.search_results.aget_or_fetch(
+                cache.search_results.key(query, lat, lng, radius_m),
+                lambda: _atext_search(query, lat, lng, radius_m),
+            )
+            log.info("  places/textsearch → %d results", len(raw))
 
-    return json.dumps([
-        {
-            "name":        p["name"],
-            "address":     p["address"],
-            "rating":      p.get("rating"),
-            "open_now":    p.get("open_now"),
-            "website":     p.get("website"),
-            "distance_km": p.get("distance_km"),
-            "final_score": p["final_score"],
-            "top_review":  p["reviews"][0] if p.get("reviews") else None,
-        }
-        for p in ranked[:5]
-    ], ensure_ascii=False)
+        log.debug("  fetching details for %d places (gather, %d global slots)…",
+                  len(raw), MAPS_MAX_CONCURRENCY)
+        details_list = await asyncio.gather(*(
+            _afetch_one_detail(r.get("place_id", ""), r.get("name", "?")) for r in raw
+        ))
+
+        places = [_to_place(r, details) for r, details in zip(raw, details_list)]
+
+        log.info("  fetched %d places in %.2fs — ranking…", len(places), time.perf_counter() - t0)
+        log.debug("  place cache: %s", cache.place_details.stats())
+
+    except Exception as e:
+        log.error("  search failed: %s", e, exc_info=True)
+        return json.dumps({"error": str(e)})
+
+    # Encoding is CPU-bound — keep it off the event loop.
+    return await asyncio.to_thread(_rank_and_store, places, query, lat, lng, radius_m, t0)
 
 
 # ── Tool 4: get_session_places ────────────────────────────────────────────────
@@ -469,4 +704,19 @@ def get_session_places(name: str = "") -> str:
         for p in places
     ]
     log.info("← get_session_places (all) in %.3fs → %d places", time.perf_counter() - t0, len(slim))
-    return json.dumps(slim, ensure_ascii=False)
\ No newline at end of file
+    return json.dumps(slim, ensure_ascii=False)
+
+
+async def _aget_session_places(name: str = "") -> str:
+    """A cold session is loaded from the SQLite / Redis backend — keep that off the loop."""
+    return await asyncio.to_thread(get_session_places.func, name)
+
+
+# ── Async variants ────────────────────────────────────────────────────────────
+# Attached as each tool's coroutine: agent.invoke runs the sync body,
+# agent.ainvoke runs these.
+
+get_user_location.coroutine         = _aget_user_location
+set_user_location_by_text.coroutine = _aset_user_location_by_text
+search_and_rank_places.coroutine    = _asearch_and_rank_places
+get_session_places.coroutine        = _aget_session_places
@@ -0,0 +1,311 @@
+# tools/venue_index.py
+#
+# Local venue index — answers search_and_rank_places without a Maps text search.
+#
+# drafts/dba_0001 harvests thousands of São Paulo places with
+# GooglePlacesCollector into google_places.csv. This module turns that CSV
+# into an index on disk and serves nearest-venue queries from it:
+#
+#   <path>.npy      float32 (N, dim) L2-normalised vectors, opened as a
+#                   read-only memmap — the OS page cache keeps it warm and
+#                   every worker process shares the same pages
+#   <path>.json     one metadata row per vector, in text-search result shape
+#   <path>.ivf.npz  IVF coarse quantizer: spherical k-means centroids plus
+#                   the rows of each list in CSR form (order, offsets)
+#   <path>.i8.npz   int8 codes + per-dimension scale         (VENUE_QUANT=int8)
+#   <path>.bin.npy  packed sign bits                         (VENUE_QUANT=binary)
+#
+# With VENUE_QUANT set, only the codes are held in RAM (¼ or 1/32 of the
+# float matrix). Candidates are scored on their codes and the best
+# VENUE_RESCORE are rescored exactly from the float memmap (tools/quantize.py).
+#
+# A query is (query vector, lat, lng, radius):
+#   1. spatial grid — a dict of VENUE_GRID_DEG cells → rows gives every venue
+#      in the radius' bounding box, then a vectorised haversine keeps those
+#      inside the circle
+#   2. semantic — few candidates (the usual case, a 500 m radius): score just
+#      those rows. Many candidates (wide radius): probe the VENUE_IVF_PROBE
+#      nearest IVF lists and keep the rows that are in radius
+#   3. coverage — fewer than VENUE_MIN_RESULTS rows above VENUE_MIN_SIM means
+#      the harvest is thin here: return None and the caller asks Maps
+#
+# Open/closed status goes stale, so rows carry no opening_hours — tools.py
+# still fetches details (cache-first) for the hits.
+#
+# Build:  python -m tools.venue_index google_places.csv [index path]
+# Enable: VENUE_INDEX_PATH=<index path>    (unset → every search goes to Maps)
+
+import ast
+import csv
+import json
+import math
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from logger import log
+from tools import quantize, ranking
+
+# ── Config ────────────────────────────────────────────────────────────────────
+
+VENUE_INDEX_PATH  = os.getenv("VENUE_INDEX_PATH")       # unset → disabled
+VENUE_MIN_RESULTS = int(os.getenv("VENUE_MIN_RESULTS", "8"))
+VENUE_MIN_SIM     = float(os.getenv("VENUE_MIN_SIM", "0.25"))
+VENUE_IVF_PROBE   = int(os.getenv("VENUE_IVF_PROBE", "8"))
+VENUE_QUANT       = os.getenv("VENUE_QUANT", "float")   # float | int8 | binary
+VENUE_RESCORE     = int(os.getenv("VENUE_RESCORE", "100"))
+VENUE_GRID_DEG    = 0.01        # ≈ 1.1 km cells
+VENUE_EXACT_MAX   = 4000        # above this many in-radius rows, go through IVF
+VENUE_TOP_K       = 20          # same cap as a Maps text search
+QUANT_KINDS       = ("float", "int8", "binary")
+
+if VENUE_QUANT not in QUANT_KINDS:
+    log.warning("venue index: unknown VENUE_QUANT %r, expected one of %s — scoring on float32",
+                VENUE_QUANT, QUANT_KINDS)
+    VENUE_QUANT = "float"
+
+
+def _paths(path: str) -> tuple[Path, Path, Path]:
+    base = Path(path)
+    return base.with_suffix(".npy"), base.with_suffix(".json"), base.with_suffix(".ivf.npz")
+
+
+def _quant_paths(path: str) -> tuple[Path, Path]:
+    base = Path(path)
+    return base.with_suffix(".i8.npz"), base.with_suffix(".bin.npy")
+
+
+# ── Index ─────────────────────────────────────────────────────────────────────
+
+class VenueIndex:
+    """Memmapped vectors + IVF lists + spatial grid, loaded from one build."""
+
+    def __init__(self, path: str):
+        npy, meta, ivf = _paths(path)
+        self._vecs  = np.load(npy, mmap_mode="r")
+        self._rows  = json.loads(meta.read_text(encoding="utf-8"))
+        ivf_data    = np.load(ivf)
+        self._centroids = ivf_data["centroids"]
+        self._order     = ivf_data["order"]
+        self._offsets   = ivf_data["offsets"]
+        self._codes, self._scale, self._quant = None, None, "float"
+        if VENUE_QUANT != "float":
+            self._load_codes(path, VENUE_QUANT)
+
+        self._lats = np.array([r["geometry"]["location"]["lat"] for r in self._rows])
+        self._lngs = np.array([r["geometry"]["location"]["lng"] for r in self._rows])
+        cells: dict[tuple[int, int], list[int]] = {}
+        for i, (la, ln) in enumerate(zip(self._lats, self._lngs)):
+            cells.setdefault(self._cell(la, ln), []).append(i)
+        self._grid = {c: np.array(rows) for c, rows in cells.items()}
+
+        self.served = 0
+        self.thin   = 0
+        log.info("venue index: %d venues, %d IVF lists, %d grid cells, %s scoring from %s",
+                 len(self._rows), len(self._centroids), len(self._grid), self._quant, npy)
+
+    def _load_codes(self, path: str, kind: str) -> None:
+        i8, bits = _quant_paths(path)
+        try:
+            if kind == "int8":
+                data = np.load(i8)
+                self._codes, self._scale = data["codes"], data["scale"]
+            elif kind == "binary":
+                self._codes = np.load(bits)
+            else:
+                raise ValueError(f"Unknown VENUE_QUANT {kind!r}")
+        except OSError as e:
+            log.warning("venue index: no %s codes (%s) — scoring on float32", kind, e)
+            return
+        self._quant = kind
+
+    def _approx(self, rows: np.ndarray, q: np.ndarray) -> np.ndarray:
+        if self._quant == "int8":
+            return quantize.int8_scores(self._codes[rows], self._scale, q)
+        return quantize.hamming_scores(self._codes[rows], q)
+
+    @staticmethod
+    def _cell(lat: float, lng: float) -> tuple[int, int]:
+        return math.floor(lat / VENUE_GRID_DEG), math.floor(lng / VENUE_GRID_DEG)
+
+    def _in_radius(self, lat: float, lng: float, radius_m: int) -> np.ndarray:
+        """Rows within radius_m of (lat, lng): grid cells of the bbox, then haversine."""
+        dlat = radius_m / 111_320
+        dlng = radius_m / (111_320 * max(math.cos(math.radians(lat)), 1e-6))
+        (i0, j0), (i1, j1) = self._cell(lat - dlat, lng - dlng), self._cell(lat + dlat, lng + dlng)
+        found = [self._grid[(i, j)] for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)
+                 if (i, j) in self._grid]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate(found)
+        dist = ranking.haversine_km(lat, lng, self._lats[rows], self._lngs[rows])
+        return rows[dist <= radius_m / 1000]
+
+    def _ivf_rows(self, q: np.ndarray) -> np.ndarray:
+        """Rows of the VENUE_IVF_PROBE lists whose centroids are nearest to q."""
+        probe = np.argsort(self._centroids @ q)[::-1][:VENUE_IVF_PROBE]
+        return np.concatenate([self._order[self._offsets[c]:self._offsets[c + 1]] for c in probe])
+
+    def search(self, q: np.ndarray, lat: float, lng: float, radius_m: int) -> list[dict] | None:
+        """Up to VENUE_TOP_K venues near (lat, lng) ranked by similarity, or None if thin."""
+        t0   = time.perf_counter()
+        rows = self._in_radius(lat, lng, radius_m)
+        if len(rows) > VENUE_EXACT_MAX:
+            rows = np.intersect1d(rows, self._ivf_rows(q), assume_unique=True)
+
+        rows = np.sort(rows)                  # memmap reads in file order
+        if self._codes is not None:
+            rows, sims = quantize.two_stage(self._approx(rows, q), rows, self._vecs, q,
+                                            VENUE_RESCORE)
+        else:
+            sims = np.asarray(self._vecs[rows] @ q) if len(rows) else np.empty(0)
+        keep = sims >= VENUE_MIN_SIM
+        if keep.sum() < VENUE_MIN_RESULTS:
+            self.thin += 1
+            log.info("venue index: thin coverage (%d/%d in radius above %.2f) — Maps fallback",
+                     keep.sum(), len(rows), VENUE_MIN_SIM)
+            return None
+
+        rows, sims = rows[keep], sims[keep]
+        top = ranking.top_k(sims, VENUE_TOP_K)
+        self.served += 1
+        log.info("venue index: %d venues in %.1fms", len(top), (time.perf_counter() - t0) * 1000)
+        return [self._rows[rows[i]] for i in top]
+
+    def stats(self) -> dict:
+        scored = self._codes if self._codes is not None else self._vecs
+        return {
+            "venues":    len(self._rows),
+            "quant":     self._quant,
+            "scored_mb": round(scored.nbytes / 2**20, 1),   # what stage 1 keeps hot
+            "served":    self.served,
+            "thin":      self.thin,
+        }
+
+
+_index: VenueIndex | None = None
+_loaded = False
+_load_lock = threading.Lock()
+
+
+def get() -> VenueIndex | None:
+    """
+    Lazy singleton. None when VENUE_INDEX_PATH is unset or the files are missing.
+    Concurrent first callers (tools run on worker threads) wait for the one load.
+    """
+    global _index, _loaded
+    if not _loaded:
+        with _load_lock:
+            if not _loaded:
+                if VENUE_INDEX_PATH:
+                    try:
+                        _index = VenueIndex(VENUE_INDEX_PATH)
+                    except (OSError, ValueError) as e:     # missing or unreadable build
+                        log.warning("venue index: not loaded from %s: %s", VENUE_INDEX_PATH, e)
+                _loaded = True
+    return _index
+
+
+# ── Build ─────────────────────────────────────────────────────────────────────
+
+def _parse(value: str):
+    """The collector writes dicts and lists with csv's str() — read them back."""
+    try:
+        return ast.literal_eval(value) if value else None
+    except (ValueError, SyntaxError):
+        return None
+
+
+def _num(value: str, cast=float):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_collector_csv(csv_path: str) -> list[dict]:
+    """GooglePlacesCollector output → text-search-shaped rows, deduped by place_id."""
+    rows, seen = [], set()
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for rec in csv.DictReader(f):
+            geometry = _parse(rec.get("geometry", ""))
+            pid      = rec.get("place_id", "")
+            if not pid or pid in seen or not geometry or "location" not in geometry:
+                continue
+            if rec.get("business_status") not in ("", "OPERATIONAL"):
+                continue
+            seen.add(pid)
+            rows.append({
+                "place_id":           pid,
+                "name":               rec.get("name", ""),
+                "formatted_address":  rec.get("formatted_address", ""),
+                "geometry":           {"location": geometry["location"]},
+                "rating":             _num(rec.get("rating")),
+                "user_ratings_total": _num(rec.get("user_ratings_total"), int),
+                "price_level":        _num(rec.get("price_level"), int),
+                "types":              _parse(rec.get("types", "")) or [],
+            })
+    return rows
+
+
+_GENERIC_TYPES = {"point_of_interest", "establishment"}
+
+
+def venue_text(r: dict) -> str:
+    """What gets embedded: name, specific types and address."""
+    types = ", ".join(t.replace("_", " ") for t in r["types"] if t not in _GENERIC_TYPES)
+    return f"{r['name']}. {types}. {r['formatted_address']}"
+
+
+def _kmeans(x: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Spherical k-means on unit vectors. Returns (centroids, assignment)."""
+    rng       = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        for c in range(k):
+            members = x[assign == c]
+            if len(members):
+                v = members.sum(axis=0)
+                centroids[c] = v / (np.linalg.norm(v) or 1.0)
+    return centroids, np.argmax(x @ centroids.T, axis=1)
+
+
+def build(rows: list[dict], vecs: np.ndarray, path: str) -> None:
+    """Write the index files for rows and their normalised vectors."""
+    npy, meta, ivf = _paths(path)
+    vecs = np.ascontiguousarray(vecs, dtype=np.float32)
+    k    = max(1, int(math.sqrt(len(vecs))))
+    centroids, assign = _kmeans(vecs, k)
+    order   = np.argsort(assign, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=k))])
+
+    np.save(npy, vecs)
+    meta.write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+    np.savez(ivf, centroids=centroids, order=order, offsets=offsets)
+
+    i8, bits     = _quant_paths(path)
+    codes, scale = quantize.int8_codes(vecs)
+    np.savez(i8, codes=codes, scale=scale)
+    np.save(bits, quantize.binary_codes(vecs))
+    log.info("venue index: wrote %d venues, %d IVF lists to %s", len(rows), k, npy)
+
+
+if __name__ == "__main__":
+    from tools.tools import embed
+
+    csv_path = sys.argv[1]
+    out_path = sys.argv[2] if len(sys.argv) > 2 else VENUE_INDEX_PATH or "venues"
+    t0   = time.perf_counter()
+    rows = read_collector_csv(csv_path)
+    if not rows:
+        sys.exit(f"No usable rows in {csv_path}")
+    vecs = np.concatenate([
+        embed([venue_text(r) for r in rows[i:i + 256]]) for i in range(0, len(rows), 256)
+    ])
+    build(rows, vecs, out_path)
+    print(f"{len(rows)} venues indexed in {time.perf_counter() - t0:.1f}s → {out_path}")